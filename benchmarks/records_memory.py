@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Memory used by a large list converted into typed dictionaries vs. records.
+
+    python benchmarks/records_memory.py [entries]
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+# import stdlib
+import sys
+
+# import third party
+from lxml import etree
+
+# import local modules
+from iosxr_eznc.schema import SchemaNode
+from iosxr_eznc.records import Record
+from iosxr_eznc.decorators import _etree_to_dict
+
+NAMESPACE = 'http://cisco.com/ns/yang/Cisco-IOS-XR-test-oper'
+
+
+def _schema():
+
+    interfaces = SchemaNode('interfaces', 'container', namespace=NAMESPACE)
+    interface = SchemaNode('interface', 'list', namespace=NAMESPACE, keys=['interface-name'])
+    interfaces.children['interface'] = interface
+    interface.children['interface-name'] = SchemaNode('interface-name', 'leaf')
+    for leaf in ('mtu', 'bandwidth', 'packets-received', 'packets-sent'):
+        interface.children[leaf] = SchemaNode(leaf, 'leaf', decode=int)
+    state = SchemaNode('state', 'container', namespace=NAMESPACE)
+    state.children['admin-up'] = SchemaNode('admin-up', 'leaf', decode=lambda val: val == 'true')
+    state.children['description'] = SchemaNode('description', 'leaf')
+    interface.children['state'] = state
+    return {'interfaces': interfaces}
+
+
+def _reply(entries):
+
+    data = etree.Element('{urn:ietf:params:xml:ns:netconf:base:1.0}data')
+    interfaces = etree.SubElement(data, '{%s}interfaces' % NAMESPACE, nsmap={None: NAMESPACE})
+    for index in range(entries):
+        interface = etree.SubElement(interfaces, '{%s}interface' % NAMESPACE)
+        for name, value in (('interface-name', 'GigabitEthernet0/0/0/%d' % index),
+                            ('mtu', '1514'),
+                            ('bandwidth', '10000000'),
+                            ('packets-received', str(index * 1000)),
+                            ('packets-sent', str(index * 997))):
+            etree.SubElement(interface, '{%s}%s' % (NAMESPACE, name)).text = value
+        state = etree.SubElement(interface, '{%s}state' % NAMESPACE)
+        etree.SubElement(state, '{%s}admin-up' % NAMESPACE).text = 'true'
+        etree.SubElement(state, '{%s}description' % NAMESPACE).text = 'link %d' % index
+    return data
+
+
+def deep_size(obj, seen=None):
+
+    """
+    Size of an object and of everything it references, each object counted once
+    (the interned strings shared by the entries are counted once as well).
+    """
+
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum([deep_size(key, seen) + deep_size(value, seen) for (key, value) in obj.items()])
+    elif isinstance(obj, (list, tuple)):
+        size += sum([deep_size(item, seen) for item in obj])
+    elif isinstance(obj, Record):
+        size += sum([deep_size(getattr(obj, field), seen) for field in obj._fields])
+        size += deep_size(obj._extra, seen)
+    return size
+
+
+def main(entries=20000):
+
+    schema = _schema()
+    schemas = lambda namespace: schema
+    data = _reply(entries)
+    typed = _etree_to_dict(data, schemas=schemas)['interfaces']['interface']
+    records = _etree_to_dict(data, schemas=schemas, records=True)['interfaces']['interface']
+    typed_size = deep_size(typed)
+    records_size = deep_size(records)
+    print('{entries} entries'.format(entries=entries))
+    print('typed dicts: {size:.1f} MB'.format(size=typed_size / 1e6))
+    print('records:     {size:.1f} MB ({ratio:.0%} less)'.format(size=records_size / 1e6,
+                                                               ratio=1 - float(records_size) / typed_size))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+
+"""
+Cost of the error path: ncclient `rpc-error` replies turned into iosxr-eznc exceptions.
+
+    python benchmarks/rpc_errors.py [errors]
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+# import stdlib
+import sys
+import time
+
+# import third party
+from lxml import etree
+from ncclient.operations.rpc import RPCError as NcRPCError
+
+# import local modules
+from iosxr_eznc.decorators import raise_eznc_exception
+from iosxr_eznc.exception import RPCError
+
+BASE_NAMESPACE = 'urn:ietf:params:xml:ns:netconf:base:1.0'
+
+
+def _rpc_error(index, severity='error'):
+
+    return NcRPCError(etree.fromstring(
+        '<rpc-error xmlns="{ns}">'
+        '<error-type>application</error-type>'
+        '<error-tag>invalid-value</error-tag>'
+        '<error-severity>{severity}</error-severity>'
+        '<error-path>/a:interfaces/a:interface[a:name="Gi0/0/0/{index}"]/a:mtu</error-path>'
+        '<error-message>Invalid MTU</error-message>'
+        '</rpc-error>'.format(ns=BASE_NAMESPACE, severity=severity, index=index)
+    ))
+
+
+class _Dev(object):
+
+    hostname = 'router'
+    timeout = 30
+
+
+class _RPC(object):
+
+    def __init__(self):
+
+        self._dev = _Dev()
+
+    @raise_eznc_exception
+    def get(self, nc_err):
+
+        raise nc_err
+
+
+def _run(rpc, nc_err, errors):
+
+    start = time.time()
+    for _ in range(errors):
+        try:
+            rpc.get(nc_err)
+        except RPCError:
+            pass
+    return (time.time() - start) / errors * 1e6
+
+
+def main(errors=100000):
+
+    rpc = _RPC()
+    single = _rpc_error(0)
+    many = NcRPCError(etree.Element('rpc-reply'),
+                      [_rpc_error(index, 'warning' if index % 2 else 'error') for index in range(8)])
+    print('{errors} errors'.format(errors=errors))
+    print('single rpc-error: {usec:.1f} us/error'.format(usec=_run(rpc, single, errors)))
+    print('8 rpc-error:      {usec:.1f} us/error'.format(usec=_run(rpc, many, errors)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -1,2 +1,5 @@
 # -*- coding: utf-8 -*-
+import logging
 from device import Device
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
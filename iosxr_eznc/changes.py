@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Change detection between two polls of the same operational data.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import hashlib
+import threading
+from collections import Counter
+
+# import third party
+from lxml import etree
+
+# import local modules
+from iosxr_eznc.decorators import _split_tag
+from iosxr_eznc.decorators import _child_node
+from iosxr_eznc.decorators import _etree_to_dict
+from iosxr_eznc.config import _key_values
+
+
+class Changes(object):
+
+    """
+    Differences between two polls:
+        * added: dictionary path -> entry, for the new list entries
+        * changed: dictionary path -> entry, for the list entries whose content changed
+        * removed: list of paths of the list entries gone
+
+    The top level containers are handled as entries too. The content of an entry
+    does not include the nested list entries, which are compared separately: e.g. a change
+    in a BGP neighbor is reported for the neighbor, not for the instance holding it.
+    """
+
+    def __init__(self, added=None, changed=None, removed=None):
+
+        self.added = added or {}
+        self.changed = changed or {}
+        self.removed = removed or []
+
+    def __len__(self):
+        return len(self.added) + len(self.changed) + len(self.removed)
+
+    def __nonzero__(self):
+        return len(self) > 0
+
+    def __repr__(self):
+        return '<Changes: {added} added, {changed} changed, {removed} removed>'.format(
+            added=len(self.added),
+            changed=len(self.changed),
+            removed=len(self.removed)
+        )
+
+
+def _path_str(path):
+
+    """
+    Formats the path of an entry as XPath-like selector, e.g. 'lldp/nodes/node[node-name="0/0/CPU0"]'.
+    """
+
+    steps = []
+    for step in path:
+        name = _split_tag(step[0])[1]
+        if len(step) > 1:
+            name += '[{}]'.format(' and '.join([
+                '{key}="{value}"'.format(key=key, value=value) for (key, value) in step[1:]
+            ]))
+        steps.append(name)
+    return '/'.join(steps)
+
+
+def _entry_step(ele, node, index):
+
+    """
+    Identifies a list entry by its keys, or by its position for the lists without (known) keys.
+    """
+
+    keys = node.keys if node is not None else []
+    if keys:
+        return (ele.tag,) + tuple(zip(keys, _key_values(ele, keys)))
+    return (ele.tag, ('#', index))
+
+
+def digest(ele, node=None, schemas=None, path=(), own=None, entries=None):
+
+    """
+    Hashes the subtree of `ele` (Merkle style, each element hash built from its children hashes).
+
+    The content of `ele`, excluding the nested list entries, is added to the `own` hash of the enclosing entry.
+    Each list entry found is recorded in `entries`: path -> (own digest, element).
+    Returns the digest of the whole subtree.
+    """
+
+    tag = ele.tag.encode('utf-8')
+    text = (ele.text or '').strip().encode('utf-8')
+    full = hashlib.sha1(tag)
+    full.update(b'\x00')
+    full.update(text)
+    if own is not None:
+        own.update(tag)
+        own.update(b'\x00')
+        own.update(text)
+
+    ele_ns, _ = _split_tag(ele.tag)
+    positions = {}
+    repeated = Counter([child.tag for child in ele if isinstance(child.tag, basestring)])
+    for child in ele:
+        if not isinstance(child.tag, basestring):
+            continue
+        child_ns, name = _split_tag(child.tag)
+        if node is None and schemas is not None and path == ():
+            child_node = schemas(child_ns).get(name) if child_ns else None  # top level container
+        else:
+            child_node = _child_node(node, schemas, ele_ns, child_ns, name)
+        if path == () or (child_node is not None and child_node.keyword == 'list') or \
+                (child_node is None and repeated[child.tag] > 1):
+            # new entry: top level container, or list entry
+            index = positions.get(child.tag, 0)
+            positions[child.tag] = index + 1
+            step = (child.tag,) if path == () else _entry_step(child, child_node, index)
+            child_path = path + (step,)
+            child_own = hashlib.sha1()
+            full.update(digest(child, child_node, schemas, child_path, child_own, entries))
+            entries[child_path] = (child_own.digest(), child)
+        else:
+            if own is not None:
+                own.update(b'<')
+            full.update(digest(child, child_node, schemas, path + ((child.tag,),), own, entries))
+            if own is not None:
+                own.update(b'>')
+
+    return full.digest()
+
+
+def _own_copy(ele, skip):
+
+    """
+    Copies an entry without its nested list entries (the elements in `skip`).
+    """
+
+    copy = etree.Element(ele.tag, nsmap=ele.nsmap)
+    copy.text = ele.text
+    for child in ele:
+        if not isinstance(child.tag, basestring) or child in skip:
+            continue
+        copy.append(_own_copy(child, skip))
+    return copy
+
+
+class ChangeTracker(object):
+
+    """
+    Polls operational data and returns only what changed since the previous poll of the same filter.
+    Only the digests of the previous poll are kept, and only the entries added or changed are converted.
+    """
+
+    def __init__(self, dev, schema=True):
+
+        self._dev = dev
+        self._schema = schema
+        self._previous = {}  # filter -> (digest, {path: own digest})
+        self._lock = threading.Lock()
+
+    def _key(self, filter):
+
+        if etree.iselement(filter):
+            return etree.tostring(filter)
+        return filter
+
+    def reset(self, filter=None):
+
+        """
+        Forgets the previous polls (of `filter`, or all): the next poll returns all the entries as added.
+        """
+
+        with self._lock:
+            if filter is None:
+                self._previous = {}
+            else:
+                self._previous.pop(self._key(filter), None)
+
+    def compare(self, key, data, typed=None):
+
+        """
+        Compares the <data> element of a reply with the previous one recorded under `key`.
+        """
+
+        if typed is None:
+            typed = self._dev._typed
+        schemas = self._dev.namespaces.schema if self._schema else None
+        entries = {}
+        full = digest(data, schemas=schemas, entries=entries) if data is not None else None
+
+        with self._lock:
+            previous_full, previous = self._previous.get(key, (None, {}))
+            self._previous[key] = (full, dict([(path, own) for (path, (own, _)) in entries.items()]))
+
+        if full == previous_full:
+            return Changes()
+
+        added = {}
+        changed = {}
+        skip = set([ele for (_, ele) in entries.values()])
+        for path, (own, ele) in entries.items():
+            previous_own = previous.get(path)
+            if previous_own == own:
+                continue
+            into = added if previous_own is None else changed
+            node = None
+            if typed and schemas is not None:
+                node = self._node(path, schemas)
+            into[_path_str(path)] = _etree_to_dict(_own_copy(ele, skip),
+                                                   node=node,
+                                                   schemas=schemas if typed else None)
+        removed = [_path_str(path) for path in previous if path not in entries]
+
+        return Changes(added=added, changed=changed, removed=removed)
+
+    def _node(self, path, schemas):
+
+        namespace, name = _split_tag(path[0][0])
+        node = schemas(namespace).get(name) if namespace else None
+        ele_ns = namespace
+        for step in path[1:]:
+            child_ns, name = _split_tag(step[0])
+            node = _child_node(node, schemas, ele_ns, child_ns, name)
+            ele_ns = child_ns
+            if node is None:
+                break
+        return node
+
+    def poll(self, filter, typed=None):
+
+        """
+        Retrieves the operational data selected by `filter` and returns the Changes since the previous poll.
+        """
+
+        data = self._dev.rpc.get(filter, raw=True)
+        return self.compare(self._key(filter), data, typed=typed)
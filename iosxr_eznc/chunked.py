@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Chunked retrieval of large YANG lists, one subtree filter per key.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import copy
+from collections import deque
+from multiprocessing import TimeoutError
+from multiprocessing.pool import ThreadPool
+
+# import local modules
+from iosxr_eznc import deadline as eznc_deadline
+from iosxr_eznc.exception import InvalidRequestError
+from iosxr_eznc.decorators import _split_tag
+from iosxr_eznc.decorators import _etree_to_dict
+from iosxr_eznc.decorators import _deadline_exceeded
+from iosxr_eznc.config import qualified_tree
+from iosxr_eznc.config import _key_values
+from iosxr_eznc.config import _schema_child
+
+
+def _path(filter_tree):
+
+    """
+    Returns the chain of elements from the top container down to the deepest element of a filter.
+    """
+
+    path = [filter_tree]
+    while len(path[-1]):
+        path.append(path[-1][0])
+    return path
+
+
+def _schema_path(path, schemas):
+
+    nodes = []
+    node = None
+    for index, ele in enumerate(path):
+        if index == 0:
+            node = _schema_child(None, schemas, ele.tag)
+        elif node is not None:
+            node = node.children.get(_split_tag(ele.tag)[1])
+        nodes.append(node)
+    return nodes
+
+
+def _with_keys(list_ele, key_names, key_values):
+
+    """
+    Adds the key leaves into a list element of a filter, as content match nodes.
+    The key leaves already selected by the filter are updated in place:
+    a selection node next to a content match node of the same leaf would select all the entries.
+    """
+
+    namespace, _ = _split_tag(list_ele.tag)
+    for index, (key_name, key_value) in enumerate(zip(key_names, key_values)):
+        key_ele = None
+        for child in list_ele:
+            if isinstance(child.tag, basestring) and _split_tag(child.tag)[1] == key_name:
+                key_ele = child
+                break
+        if key_ele is None:
+            key_ele = list_ele.makeelement(
+                '{{{ns}}}{name}'.format(ns=namespace, name=key_name) if namespace else key_name,
+                nsmap=list_ele.nsmap
+            )
+            list_ele.insert(index, key_ele)
+        if key_value is not None:
+            key_ele.text = key_value
+
+
+class ChunkedGet(object):
+
+    """
+    Retrieves a large list splitting the request in many smaller subtree filters, one per list entry key.
+
+    The `filter` selects the list, e.g. 'Cisco-IOS-XR-ipv4-bgp-oper:bgp/instances/instance'
+    (the deepest list of the filter is split, unless `split` is specified).
+    The keys are either specified explicitly (`keys`: list of tuples, or values for single key lists)
+    or discovered first with a request selecting only the key leaves.
+    Up to `parallel` requests are in flight at the same time,
+    while the entries are yielded in the order of the keys.
+
+    With a `deadline` (seconds from the start of the iteration, or a `Deadline` object),
+    and within the enclosing `Deadline` blocks, the iteration stops raising `DeadlineExceededError`
+    once expired: the chunks not requested yet are dropped, the replies in flight are not waited for.
+    """
+
+    def __init__(self,
+                 dev,
+                 filter,
+                 keys=None,
+                 key_names=None,
+                 split=None,
+                 parallel=4,
+                 typed=None,
+                 raw=False,
+                 deadline=None):
+
+        self._dev = dev
+        self._deadline = deadline
+        self._filter = qualified_tree(filter, dev, oper=True)
+        self._keys = keys
+        self._parallel = max(1, parallel)
+        self._typed = dev._typed if typed is None else typed
+        self._raw = raw
+        self._schemas = dev.namespaces.schema
+
+        path = _path(self._filter)
+        nodes = _schema_path(path, self._schemas)
+        if split is not None:
+            depth = [index for (index, ele) in enumerate(path) if _split_tag(ele.tag)[1] == split]
+        else:
+            depth = [index for (index, node) in enumerate(nodes) if node is not None and node.keyword == 'list']
+        if not depth and key_names:
+            depth = [len(path) - 1]
+        if not depth:
+            raise InvalidRequestError(
+                dev,
+                {
+                    'obj': _split_tag(self._filter.tag)[1],
+                    'msg': 'Unable to find the list to split, please specify `split` and `key_names`'
+                }
+            )
+        self._depth = depth[-1]
+        self._node = nodes[self._depth]
+        self._key_names = key_names or (self._node.keys if self._node is not None else [])
+        if not self._key_names:
+            raise InvalidRequestError(
+                dev,
+                {
+                    'obj': _split_tag(path[self._depth].tag)[1],
+                    'msg': 'Unable to find the list keys, please specify `key_names`'
+                }
+            )
+
+    def _list_ele(self, filter_tree):
+
+        return _path(filter_tree)[self._depth]
+
+    def _entries(self, data):
+
+        """
+        Returns the elements found in the reply at the depth of the list.
+        """
+
+        entries = [data]
+        for ele in _path(self._filter)[:self._depth + 1]:
+            entries = [child for entry in entries for child in entry if child.tag == ele.tag]
+        return entries
+
+    def keys(self):
+
+        """
+        Returns the keys of the list entries, as tuples. Retrieved from the device when not specified.
+        """
+
+        if self._keys is not None:
+            return [key if isinstance(key, tuple) else (key,) for key in self._keys]
+
+        key_filter = copy.deepcopy(self._filter)
+        list_ele = self._list_ele(key_filter)
+        for child in list(list_ele):
+            list_ele.remove(child)
+        _with_keys(list_ele, self._key_names, [None] * len(self._key_names))
+        data = self._dev.rpc.get(key_filter, raw=True)
+        if data is None:
+            return []
+        keys = []
+        seen = set()
+        for entry in self._entries(data):
+            key = _key_values(entry, self._key_names)
+            if key not in seen:
+                seen.add(key)
+                keys.append(key)
+        return keys
+
+    def _chunk_filter(self, key):
+
+        chunk_filter = copy.deepcopy(self._filter)
+        _with_keys(self._list_ele(chunk_filter), self._key_names, [u'{}'.format(value) for value in key])
+        return chunk_filter
+
+    def _get(self, key):
+
+        data = self._dev.rpc.get(self._chunk_filter(key), raw=True)
+        if data is None:
+            return []
+        entries = self._entries(data)
+        if self._raw:
+            return entries
+        schemas = self._schemas if self._typed else None
+        node = self._node if self._typed else None
+        return [_etree_to_dict(entry, node=node, schemas=schemas) for entry in entries]
+
+    def __iter__(self):
+
+        deadline = self._deadline
+        if deadline is not None and not isinstance(deadline, eznc_deadline.Deadline):
+            deadline = eznc_deadline.Deadline(deadline)
+        with eznc_deadline.scope(deadline):
+            keys = self.keys()
+            get = eznc_deadline.propagate(self._get)  # the requests of the workers, within the same deadlines
+            deadlines = eznc_deadline.active()
+        pool = ThreadPool(self._parallel)
+        pending = deque()
+        try:
+            for key in keys:
+                pending.append(pool.apply_async(get, (key,)))
+                if len(pending) >= self._parallel:
+                    for entry in self._result(pending.popleft(), deadlines):
+                        yield entry
+            while pending:
+                for entry in self._result(pending.popleft(), deadlines):
+                    yield entry
+        finally:
+            pool.terminate()
+
+    def _result(self, result, deadlines):
+
+        """
+        Waits for the entries of a chunk, until the deadline if any.
+        """
+
+        try:
+            return result.get(eznc_deadline.remaining(deadlines))
+        except TimeoutError:
+            raise _deadline_exceeded(self._dev, 'rpc.get')
+
+
+def get_chunked(dev, filter, **kvargs):
+
+    """
+    Iterates over the entries of a large list, retrieved in chunks. See `ChunkedGet`.
+    """
+
+    return iter(ChunkedGet(dev, filter, **kvargs))
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Command line tool: reads data from many devices at once.
+
+E.g.:
+    iosxr-eznc get --hosts hosts.txt 'Cisco-IOS-XR-ipv4-bgp-oper:bgp/instances' --parallel 200
+    iosxr-eznc get-config --host edge01 --host edge02 'interface-configurations' --output-dir configs/
+    iosxr-eznc facts --hosts - < hosts.txt
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import os
+import sys
+import json
+import time
+import getpass
+import argparse
+from multiprocessing.pool import ThreadPool
+
+# import local modules
+from iosxr_eznc.device import Device
+
+
+def _read_hosts(args):
+
+    hosts = list(args.host or [])
+    if args.hosts:
+        hosts_file = sys.stdin if args.hosts == '-' else open(args.hosts)
+        try:
+            for line in hosts_file:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    hosts.append(line)
+        finally:
+            if hosts_file is not sys.stdin:
+                hosts_file.close()
+    return hosts
+
+
+class _Progress(object):
+
+    """
+    Prints the progress on stderr, when it is a terminal.
+    """
+
+    def __init__(self, total, enabled=True):
+
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.start = time.time()
+        self._enabled = enabled and sys.stderr.isatty()
+
+    def update(self, ok):
+
+        self.done += 1
+        if not ok:
+            self.failed += 1
+        if self._enabled:
+            sys.stderr.write('\r[{done}/{total}] {failed} failed, {elapsed:.1f}s'.format(
+                done=self.done,
+                total=self.total,
+                failed=self.failed,
+                elapsed=time.time() - self.start
+            ))
+            sys.stderr.flush()
+
+    def finish(self):
+
+        if self._enabled:
+            sys.stderr.write('\n')
+        sys.stderr.write('{done} hosts, {failed} failed, in {elapsed:.1f}s\n'.format(
+            done=self.done,
+            failed=self.failed,
+            elapsed=time.time() - self.start
+        ))
+
+
+def _request(dev, args):
+
+    if args.command == 'facts':
+        return dev.facts
+    if args.command == 'get':
+        return dev.rpc.get(args.filter, typed=args.typed)
+    return dev.rpc.get_configuration(filter=args.filter, typed=args.typed)
+
+
+def _run(host, args):
+
+    """
+    Connects to a host and runs the request. Returns the result, as a dictionary.
+    """
+
+    result = {'host': host}
+    start = time.time()
+    dev = Device(host,
+                 username=args.user,
+                 password=args.password,
+                 port=args.port,
+                 timeout=args.timeout,
+                 ssh_private_key_file=args.ssh_key,
+                 gather_facts=(args.command == 'facts'),
+                 typed=args.typed)
+    try:
+        dev.open()
+        result['connect'] = round(time.time() - start, 3)
+        request_start = time.time()
+        result['data'] = _request(dev, args)
+        result['latency'] = round(time.time() - request_start, 3)
+        result['ok'] = True
+    except Exception as err:
+        result['ok'] = False
+        result['error'] = str(err)
+        result['error_type'] = err.__class__.__name__
+    finally:
+        if dev.connected:
+            try:
+                dev.close()
+            except Exception:
+                pass
+    result['total'] = round(time.time() - start, 3)
+    return result
+
+
+def _output(result, args):
+
+    if args.output_dir and result['ok']:
+        filepath = os.path.join(args.output_dir, '{host}.json'.format(host=result['host']))
+        with open(filepath, 'w') as out_file:
+            json.dump(result.pop('data'), out_file, indent=2, default=str)
+        result['file'] = filepath
+    sys.stdout.write(json.dumps(result, default=str) + '\n')
+    sys.stdout.flush()
+
+
+def _parser():
+
+    parser = argparse.ArgumentParser(prog='iosxr-eznc', description='Reads data from many IOS-XR devices at once.')
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--host', action='append', help='Device to query, can be repeated')
+    common.add_argument('--hosts', help='File with the devices to query, one per line ("-" for stdin)')
+    common.add_argument('-u', '--user', default=os.getenv('USER'), help='Username')
+    common.add_argument('-p', '--password', default=os.getenv('IOSXR_EZNC_PASSWORD'),
+                        help='Password (default: $IOSXR_EZNC_PASSWORD)')
+    common.add_argument('-k', '--ask-pass', action='store_true', help='Ask for the password')
+    common.add_argument('--ssh-key', help='SSH private key file')
+    common.add_argument('--port', type=int, default=830, help='NETCONF port')
+    common.add_argument('--timeout', type=int, default=60, help='RPC timeout, in seconds')
+    common.add_argument('-j', '--parallel', type=int, default=50, help='Devices queried at the same time')
+    common.add_argument('-o', '--output-dir', help='Write the data of each device into <output-dir>/<host>.json')
+    common.add_argument('--typed', action='store_true', help='Decode the leaves as defined in the YANG models')
+    common.add_argument('-q', '--quiet', action='store_true', help='No progress and summary on stderr')
+
+    commands = parser.add_subparsers(dest='command')
+    get_parser = commands.add_parser('get', parents=[common], help='Retrieve operational data')
+    get_parser.add_argument('filter', help='XML or XPath-like filter, e.g. "Cisco-IOS-XR-ipv4-bgp-oper:bgp"')
+    get_config_parser = commands.add_parser('get-config', parents=[common], help='Retrieve the running configuration')
+    get_config_parser.add_argument('filter', help='XML or XPath-like filter, e.g. "interface-configurations"')
+    commands.add_parser('facts', parents=[common], help='Retrieve the facts')
+    return parser
+
+
+def main(argv=None):
+
+    """
+    Queries the devices in parallel, writing a JSON line per device on stdout, as soon as done.
+    Exit code: 0 when all the devices answered, 1 otherwise.
+    """
+
+    parser = _parser()
+    args = parser.parse_args(argv)
+    hosts = _read_hosts(args)
+    if not hosts:
+        parser.error('no host specified, use --host or --hosts')
+    if args.ask_pass:
+        args.password = getpass.getpass()
+    if args.output_dir and not os.path.isdir(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    progress = _Progress(len(hosts), enabled=not args.quiet)
+    pool = ThreadPool(min(args.parallel, len(hosts)))
+    try:
+        for result in pool.imap_unordered(lambda host: _run(host, args), hosts):
+            _output(result, args)
+            progress.update(result['ok'])
+    except KeyboardInterrupt:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    pool.join()
+    if not args.quiet:
+        progress.finish()
+    return 1 if progress.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
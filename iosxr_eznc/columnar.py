@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Columnar (NumPy) view of the YANG lists, e.g. interface counters.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import time
+import numbers
+from collections import OrderedDict
+
+# import third party
+import six
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+# import local modules
+from iosxr_eznc.records import Record
+from iosxr_eznc.exception import InvalidRequestError
+
+
+_KEY_SEPARATOR = u'\x1f'
+
+
+def _check_numpy():
+
+    if not HAS_NUMPY:
+        raise ImportError('Please install numpy to use the columnar extractors.')
+
+
+def _entries(obj, path_nodes):
+
+    """
+    Walks down the `path_nodes` of a reply and returns the list of entries found.
+    """
+
+    objs = [obj]
+    for node in path_nodes:
+        children = []
+        for parent in objs:
+            if isinstance(parent, Record):
+                parent = parent.to_dict()
+            child = parent.get(node) if isinstance(parent, dict) else None
+            if child is None:
+                continue
+            if isinstance(child, list):
+                children.extend(child)
+            else:
+                children.append(child)
+        objs = children
+    return [obj.to_dict() if isinstance(obj, Record) else obj for obj in objs]
+
+
+def _flatten(entry, prefix='', into=None):
+
+    """
+    Flattens the containers of a list entry into a single dictionary,
+    the keys being the relative path to the leaf, e.g.: 'latest/generic-counters/bytes-received'.
+    Nested lists are ignored.
+    """
+
+    if into is None:
+        into = {}
+    for name, value in entry.items():
+        if isinstance(value, dict):
+            _flatten(value, prefix='{prefix}{name}/'.format(prefix=prefix, name=name), into=into)
+        elif not isinstance(value, list):
+            into[prefix + name] = value
+    return into
+
+
+def _number(value):
+
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, numbers.Number):
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _column(values):
+
+    """
+    Builds the array of a numeric leaf. Returns None if the leaf is not numeric.
+    Missing values are stored as NaN, hence the column becomes float.
+    """
+
+    numbers_ = [_number(value) if value is not None else None for value in values]
+    present = [value for value in numbers_ if value is not None]
+    if not present or len(present) != len([value for value in values if value is not None]):
+        return None
+    if len(present) == len(numbers_) and all([isinstance(value, six.integer_types) for value in present]):
+        if min(present) >= 0:
+            return np.array(numbers_, dtype=np.uint64)
+        return np.array(numbers_, dtype=np.int64)
+    return np.array([np.nan if value is None else value for value in numbers_], dtype=np.float64)
+
+
+class Snapshot(object):
+
+    """
+    Columnar view of a YANG list, at a given moment:
+        * keys: one array per list key
+        * columns: one array per numeric leaf (leaves in containers are named by relative path)
+        * index: one string per row, built from the keys, used to align two snapshots
+
+    The keys must identify the rows: `InvalidRequestError` is raised when there are rows but no keys,
+    or when two rows have the same keys (e.g. only some of the keys of the list were specified).
+    """
+
+    def __init__(self, keys, columns, timestamp=None, host=None):
+
+        self.keys = keys
+        self.columns = columns
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.host = host
+        key_arrays = list(keys.values())
+        if key_arrays:
+            rows = [_KEY_SEPARATOR.join([u'{}'.format(key) for key in row]) for row in zip(*key_arrays)]
+            self.index = np.array(rows, dtype=np.unicode_)
+        else:
+            self.index = np.array([], dtype=np.unicode_)
+        if not key_arrays and any([len(column) for column in columns.values()]):
+            raise InvalidRequestError(
+                None,
+                {
+                    'obj': host,
+                    'msg': 'No list keys: please specify the keys identifying the rows'
+                }
+            )
+        if len(np.unique(self.index)) != len(self.index):
+            raise InvalidRequestError(
+                None,
+                {
+                    'obj': ', '.join(keys),
+                    'msg': 'Duplicate rows for these keys: please specify all the list keys'
+                }
+            )
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, name):
+        if name in self.keys:
+            return self.keys[name]
+        return self.columns[name]
+
+    def __repr__(self):
+        return '<Snapshot {host}{rows} rows, {cols} columns>'.format(
+            host='{}: '.format(self.host) if self.host else '',
+            rows=len(self),
+            cols=len(self.columns)
+        )
+
+
+def extract(reply, path, keys, timestamp=None, host=None):
+
+    """
+    Extracts the list found under `path` of a reply into a Snapshot.
+
+    :param reply: the reply of RPC.get, either typed, untyped or with records.
+    :param path: path to the list, e.g.: 'data/infra-statistics/interfaces/interface'.
+    :param keys: the list keys.
+    """
+
+    _check_numpy()
+
+    entries = [_flatten(entry) for entry in _entries(reply, path.strip('/').split('/')) if isinstance(entry, dict)]
+
+    key_arrays = OrderedDict()
+    for key in keys:
+        key_arrays[key] = np.array([entry.get(key) for entry in entries], dtype=object)
+
+    leaves = set()
+    for entry in entries:
+        leaves.update(entry.keys())
+
+    columns = {}
+    for leaf in leaves.difference(keys):
+        column = _column([entry.get(leaf) for entry in entries])
+        if column is not None:
+            columns[leaf] = column
+
+    return Snapshot(key_arrays, columns, timestamp=timestamp, host=host)
+
+
+def _list_keys(dev, path_nodes):
+
+    container = path_nodes[1]
+    namespace = dev.namespaces.get(container, oper=True)
+    node = dev.namespaces.schema(namespace).get(container) if namespace else None
+    for path_node in path_nodes[2:]:
+        if node is None:
+            break
+        node = node.children.get(path_node)
+    if node is None or node.keyword != 'list':
+        return []
+    return node.keys
+
+
+def fetch(dev, filter, path, keys=None):
+
+    """
+    Retrieves the operational data selected by `filter` and extracts the list under `path` into a Snapshot.
+    The list keys are taken from the YANG model, unless specified.
+
+    E.g.:
+    >>> fetch(dev,
+    ...       'Cisco-IOS-XR-infra-statsd-oper:infra-statistics/interfaces',
+    ...       'data/infra-statistics/interfaces/interface')
+    """
+
+    _check_numpy()
+
+    if keys is None:
+        keys = _list_keys(dev, path.strip('/').split('/'))
+    reply = dev.rpc.get(filter, typed=True)
+
+    return extract(reply, path, keys, timestamp=time.time(), host=dev.hostname)
+
+
+def concat(snapshots):
+
+    """
+    Concatenates the snapshots of several devices into one, adding the `host` key column.
+    Only the columns present in all snapshots are kept.
+    """
+
+    _check_numpy()
+
+    snapshots = list(snapshots)
+    if not snapshots:
+        return Snapshot(OrderedDict(), {})
+
+    key_arrays = OrderedDict()
+    key_arrays['host'] = np.concatenate([
+        np.array([snapshot.host] * len(snapshot), dtype=object) for snapshot in snapshots
+    ])
+    for key in snapshots[0].keys:
+        key_arrays[key] = np.concatenate([snapshot.keys[key] for snapshot in snapshots])
+
+    common = set(snapshots[0].columns)
+    for snapshot in snapshots[1:]:
+        common.intersection_update(snapshot.columns)
+    columns = dict([
+        (column, np.concatenate([snapshot.columns[column] for snapshot in snapshots]))
+        for column in common
+    ])
+
+    timestamp = min([snapshot.timestamp for snapshot in snapshots])
+
+    return Snapshot(key_arrays, columns, timestamp=timestamp)
+
+
+def rates(previous, current, wrap=None, timestamps=None):
+
+    """
+    Computes the per second rate of every column between two snapshots.
+    Rows are aligned by their keys (unique in each snapshot); rows present in only one of the snapshots are dropped.
+    A negative delta means the counter wrapped or was reset:
+    it is corrected by `wrap` (e.g. 2 ** 64) if specified, otherwise becomes NaN.
+
+    :param timestamps: optional column name holding per-row timestamps (seconds),
+                       used instead of the snapshot timestamps.
+
+    Returns a Snapshot with the keys of the common rows and the rates as columns.
+    """
+
+    _check_numpy()
+
+    _, prev_idx, curr_idx = np.intersect1d(previous.index, current.index,
+                                           assume_unique=True,
+                                           return_indices=True)
+
+    if timestamps:
+        interval = (current.columns[timestamps][curr_idx].astype(np.float64) -
+                    previous.columns[timestamps][prev_idx].astype(np.float64))
+    else:
+        interval = current.timestamp - previous.timestamp
+
+    columns = {}
+    for name in set(previous.columns).intersection(current.columns):
+        if name == timestamps:
+            continue
+        curr = current.columns[name][curr_idx]
+        prev = previous.columns[name][prev_idx]
+        negative = curr < prev
+        if np.issubdtype(curr.dtype, np.integer) and np.issubdtype(prev.dtype, np.integer):
+            # in integer space, modulo 2 ** 64: the 64 bit counters are beyond the precision of the floats
+            delta = curr.astype(np.uint64) - prev.astype(np.uint64)
+            if wrap:
+                delta = np.where(negative, delta + np.uint64(wrap % 2 ** 64), delta)
+            delta = delta.astype(np.float64)
+        else:
+            delta = curr.astype(np.float64) - prev.astype(np.float64)
+            if wrap:
+                delta = np.where(negative, delta + wrap, delta)
+        if not wrap:
+            delta = np.where(negative, np.nan, delta)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            columns[name] = delta / interval
+
+    key_arrays = OrderedDict([
+        (key, values[curr_idx]) for (key, values) in current.keys.items()
+    ])
+
+    return Snapshot(key_arrays, columns, timestamp=current.timestamp, host=current.host)
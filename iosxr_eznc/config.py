@@ -0,0 +1,504 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Configuration sessions: many changes, one transaction.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import re
+import copy
+
+# import third party
+from lxml import etree
+
+# import local modules
+from iosxr_eznc import deadline as eznc_deadline
+from iosxr_eznc.exception import RPCError
+from iosxr_eznc.exception import InvalidRequestError
+from iosxr_eznc.decorators import _split_tag
+from iosxr_eznc.decorators import _xml_obj_from_str
+
+
+NETCONF_NAMESPACE = 'urn:ietf:params:xml:ns:netconf:base:1.0'
+_OPERATION_ATTR = '{{{ns}}}operation'.format(ns=NETCONF_NAMESPACE)
+
+_ERROR_PATH_STEP_RGX = re.compile(r'''([^/\[]+)((?:\[[^\]]*\])*)''')
+_ERROR_PATH_PRED_RGX = re.compile(r'''([^\[\]=\s]+)\s*=\s*['"]([^'"]*)['"]''')
+
+
+def _local(name):
+
+    return name.split(':')[-1]
+
+
+def qualified_tree(config, dev, oper=False):
+
+    """
+    Returns a namespace qualified copy of a configuration snippet (or operational data filter, with `oper`).
+    The snippet can be an XML string, an lxml element, or an XPath-like expression.
+    When not specified, the namespace is searched using the top level container name.
+    """
+
+    if etree.iselement(config):
+        ele = copy.deepcopy(config)
+    else:
+        ele = _xml_obj_from_str(config, dev)
+    namespace, tag = _split_tag(ele.tag)
+    if namespace is None:
+        namespace = ele.get('xmlns') or dev.namespaces.get(tag, oper=oper)
+        if namespace is None:
+            raise InvalidRequestError(
+                dev,
+                {
+                    'obj': tag,
+                    'msg': 'Unable to determine the namespace'
+                }
+            )
+        ele.set('xmlns', namespace)
+        # serialize and parse back to have the namespace applied to the whole tree
+        ele = etree.fromstring(etree.tostring(ele))
+    return ele
+
+
+def _key_values(ele, keys):
+
+    values = []
+    for key in keys:
+        key_ele = None
+        for child in ele:
+            if isinstance(child.tag, basestring) and _split_tag(child.tag)[1] == key:
+                key_ele = child
+                break
+        values.append((key_ele.text or '').strip() if key_ele is not None else None)
+    return tuple(values)
+
+
+def _schema_child(node, schemas, tag):
+
+    namespace, name = _split_tag(tag)
+    child_node = None
+    if node is not None:
+        child_node = node.children.get(name)
+    if child_node is None and schemas is not None and namespace:
+        child_node = schemas(namespace).get(name)
+    return child_node
+
+
+def find_match(parent, ele, node=None):
+
+    """
+    Returns the child of `parent` matching `ele`: same tag and,
+    for the entries of the lists known in the schema `node` of `ele`, the same keys.
+    """
+
+    for child in parent:
+        if child.tag != ele.tag:
+            continue
+        if node is None or node.keyword not in ('list', 'leaf-list'):
+            return child
+        if node.keyword == 'leaf-list':
+            if (child.text or '').strip() == (ele.text or '').strip():
+                return child
+            continue
+        if _key_values(child, node.keys) == _key_values(ele, node.keys):
+            return child
+    return None
+
+
+def merge_into(parent, ele, node=None, schemas=None, top=False):
+
+    """
+    Merges `ele` into the children of `parent`, in place.
+    Containers and list entries with the same keys are merged recursively, leaves are overridden.
+    Elements not found in the schema are appended, except the `top` level containers, merged by tag.
+    """
+
+    match = find_match(parent, ele, node)
+    if match is None or (node is None and not top):
+        parent.append(copy.deepcopy(ele))
+    elif not len(ele) or (node is not None and node.keyword in ('leaf', 'leaf-list')):
+        parent.replace(match, copy.deepcopy(ele))
+    else:
+        for child in ele:
+            if not isinstance(child.tag, basestring):
+                continue
+            merge_into(match, child, _schema_child(node, schemas, child.tag), schemas)
+
+
+def _is_leaf(ele, node):
+
+    if node is not None:
+        return node.keyword in ('leaf', 'leaf-list')
+    return not len(ele)
+
+
+def _with_operation(ele, operation):
+
+    ele.set(_OPERATION_ATTR, operation)
+    return ele
+
+
+def _deleted(ele, node):
+
+    """
+    Builds the request deleting `ele`: the element itself, with the keys for the list entries.
+    """
+
+    deleted = etree.Element(ele.tag, nsmap=ele.nsmap)
+    if node is not None and node.keyword == 'leaf-list':
+        deleted.text = ele.text
+    elif node is not None and node.keyword == 'list':
+        for key_ele in ele:
+            if isinstance(key_ele.tag, basestring) and _split_tag(key_ele.tag)[1] in node.keys:
+                deleted.append(copy.deepcopy(key_ele))
+    return _with_operation(deleted, 'delete')
+
+
+def _unmatchable(ele, node, schemas):
+
+    """
+    Tells if the children of `ele` cannot be matched one by one against the other tree:
+    containers or list entries not known in the schema, entries of lists without keys,
+    or repeated elements not known in the schema (e.g. leaf-list entries).
+    """
+
+    seen = set()
+    for child in ele:
+        if not isinstance(child.tag, basestring):
+            continue
+        child_node = _schema_child(node, schemas, child.tag)
+        if child_node is None and (len(child) or child.tag in seen):
+            return True
+        if child_node is not None and child_node.keyword == 'list' and not child_node.keys:
+            return True
+        seen.add(child.tag)
+    return False
+
+
+def diff(desired, running, node=None, schemas=None, delete=True):
+
+    """
+    Compares the `desired` configuration tree against the `running` one,
+    and returns the minimal tree to be sent via edit-config (with the default operation `merge`)
+    to get from `running` to `desired`, or None when there is nothing to change.
+
+    Changed leaves and new subtrees are marked with operation="merge",
+    nodes found only in `running` with operation="delete" (unless `delete` is disabled).
+    The list entries are matched using their keys from the YANG schema:
+    when the children of a node cannot be matched (not known in the schema, or entries of a list without keys),
+    the node is sent entirely, with operation="replace".
+    """
+
+    if running is None:
+        return _with_operation(copy.deepcopy(desired), 'merge')
+
+    if _unmatchable(desired, node, schemas) or _unmatchable(running, node, schemas):
+        if etree.tostring(desired, method='c14n') == etree.tostring(running, method='c14n'):
+            return None
+        return _with_operation(copy.deepcopy(desired), 'replace')
+
+    delta = etree.Element(desired.tag, nsmap=desired.nsmap)
+    keys = node.keys if node is not None and node.keyword == 'list' else []
+    changed = False
+
+    for child in desired:
+        if not isinstance(child.tag, basestring):
+            continue
+        child_node = _schema_child(node, schemas, child.tag)
+        if _split_tag(child.tag)[1] in keys:
+            delta.append(copy.deepcopy(child))
+            continue
+        match = find_match(running, child, child_node)
+        if match is None:
+            delta.append(_with_operation(copy.deepcopy(child), 'merge'))
+            changed = True
+        elif _is_leaf(child, child_node):
+            if (child.text or '').strip() != (match.text or '').strip():
+                delta.append(_with_operation(copy.deepcopy(child), 'merge'))
+                changed = True
+        else:
+            child_delta = diff(child, match, child_node, schemas, delete=delete)
+            if child_delta is not None:
+                delta.append(child_delta)
+                changed = True
+
+    if delete:
+        for child in running:
+            if not isinstance(child.tag, basestring):
+                continue
+            child_node = _schema_child(node, schemas, child.tag)
+            if find_match(desired, child, child_node) is None:
+                delta.append(_deleted(child, child_node))
+                changed = True
+
+    return delta if changed else None
+
+
+def _parse_error_path(error_path):
+
+    steps = []
+    for name, predicates in _ERROR_PATH_STEP_RGX.findall(error_path.strip()):
+        keys = dict([
+            (_local(key), value) for (key, value) in _ERROR_PATH_PRED_RGX.findall(predicates)
+        ])
+        steps.append((_local(name.strip()), keys))
+    return steps
+
+
+def _match_depth(ele, steps):
+
+    """
+    How deep the path described by `steps` goes into the snippet `ele`.
+    Returns 0 when the snippet is on a different branch.
+    """
+
+    if not steps or _split_tag(ele.tag)[1] != steps[0][0]:
+        return 0
+    depth = 1
+    current = [ele]
+    for name, keys in steps[1:]:
+        candidates = [
+            child for parent in current for child in parent
+            if isinstance(child.tag, basestring) and _split_tag(child.tag)[1] == name
+        ]
+        if not candidates:
+            # the snippet does not go that deep, but did not contradict the path so far
+            return depth
+        if keys:
+            candidates = [
+                child for child in candidates
+                if _key_values(child, list(keys.keys())) == tuple(keys.values())
+            ]
+            if not candidates:
+                return 0
+        current = candidates
+        depth += 1
+    return depth
+
+
+class ConfigSession(object):
+
+    """
+    Accumulates many configuration snippets locally,
+    then pushes them into the candidate datastore using a single edit-config request.
+
+    E.g.:
+    >>> with ConfigSession(dev) as cfg:
+    ...     cfg.load('<interface-configurations>...</interface-configurations>')
+    ...     cfg.load(other_snippet)
+    ...     cfg.commit(confirmed=True, timeout=120)
+
+    The candidate is locked on enter and always unlocked on exit.
+    On failure, the changes are discarded and the exception raised by the RPC
+    is annotated with the snippets the error refers to (`exc.snippets`, a list of (index, snippet) tuples).
+
+    With a `deadline` (seconds from the creation of the session, or a `Deadline` object), the requests
+    wait for the replies at most until then, and are not sent anymore once expired.
+    Discarding and unlocking ignore the deadline: they get `grace` seconds (default: the device timeout).
+    """
+
+    def __init__(self,
+                 dev,
+                 target='candidate',
+                 operation='merge',
+                 validate=True,
+                 lock=True,
+                 schema=True,
+                 deadline=None,
+                 grace=None):
+
+        self._dev = dev
+        if deadline is not None and not isinstance(deadline, eznc_deadline.Deadline):
+            deadline = eznc_deadline.Deadline(deadline)
+        self._deadline = deadline
+        self._grace = grace
+        self._target = target
+        self._operation = operation
+        self._validate = validate
+        self._lock = lock
+        self._schema = schema
+        self._snippets = []
+        self._locked = False
+        self._pushed = False
+
+    def open(self):
+
+        if self._lock:
+            with eznc_deadline.scope(self._deadline):
+                self._dev.rpc.lock(target=self._target)
+            self._locked = True
+        return self
+
+    def close(self, discard=False):
+
+        with eznc_deadline.shield(self._grace):
+            try:
+                if discard and self._pushed:
+                    self._dev.rpc.discard_changes()
+                    self._pushed = False
+            finally:
+                if self._locked:
+                    self._locked = False
+                    self._dev.rpc.unlock(target=self._target)
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self.close(discard=True)  # anything pushed but not committed is dropped
+        except RPCError:
+            if exc_type is None:
+                raise
+            # do not hide the original error
+
+    def load(self, config):
+
+        """
+        Adds a configuration snippet to the session. Returns its index.
+        A <config> document (e.g. rendered from a `ConfigTemplate`) adds each of its top level containers,
+        returning the index of the last one.
+        """
+
+        ele = config if etree.iselement(config) else _xml_obj_from_str(config, self._dev)
+        if _split_tag(ele.tag)[1] == 'config':
+            index = None
+            for container in ele:
+                if isinstance(container.tag, basestring):
+                    index = self.load(container)
+            return index
+        self._snippets.append((config, qualified_tree(ele, self._dev)))
+        return len(self._snippets) - 1
+
+    def __len__(self):
+        return len(self._snippets)
+
+    def running(self, container):
+
+        """
+        Retrieves the running configuration of a top level container, as an XML element.
+        """
+
+        container = qualified_tree(etree.Element(container.tag), self._dev)
+        with eznc_deadline.scope(self._deadline):
+            data = self._dev.rpc.get_configuration(filter=container, raw=True)
+        if data is None:
+            return None
+        return data.find(container.tag)
+
+    def load_diff(self, desired, running=None, delete=True):
+
+        """
+        Adds to the session only the changes required to get from
+        the `running` configuration of a top level container
+        (taken from the mirror of the device if any, or retrieved when not specified)
+        to the `desired` one. Returns the index of the snippet, or None when there is nothing to change.
+        """
+
+        desired = qualified_tree(desired, self._dev)
+        if running is None and getattr(self._dev, '_mirror', None) is not None:
+            running = self._dev._mirror.tree(desired)
+        elif running is None:
+            running = self.running(desired)
+        elif not etree.iselement(running):
+            running = qualified_tree(running, self._dev)
+        schemas = self._dev.namespaces.schema if self._schema else None
+        delta = diff(desired, running, _schema_child(None, schemas, desired.tag), schemas, delete=delete)
+        if delta is None:
+            return None
+        return self.load(delta)
+
+    def document(self):
+
+        """
+        Builds the <config> document merging all the snippets loaded so far.
+        """
+
+        schemas = self._dev.namespaces.schema if self._schema else None
+        config = etree.Element('config')
+        for _, snippet in self._snippets:
+            merge_into(config, snippet, _schema_child(None, schemas, snippet.tag), schemas, top=True)
+        return config
+
+    def snippets_for(self, err):
+
+        """
+        Returns the (index, snippet) tuples an RPC error refers to, using its error-path.
+        """
+
+        error_path = _error_path(err)
+        if not error_path:
+            return []
+        steps = _parse_error_path(error_path)
+        depths = [_match_depth(snippet, steps) for _, snippet in self._snippets]
+        deepest = max(depths) if depths else 0
+        if not deepest:
+            return []
+        return [
+            (index, self._snippets[index][0])
+            for (index, depth) in enumerate(depths)
+            if depth == deepest
+        ]
+
+    def _annotate(self, err):
+
+        err.snippets = self.snippets_for(err)
+        if err.snippets and isinstance(err._err, dict):
+            err._err['snippets'] = [index for (index, _) in err.snippets]
+
+    def push(self):
+
+        """
+        Sends the merged configuration to the device and validates it, without committing.
+        """
+
+        if not self._snippets:
+            return
+        try:
+            self._pushed = True
+            with eznc_deadline.scope(self._deadline):
+                self._dev.rpc.edit_config(self.document(),
+                                          operation=self._operation,
+                                          target=self._target)
+                if self._validate:
+                    self._dev.rpc.validate(source=self._target)
+        except RPCError as err:
+            self._annotate(err)
+            raise
+
+    def commit(self, confirmed=None, timeout=None):
+
+        """
+        Pushes the configuration and commits.
+        """
+
+        self.push()
+        try:
+            with eznc_deadline.scope(self._deadline):
+                ret = self._dev.rpc.commit(confirmed=confirmed, timeout=timeout)
+        except RPCError as err:
+            self._annotate(err)
+            raise
+        self._pushed = False
+        self._snippets = []
+        return ret
+
+
+def _error_path(err):
+
+    return getattr(err, 'path', None)
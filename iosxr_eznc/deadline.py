@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Deadlines of the operations made of many RPC requests.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import time
+import threading
+from functools import wraps
+from contextlib import contextmanager
+
+
+_local = threading.local()
+
+
+def _stack():
+
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class Deadline(object):
+
+    """
+    Point in time after which no more requests are sent: the operations running in a `Deadline` block,
+    in the same thread, wait for each reply at most the time left (or the device timeout, when shorter),
+    hence stop waiting once expired. The requests not sent yet then raise `DeadlineExceededError`.
+    Cancelled from another thread using `cancel`, the requests not sent yet raise `DeadlineExceededError` as well,
+    but a request already waiting for its reply keeps waiting, until the reply, the expiration or the device timeout.
+
+    The blocks can be nested: the earliest deadline applies. A `shield` deadline ignores the enclosing ones,
+    e.g. to unlock the candidate even when the operation ran out of time (see `shield`).
+    E.g.:
+    >>> with Deadline(30):
+    ...     dev.rpc.get('bgp/instances')
+    ...     dev.rpc.get('interfaces')  # waits at most what is left of the 30 seconds
+    """
+
+    def __init__(self, timeout=None, shield=False):
+
+        self.expires = time.time() + timeout if timeout is not None else None
+        self.shield = shield
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+
+        return self._cancelled.is_set()
+
+    def remaining(self):
+
+        """
+        Seconds left, 0 when expired or cancelled, None without expiration.
+        """
+
+        if self._cancelled.is_set():
+            return 0.0
+        if self.expires is None:
+            return None
+        return max(0.0, self.expires - time.time())
+
+    @property
+    def expired(self):
+
+        return self.remaining() == 0.0
+
+    def __enter__(self):
+
+        _stack().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+
+        _stack().pop()  # the blocks are nested
+
+
+def active():
+
+    """
+    Returns the deadlines in effect in the current thread, innermost first.
+    """
+
+    deadlines = []
+    for deadline in reversed(_stack()):
+        deadlines.append(deadline)
+        if deadline.shield:
+            break
+    return deadlines
+
+
+def remaining(deadlines=None):
+
+    """
+    Seconds left before the earliest deadline in effect in the current thread
+    (or of `deadlines`, as returned by `active`), None without deadline.
+    """
+
+    left = None
+    for deadline in (active() if deadlines is None else deadlines):
+        deadline_left = deadline.remaining()
+        if deadline_left is not None and (left is None or deadline_left < left):
+            left = deadline_left
+    return left
+
+
+def expired():
+
+    return remaining() == 0.0
+
+
+def rpc_timeout(timeout):
+
+    """
+    Returns the time to wait for a reply: the device `timeout`, or the time left when shorter.
+    """
+
+    left = remaining()
+    if left is None:
+        return timeout
+    if timeout is None:
+        return left
+    return min(timeout, left)
+
+
+@contextmanager
+def scope(deadline):
+
+    """
+    Runs the block within `deadline`: seconds, a `Deadline` object, or None (only the enclosing deadlines apply).
+    """
+
+    if deadline is None:
+        yield None
+        return
+    if not isinstance(deadline, Deadline):
+        deadline = Deadline(deadline)
+    with deadline:
+        yield deadline
+
+
+def shield(grace=None):
+
+    """
+    Deadline of `grace` seconds (None: only the device timeout applies), ignoring the enclosing deadlines.
+    For the cleanup requests that must be sent anyway, e.g. unlock.
+    """
+
+    return Deadline(grace, shield=True)
+
+
+def propagate(fun):
+
+    """
+    Binds `fun` to the deadlines in effect in the current thread, to be called from another thread
+    (e.g. the worker threads of a pool).
+    """
+
+    stack = list(_stack())
+
+    @wraps(fun)
+    def _propagated(*vargs, **kvargs):
+        previous = getattr(_local, 'stack', None)
+        _local.stack = list(stack)
+        try:
+            return fun(*vargs, **kvargs)
+        finally:
+            _local.stack = previous
+
+    return _propagated
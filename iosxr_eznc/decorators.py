@@ -21,25 +21,31 @@ from __future__ import absolute_import
 
 # import stdlib
 import re
-import json
+import gzip
 import inspect
 from functools import wraps
 
 # import third party
-import jxmlease
 from lxml import etree
 from ncclient.operations.rpc import RPCReply
 from ncclient.operations.retrieve import GetReply
+from ncclient.operations.retrieve import GetSchemaReply
 from ncclient.operations.rpc import RPCError as NcRPCError
 from ncclient.transport.errors import TransportError as NcTpError
 from ncclient.operations.errors import TimeoutExpiredError as NcTEError
 
 # import local modules
+from iosxr_eznc import deadline as eznc_deadline
+from iosxr_eznc import exception as eznc_exception
 from iosxr_eznc.exception import RPCTimeoutError
+from iosxr_eznc.exception import DeadlineExceededError
 from iosxr_eznc.exception import InvalidXMLReplyError
 from iosxr_eznc.exception import ConnectionClosedError
 from iosxr_eznc.exception import InvalidRequestError
 from iosxr_eznc.exception import RPCError as _XRRPCError
+from iosxr_eznc.records import record_class
+from iosxr_eznc.profiler import container_name
+from iosxr_eznc.validator import validate_filter
 
 
 OPENCONFIG_NAMESPACE = 'http://openconfig.net/yang/'
@@ -157,63 +163,189 @@ def _xml_obj_from_str(xml_str, dev):
     return xml_req_tree
 
 
-def raise_eznc_exception(fun):
+def _rpc_error_class(fun_name):
 
     """
-    Raises iosxr-eznc exception.
-    Depending on the RPC method called, will try to raise the most appropriate exception.
-    If unable to find a proper exception class, will raise the default RPCError.
+    Returns the exception class of an RPC method, e.g. EditConfigError for edit_config.
+    If unable to find a proper exception class, returns the default RPCError.
+    """
+
+    exc = getattr(eznc_exception, '{}Error'.format(fun_name.title().replace('_', '')), None)
+    if inspect.isclass(exc) and issubclass(exc, _XRRPCError):
+        return exc
+    return _XRRPCError
+
+
+def _strip(text):
+
+    return text.strip() if text is not None else None
+
+
+def _rpc_error_details(nc_err):
+
+    return {
+        'tag': _strip(nc_err.tag),
+        'path': _strip(nc_err.path),
+        'message': _strip(nc_err.message),
+        'type': _strip(nc_err.type),
+        'severity': _strip(nc_err.severity),
+        'info': nc_err.info
+    }
+
+
+def rpc_error_details(nc_err):
+
+    """
+    Returns the fields of an `rpc-error` reply, as a dictionary.
+    When the reply has many errors, the fields are taken from the first one with severity error,
+    except the message, joining the messages of all the errors;
+    the fields of each error are under `errors`.
     """
 
-    def _get_rpc_error_class(exc):
+    errors = getattr(nc_err, 'errors', None)
+    if not errors:
+        return _rpc_error_details(nc_err)
+    errors = [_rpc_error_details(error) for error in errors]
+    details = dict(next((error for error in errors if error['severity'] == 'error'), errors[0]))
+    details['message'] = _strip(nc_err.message)
+    details['errors'] = errors
+    return details
+
+
+def _deadline_exceeded(dev, fun_name):
+
+    return DeadlineExceededError(
+        dev,
+        {
+            'fun': fun_name,
+            'msg': 'Deadline exceeded'
+        }
+    )
+
 
-        """
-        Search for the exception class using the function name.
-        """
+def raise_eznc_exception(fun):
+
+    """
+    Raises iosxr-eznc exception.
+    Depending on the RPC method called, will raise the most appropriate exception,
+    with the fields of the `rpc-error` reply.
+    The exception class is looked up once, when decorating.
+    """
 
-        mod = __import__('iosxr_eznc.exception')
-        for obj in inspect.getmembers(mod.exception):
-            # digging into exceptions' module
-            if obj[0] == exc and inspect.isclass(obj[1]):
-                # found ya
-                return obj[1]
+    XRRPCError = _rpc_error_class(fun.__name__)
+    fun_name = 'rpc.{}'.format(fun.__name__)
 
     @wraps(fun)
     def _raise_eznc_exception(*vargs, **kvargs):
         # ~~~ vargs[0] is rpc obj ~~~
-        _rpc_obj = vargs[0]
-        _dev_obj = _rpc_obj._dev
         try:
             return fun(*vargs, **kvargs)
         except NcRPCError as nc_err:
-            exc = '{}Error'.format(fun.__name__.title().replace('_', ''))
-            XRRPCError = _get_rpc_error_class(exc)
-            if not XRRPCError:
-                # could not find the desired exception, throw the base
-                XRRPCError = _XRRPCError
-            err = nc_err.args[0]
-            if not isinstance(err, dict):
-                err = {
-                    'err': nc_err.args[0]
-                }
-            err.update({
-                'fun': 'rpc.{}'.format(fun.__name__),
-                'args': vargs[1:] if len(vargs) > 0 else [],
-                'kvargs': kvargs
-            })
-            raise XRRPCError(_dev_obj, err)
+            err = rpc_error_details(nc_err)
+            err['fun'] = fun_name
+            raise XRRPCError(vargs[0]._dev, err)
         except NcTEError as nc_err:
+            _dev_obj = vargs[0]._dev
+            if eznc_deadline.expired():
+                raise _deadline_exceeded(_dev_obj, fun_name)
             err = {
-                'fun': 'rpc.{}'.format(fun.__name__),
+                'fun': fun_name,
                 'timeout': _dev_obj.timeout
             }
             raise RPCTimeoutError(_dev_obj, err)
         except NcTpError as nc_err:
-            raise ConnectionClosedError(_dev_obj)
+            raise ConnectionClosedError(vargs[0]._dev)
 
     return _raise_eznc_exception
 
 
+def profiled(param=None):
+
+    """
+    Profiles the RPC requests, when the device has a profiler:
+    the outermost decorator, to cover the whole chain, from building the request to the JSON reply.
+    The results are aggregated per RPC method and top level container of the `param` argument.
+    """
+
+    def _profiled_wrapper(fun):
+
+        method = fun.__name__.lstrip('_')
+
+        @wraps(fun)
+        def _profiled(*vargs, **kvargs):
+            profiler = getattr(vargs[0]._dev, '_profiler', None)
+            if profiler is None:
+                return fun(*vargs, **kvargs)
+            container = None
+            if param is not None:
+                container = container_name(kvargs[param] if param in kvargs else
+                                           (vargs[1] if len(vargs) > 1 else None))
+            return profiler.run(method, container, fun, *vargs, **kvargs)
+
+        return _profiled
+
+    return _profiled_wrapper
+
+
+def within_deadline(fun):
+
+    """
+    Runs the request within the `deadline` argument if any (seconds or a `Deadline` object),
+    and the deadlines of the enclosing `Deadline` blocks: once expired, the request is not sent.
+    """
+
+    fun_name = 'rpc.{}'.format(fun.__name__)
+
+    @wraps(fun)
+    def _within_deadline(*vargs, **kvargs):
+        with eznc_deadline.scope(kvargs.pop('deadline', None)):
+            if eznc_deadline.expired():
+                raise _deadline_exceeded(vargs[0]._dev, fun_name)
+            return fun(*vargs, **kvargs)
+
+    return _within_deadline
+
+
+def limit_concurrency(fun):
+
+    """
+    Waits for a free slot of the device limiter before sending the request (until the deadline, if any),
+    then reports the outcome of the request to the limiter.
+    """
+
+    fun_name = 'rpc.{}'.format(fun.__name__)
+
+    @wraps(fun)
+    def _limit_concurrency(*vargs, **kvargs):
+        _dev_obj = vargs[0]._dev
+        limiter = getattr(_dev_obj, '_limiter', None)
+        if limiter is None:
+            return fun(*vargs, **kvargs)
+        ticket = limiter.acquire(timeout=eznc_deadline.remaining())
+        if ticket is False:
+            raise _deadline_exceeded(_dev_obj, fun_name)
+        failed = congested = cancelled = False
+        try:
+            return fun(*vargs, **kvargs)
+        except DeadlineExceededError:
+            cancelled = True
+            raise
+        except (RPCTimeoutError, ConnectionClosedError):
+            congested = True
+            raise
+        except Exception:
+            failed = True
+            raise
+        finally:
+            limiter.release(ticket,
+                            timeout=_dev_obj.timeout,
+                            failed=failed,
+                            congested=congested,
+                            cancelled=cancelled)
+
+    return _limit_concurrency
+
+
 def qualify(param, oper=None):
 
     """
@@ -241,6 +373,12 @@ def qualify(param, oper=None):
                         # probably the request will fail...
                         xml_req_tree.set('xmlns', namespace)
                         kvargs[param] = xml_req_tree
+                validate_filters = getattr(vargs[0]._dev, '_validate_filters', None)
+                if validate_filters and xml_req_tree is not None:
+                    # fail fast, instead of sending a request bound to fail
+                    kvargs[param] = validate_filter(xml_req_tree,
+                                                    vargs[0]._dev,
+                                                    prune=(validate_filters == 'prune'))
 
             return fun(*vargs, **kvargs)
 
@@ -275,26 +413,166 @@ def wrap_xml(param, tag='filter'):
     return _wrap_xml_wrapper
 
 
+def _dump_reply(data_ele, sink, compress=False):
+
+    """
+    Writes the <data> element of a reply into `sink`, one top level element at a time.
+    `sink` can be either a path or a file-like object opened in binary mode.
+    Each element is detached from the reply tree as soon as it has been written,
+    so that it can be freed before serializing the next one.
+    """
+
+    sink_file = sink
+    if isinstance(sink, basestring):
+        sink_file = open(sink, 'wb')
+
+    stream = sink_file
+    if compress:
+        stream = gzip.GzipFile(fileobj=sink_file, mode='wb')
+
+    try:
+        with etree.xmlfile(stream, encoding='utf-8') as xml_file:
+            # qualified, with the namespace declarations of the reply: as returned with `raw`
+            with xml_file.element(data_ele.tag, attrib=dict(data_ele.attrib), nsmap=data_ele.nsmap):
+                while len(data_ele):
+                    child = data_ele[0]
+                    xml_file.write(child)
+                    data_ele.remove(child)
+    finally:
+        if compress:
+            stream.close()  # flushes the gzip trailer, does not close `sink_file`
+        if sink_file is not sink:
+            sink_file.close()
+
+    return sink
+
+
+def _split_tag(tag):
+
+    if tag[0] == '{':
+        return tag[1:].split('}', 1)
+    return None, tag
+
+
+def _child_node(node, schemas, ele_ns, child_ns, name):
+
+    child_node = None
+    if node is not None:
+        child_node = node.children.get(name)
+    if child_node is None and schemas is not None and child_ns and child_ns != ele_ns:
+        child_node = schemas(child_ns).get(name)
+    return child_node
+
+
+def _etree_to_dict(ele, node=None, schemas=None, records=False):
+
+    """
+    Converts an XML element into nested dictionaries: a leaf becomes its text,
+    the repeated elements a list.
+    Leaves are decoded into native Python types using the schema `node` of `ele`.
+    `schemas` is a callable returning the compiled schema tree of a namespace,
+    used when descending into an element from a different namespace (e.g. top level containers).
+    With `records`, the entries of the lists known in the schema are converted into record objects,
+    and always returned as a list.
+    """
+
+    if not len(ele):
+        text = (ele.text or '').strip()
+        if node is not None and node.decode is not None:
+            try:
+                return node.decode(text)
+            except ValueError:
+                pass
+        return text
+
+    ele_ns, _ = _split_tag(ele.tag)
+
+    ret = {}
+    lists = set()
+    for child in ele:
+        if not isinstance(child.tag, basestring):
+            # comments and processing instructions
+            continue
+        child_ns, name = _split_tag(child.tag)
+        child_node = _child_node(node, schemas, ele_ns, child_ns, name)
+        if records and child_node is not None and child_node.keyword == 'list':
+            ret.setdefault(name, []).append(_etree_to_record(child, child_node, schemas))
+            continue
+        value = _etree_to_dict(child, node=child_node, schemas=schemas, records=records)
+        if name not in ret:
+            ret[name] = value
+        elif name in lists:
+            ret[name].append(value)
+        else:
+            ret[name] = [ret[name], value]
+            lists.add(name)
+
+    return ret
+
+
+def _etree_to_record(ele, node, schemas=None):
+
+    """
+    Converts the XML element of a list entry, or container, into a record object.
+    The containers and lists underneath are converted into records as well.
+    """
+
+    record = record_class(node)()
+    ele_ns, _ = _split_tag(ele.tag)
+
+    for child in ele:
+        if not isinstance(child.tag, basestring):
+            continue
+        child_ns, name = _split_tag(child.tag)
+        child_node = _child_node(node, schemas, ele_ns, child_ns, name)
+        if child_node is not None and child_node.keyword in ('list', 'container'):
+            value = _etree_to_record(child, child_node, schemas)
+        else:
+            value = _etree_to_dict(child, node=child_node, schemas=schemas, records=True)
+        record._add(name, value)
+
+    return record
+
+
 def jsonify(fun):
 
     """
     Transforms the XML reply into a JSON.
+    If a `sink` is specified, the payload is written there instead, without any transformation.
+    With `typed` (defaults to the `typed` option of the device) the leaves of the data replies
+    are decoded into native Python types, as defined in the YANG models, while converting the XML.
+    With `records`, the list entries are returned as compact record objects (implies `typed`).
+    With `raw`, the <data> element of the reply is returned as-is.
     """
 
+    @wraps(fun)
     def _jsonify(*vargs, **kvargs):
 
+        _dev_obj = vargs[0]._dev
+        sink = kvargs.pop('sink', None)
+        compress = kvargs.pop('compress', False)
+        typed = kvargs.pop('typed', None)
+        records = kvargs.pop('records', False)
+        raw = kvargs.pop('raw', False)
+        if typed is None:
+            typed = getattr(_dev_obj, '_typed', False)
+
         ret = fun(*vargs, **kvargs)
-        ret_xml = None
 
+        if isinstance(ret, GetSchemaReply):
+            return {
+                'data': ret.data
+            }
+
+        # the reply has already been parsed by ncclient: the elements are converted directly,
+        # without serializing and parsing them again
+        ret_ele = None
         if isinstance(ret, GetReply):
-            ret_xml = ret.data_xml
+            ret_ele = ret.data_ele
         elif isinstance(ret, RPCReply):
-            ret_xml = str(ret)
+            ret_ele = ret._root
 
-        if ret_xml:
-            ret_json = json.loads(json.dumps(jxmlease.parse(ret_xml)))
-            return ret_json
-        else:
+        if ret_ele is None:
             reply_obj = None
             if etree.iselement(ret):
                 reply_obj = etree.tostring(ret)[:1024]  # up to 1024 chars
@@ -304,6 +582,21 @@ def jsonify(fun):
                 'msg': 'Invalid XML reply',
                 'obj': reply_obj
             }
-            raise InvalidXMLReplyError(vargs[0]._dev, err)
+            raise InvalidXMLReplyError(_dev_obj, err)
+
+        if isinstance(ret, GetReply):
+            if sink is not None:
+                return _dump_reply(ret_ele, sink, compress=compress)
+            if raw:
+                return ret_ele
+
+        schemas = None
+        if (typed or records) and isinstance(ret, GetReply):
+            schemas = _dev_obj.namespaces.schema
+        return {
+            etree.QName(ret_ele).localname: _etree_to_dict(ret_ele,
+                                                           schemas=schemas,
+                                                           records=records and schemas is not None)
+        }
 
     return _jsonify
@@ -31,7 +31,13 @@ from ncclient.transport.errors import AuthenticationError as NcAuthErr
 import iosxr_eznc.exception
 from iosxr_eznc.rpc import RPC
 from iosxr_eznc.facts import Facts
+from iosxr_eznc.changes import ChangeTracker
+from iosxr_eznc.limiter import AdaptiveLimiter
+from iosxr_eznc.mirror import Mirror
 from iosxr_eznc.namespaces import Namespaces
+from iosxr_eznc.profiler import Profiler
+from iosxr_eznc.transport import LOCAL_AGENT
+from iosxr_eznc.transport import connect_local
 
 
 class Device(object):
@@ -60,12 +66,15 @@ class Device(object):
         self._port = kvargs.get('port', 830)
         self._preload_schemas = kvargs.get('preload_schemas', False)
         self._gather_facts = kvargs.get('gather_facts', True)
+        self._typed = kvargs.get('typed', False)
+        self._release = kvargs.get('release')  # IOS-XR release, selects the namespaces map
+        self._validate_filters = kvargs.get('validate_filters')  # None, 'strict' or 'prune'
         self._facts = {}
 
         if hostname == 'localhost':
             # if the user specifies the host as 'localhost'
             # will assume is running in a container
-            ON_IOSXR = True
+            self.ON_IOSXR = True
 
         # continue processing params
         username = vargs[1] if len(vargs) > 1 else (kvargs.get('user')
@@ -76,13 +85,28 @@ class Device(object):
 
         self._timeout = kvargs.get('timeout')
 
+        self._limiter = None
+        if kvargs.get('adaptive_limit', False):
+            # opt-in: concurrent RPC requests adjusted to what the device can handle
+            self._limiter = AdaptiveLimiter(maximum=kvargs.get('max_rpcs', 32))
+
+        self._profiler = kvargs.get('profile')
+        if self._profiler is True:
+            # samples all the RPC requests, see `Profiler` to share it or to sample less
+            self._profiler = Profiler()
+        elif not self._profiler:
+            self._profiler = None
+
         if self.ON_IOSXR:
             # if on the device, can allow calling without specifying the user, etc.
             self._username = username or os.getenv('USER')  # takes the authenticated user
             self._password = None  # not necessary
             self._ssh_private_key_file = None
             self._ssh_config = None
+            # talks to the local NETCONF agent directly, unless disabled (local_agent=False)
+            self._local_agent = kvargs.get('local_agent', LOCAL_AGENT)
         else:
+            self._local_agent = None
             self._username = username
             self._password = password
             # ssh key options
@@ -90,6 +114,8 @@ class Device(object):
             self._ssh_config = kvargs.get('ssh_config')
 
         self._conn = None
+        self._mirror = None
+        self._changes = None
         self.connected = False
 
     def open(self):
@@ -97,20 +123,27 @@ class Device(object):
         allow_agent = self._password is None and self._ssh_private_key_file is None
 
         try:
-            self._conn = netconf_ssh.connect(host=self._hostname,
-                                             port=self._port,
-                                             username=self._username,
-                                             password=self._password,
-                                             timeout=self._timeout,
-                                             hostkey_verify=False,
-                                             key_filename=self._ssh_private_key_file,
-                                             allow_agent=allow_agent,
-                                             ssh_config=self._ssh_config,
-                                             device_params={'name': 'iosxr'})
+            if self._local_agent:
+                self._conn = connect_local(command=self._local_agent,
+                                           timeout=self._timeout,
+                                           device_params={'name': 'iosxr'})
+            else:
+                self._conn = netconf_ssh.connect(host=self._hostname,
+                                                 port=self._port,
+                                                 username=self._username,
+                                                 password=self._password,
+                                                 timeout=self._timeout,
+                                                 hostkey_verify=False,
+                                                 key_filename=self._ssh_private_key_file,
+                                                 allow_agent=allow_agent,
+                                                 ssh_config=self._ssh_config,
+                                                 device_params={'name': 'iosxr'})
         except NcAuthErr as auth_err:
             raise iosxr_eznc.exception.ConnectAuthError(dev=self)
         except socket.gaierror as host_err:
             raise iosxr_eznc.exception.ConnectError(dev=self, msg='Unknown host.')
+        except OSError as agent_err:
+            raise iosxr_eznc.exception.ConnectError(dev=self, msg='Unable to start the local NETCONF agent.')
         except Exception as err:
             raise iosxr_eznc.exception.ConnectError(dev=self, msg=err.message)  # original error
 
@@ -125,11 +158,15 @@ class Device(object):
 
         self._facts = Facts(self, fetch=self._gather_facts)  # fetch facts
 
+        if not self._release and self._facts.get('os_version'):
+            # namespaces map of the release running on the device
+            self._namespaces.use_release(self._facts['os_version'])
+
         return self
 
-    def refresh_facts(self):
+    def refresh_facts(self, deadline=None):
 
-        self._facts.refresh()
+        self._facts.refresh(deadline=deadline)
 
     def close(self):
 
@@ -175,6 +212,8 @@ class Device(object):
     @timeout.setter
     def timeout(self, val):
         self._timeout = val
+        if self._conn is not None:
+            self._conn.timeout = val  # applies to the next RPC requests
 
     @property
     def namespaces(self):
@@ -184,6 +223,26 @@ class Device(object):
     def namespaces(self, vals):
         self._namespaces.register(vals)
 
+    @property
+    def limiter(self):
+        return self._limiter
+
+    @property
+    def profiler(self):
+        return self._profiler
+
+    @property
+    def mirror(self):
+        if self._mirror is None:
+            self._mirror = Mirror(self)
+        return self._mirror
+
+    @property
+    def changes(self):
+        if self._changes is None:
+            self._changes = ChangeTracker(self)
+        return self._changes
+
     @property
     def facts(self):
         return self._facts
@@ -33,13 +33,13 @@ class ConnectError(Exception):
         if self._dev:
             if self._msg:
                 return '{cls} (host: {host}, message: {msg})'.format(
-                    self.__class__.__name__,
+                    cls=self.__class__.__name__,
                     host=self._dev.hostname,
                     msg=self._msg
                 )
             else:
                 return '{cls} (host: {host})'.format(
-                    self.__class__.__name__,
+                    cls=self.__class__.__name__,
                     host=self._dev.hostname
                 )
         else:
@@ -50,16 +50,30 @@ class ConnectError(Exception):
 
 class RPCError(Exception):
 
+    """
+    Error returned by the device, or raised while preparing the request.
+    When built from an `rpc-error` reply, the details are also available as attributes:
+    `tag` (error-tag), `path` (error-path), `message` (error-message), `type` (error-type),
+    `severity` (error-severity) and `errors`, the details of each error when the reply has many.
+    """
+
     def __init__(self, dev, err):
         self._dev = dev
         self._err = err
+        details = err if isinstance(err, dict) else {}
+        self.tag = details.get('tag')
+        self.path = details.get('path')
+        self.message = details.get('message')
+        self.type = details.get('type')
+        self.severity = details.get('severity')
+        self.errors = details.get('errors', [])
 
     def __repr__(self):
         _err_parts = []
         if self._err:
             if isinstance(self._err, dict):
                 for detail, value in six.iteritems(self._err):
-                    if detail == 'info':
+                    if detail in ('info', 'errors'):
                         continue
                     if value:
                         _err_parts.append('{detail}: {value}'.format(
@@ -163,6 +177,11 @@ class RPCTimeoutError(RPCError):
     pass
 
 
+class DeadlineExceededError(RPCTimeoutError):
+
+    pass
+
+
 class CommitError(RPCError):
 
     pass
@@ -173,6 +192,11 @@ class DiscardChangesError(RPCError):
     pass
 
 
+class CancelCommitError(RPCError):
+
+    pass
+
+
 class DeleteConfigError(RPCError):
 
     pass
@@ -22,6 +22,7 @@ import sys
 import inspect
 
 # import local modules
+from iosxr_eznc import deadline as eznc_deadline
 # ~~~ exceptions ~~~
 from iosxr_eznc.exception import FactsFetchError
 # ~~~ facts fetchers ~~~
@@ -68,12 +69,13 @@ class Facts(dict):
         self._fetch_funs = map(lambda fun: fun.__name__, self._fetchers)
 
 
-    def refresh(self, fun=None):
+    def refresh(self, fun=None, deadline=None):
 
         """
         Refresh facts.
 
         :param fun: Specify the function that refreshes the facts.
+        :param deadline: seconds, or a `Deadline` object, for all the requests of the fetchers.
         """
 
         _funs = self._fetchers
@@ -91,4 +93,5 @@ class Facts(dict):
 
         __collect = lambda fun: fun(self._dev, self)
 
-        map(__collect, self._fetchers)
+        with eznc_deadline.scope(deadline):
+            map(__collect, self._fetchers)
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Adaptive limit of the RPC requests in flight on a device.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import time
+import threading
+
+
+class AdaptiveLimiter(object):
+
+    """
+    AIMD (additive increase, multiplicative decrease) limit of the concurrent RPC requests:
+        * every request completed in time while the limit was reached increases the limit by 1 / limit,
+          i.e. by about 1 for each full round of requests
+        * a timeout, a lost connection, or a request slower than the latency threshold
+          multiplies the limit by `decrease`, at most once per round (the requests in flight
+          when the first one failed are not counted again)
+
+    The latency threshold is `latency_target` when specified,
+    otherwise `slow_ratio` of the device timeout (when the device has a timeout).
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=32, decrease=0.5, latency_target=None, slow_ratio=0.5):
+
+        self._limit = float(initial)
+        self._minimum = minimum
+        self._maximum = maximum
+        self._decrease = decrease
+        self._latency_target = latency_target
+        self._slow_ratio = slow_ratio
+        self._cond = threading.Condition()
+        self._local = threading.local()  # slot held by the thread, for nested requests
+        self._inflight = 0
+        self._seq = 0  # sequence number of the requests started
+        self._recovered = 0  # the failures of the requests started before are ignored
+        self._stats = {
+            'requests': 0,
+            'timeouts': 0,
+            'errors': 0,
+            'slow': 0,
+            'increases': 0,
+            'decreases': 0,
+            'max_inflight': 0,
+            'wait_time': 0.0,
+            'latency': 0.0
+        }
+
+    @property
+    def limit(self):
+        return max(self._minimum, int(self._limit))
+
+    def acquire(self, timeout=None):
+
+        """
+        Waits for a free slot, at most `timeout` seconds when specified.
+        Returns the ticket to pass to `release`, or False when no slot was freed in time.
+        A request sent while the thread already holds a slot (e.g. from the mirror during a commit)
+        does not wait and is not accounted.
+        """
+
+        held = getattr(self._local, 'held', 0)
+        self._local.held = held + 1
+        if held:
+            return None
+
+        start = time.time()
+        with self._cond:
+            while self._inflight >= self.limit:
+                left = start + timeout - time.time() if timeout is not None else None
+                if left is not None and left <= 0:
+                    self._local.held = held
+                    self._stats['wait_time'] += time.time() - start
+                    return False
+                self._cond.wait(left)
+            self._inflight += 1
+            self._seq += 1
+            self._stats['max_inflight'] = max(self._stats['max_inflight'], self._inflight)
+            self._stats['wait_time'] += time.time() - start
+            saturated = self._inflight >= self.limit
+            return (self._seq, saturated, time.time())
+
+    def release(self, ticket, timeout=None, failed=False, congested=False, cancelled=False):
+
+        """
+        Frees the slot and adjusts the limit.
+
+        :param ticket: returned by `acquire`.
+        :param timeout: the RPC timeout of the device.
+        :param failed: the request failed with an error not related to the load (e.g. invalid request).
+        :param congested: the request timed out, or the connection was lost.
+        :param cancelled: the reply was not waited for anymore (deadline): the slot is freed, the limit unchanged.
+        """
+
+        self._local.held -= 1
+        if ticket is None:
+            return
+
+        if cancelled:
+            with self._cond:
+                self._inflight -= 1
+                self._cond.notify_all()
+            return
+
+        seq, saturated, start = ticket
+        latency = time.time() - start
+        threshold = self._latency_target
+        if threshold is None and timeout:
+            threshold = timeout * self._slow_ratio
+        slow = threshold is not None and latency > threshold
+
+        with self._cond:
+            self._inflight -= 1
+            stats = self._stats
+            stats['requests'] += 1
+            stats['latency'] = latency if stats['requests'] == 1 else 0.9 * stats['latency'] + 0.1 * latency
+            if congested:
+                stats['timeouts'] += 1
+            elif failed:
+                stats['errors'] += 1
+            if slow:
+                stats['slow'] += 1
+            if congested or slow:
+                if seq > self._recovered:
+                    self._limit = max(self._minimum, self._limit * self._decrease)
+                    self._recovered = self._seq
+                    stats['decreases'] += 1
+            elif saturated and not failed and self._limit < self._maximum:
+                self._limit = min(self._maximum, self._limit + 1.0 / self._limit)
+                stats['increases'] += 1
+            self._cond.notify_all()
+
+    def stats(self):
+
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'limit': self.limit,
+                'inflight': self._inflight
+            })
+            return stats
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Local mirror of the running configuration.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import copy
+import time
+import threading
+
+# import third party
+from lxml import etree
+
+# import local modules
+from iosxr_eznc.exception import RPCError
+from iosxr_eznc.exception import ConnectError
+from iosxr_eznc.decorators import _split_tag
+from iosxr_eznc.decorators import _etree_to_dict
+from iosxr_eznc.config import find_match
+from iosxr_eznc.config import qualified_tree
+from iosxr_eznc.config import _is_leaf
+from iosxr_eznc.config import _schema_child
+from iosxr_eznc.config import _OPERATION_ATTR
+
+
+COMMIT_HISTORY_FILTER = '''
+<cfg-hist-gl xmlns="http://cisco.com/ns/yang/Cisco-IOS-XR-config-cfgmgr-exec-oper">
+  <record-type>
+    <record-type>commit</record-type>
+  </record-type>
+</cfg-hist-gl>
+'''
+
+
+def commit_history(dev):
+
+    """
+    Returns the IDs of the configuration commits, from the configuration history, the last one last.
+    """
+
+    data = dev.rpc.get(COMMIT_HISTORY_FILTER, raw=True)
+    if data is None:
+        return []
+    commit_ids = [
+        (int(record.findtext('{*}record') or 0), record.findtext('{*}info/{*}commit-info/{*}commit-id'))
+        for record in data.iterfind('.//{*}record-type/{*}record')
+    ]
+    return [commit_id for (_, commit_id) in sorted(commit_ids)]
+
+
+def last_commit_id(dev):
+
+    """
+    Returns the ID of the last configuration commit, from the configuration history.
+    """
+
+    commit_ids = commit_history(dev)
+    if not commit_ids:
+        return None
+    return commit_ids[-1]
+
+
+def _strip_operations(ele):
+
+    for sub_ele in ele.iter():
+        if _OPERATION_ATTR in sub_ele.attrib:
+            del sub_ele.attrib[_OPERATION_ATTR]
+    return ele
+
+
+def apply_edit(parent, ele, node=None, schemas=None, operation='merge'):
+
+    """
+    Applies an edit-config element to the configuration tree under `parent`, in place,
+    following the NETCONF semantics of the operation attributes.
+    """
+
+    operation = ele.get(_OPERATION_ATTR, operation)
+    match = find_match(parent, ele, node)
+
+    if operation in ('delete', 'remove'):
+        if match is not None:
+            parent.remove(match)
+        return
+
+    if operation == 'replace' or (match is None and operation in ('merge', 'create')):
+        new = _strip_operations(copy.deepcopy(ele))
+        if match is None:
+            parent.append(new)
+        else:
+            parent.replace(match, new)
+        return
+
+    if match is None:
+        # operation "none" on a node not existing yet: created only if any child is
+        match = etree.SubElement(parent, ele.tag, nsmap=ele.nsmap)
+
+    if _is_leaf(ele, node):
+        if operation != 'none':
+            match.text = ele.text
+        return
+
+    for child in ele:
+        if not isinstance(child.tag, basestring):
+            continue
+        apply_edit(match, child, _schema_child(node, schemas, child.tag), schemas, operation)
+
+    if not len(match) and operation == 'none':
+        parent.remove(match)
+
+
+class Mirror(object):
+
+    """
+    Local copy of the running configuration of a device, loaded once per top level container.
+
+    The mirror is kept up to date with the changes committed through this library:
+    the edits sent to the candidate are applied locally when committed, and dropped when discarded.
+    Changes committed by other sessions are detected using the ID of the last commit (`change_check`):
+    only when it changed, the containers are downloaded again.
+
+    The `change_check` runs before reading the mirror, at most once every `check_interval` seconds.
+
+    After a commit through this library, `history(dev)` returns the tokens of the last commits
+    (as returned by `change_check`), the last one last: when the commit before ours is the last one
+    the mirror knows about, the new token is ours and nothing is downloaded again.
+    Otherwise, or without `history` (default: `commit_history` with the default `change_check`),
+    the containers are downloaded again, when read.
+    """
+
+    def __init__(self, dev, change_check=last_commit_id, check_interval=0, schema=True, history=None):
+
+        self._dev = dev
+        self._change_check = change_check
+        if history is None and change_check is last_commit_id:
+            history = commit_history
+        self._history = history
+        self._check_interval = check_interval
+        self._schema = schema
+        self._data = etree.Element('data')
+        self._loaded = set()
+        self._pending = []
+        self._token = None
+        self._checked = 0
+        self._lock = threading.RLock()
+
+    def _schemas(self):
+
+        return self._dev.namespaces.schema if self._schema else None
+
+    def _container(self, container):
+
+        if not (etree.iselement(container) and container.tag[0] == '{'):
+            container = qualified_tree(container, self._dev)
+        return etree.Element(container.tag, nsmap=container.nsmap)
+
+    def _load(self, container):
+
+        data = self._dev.rpc.get_configuration(filter=copy.deepcopy(container), raw=True)
+        running = data.find(container.tag) if data is not None else None
+        if running is None:
+            running = copy.deepcopy(container)  # empty
+        current = self._data.find(container.tag)
+        if current is None:
+            self._data.append(running)
+        else:
+            self._data.replace(current, running)
+        self._loaded.add(container.tag)
+
+    def sync(self, force=False):
+
+        """
+        Checks if the running configuration was changed by another session.
+        If so, the loaded containers are downloaded again, when read.
+        """
+
+        with self._lock:
+            if self._change_check is None:
+                if force:
+                    self._loaded = set()
+                return force
+            if not force and time.time() - self._checked < self._check_interval:
+                return False
+            token = self._change_check(self._dev)
+            self._checked = time.time()
+            if not force and token is not None and token == self._token:
+                return False
+            self._token = token
+            self._loaded = set()
+            return True
+
+    def tree(self, container):
+
+        """
+        Returns the running configuration of a top level container, as an XML element.
+        The element belongs to the mirror and must not be changed.
+        """
+
+        container = self._container(container)
+        with self._lock:
+            self.sync()
+            if container.tag not in self._loaded:
+                self._load(container)
+            return self._data.find(container.tag)
+
+    def get(self, container, typed=None):
+
+        """
+        Returns the running configuration of a top level container,
+        with the same structure as returned by `RPC.get_configuration`.
+        """
+
+        if typed is None:
+            typed = self._dev._typed
+        schemas = self._dev.namespaces.schema if typed else None
+        with self._lock:
+            running = self.tree(container)
+            namespace, name = _split_tag(running.tag)
+            node = schemas(namespace).get(name) if schemas is not None else None
+            return {
+                'data': {
+                    name: _etree_to_dict(running, node=node, schemas=schemas)
+                }
+            }
+
+    def stage(self, config, operation='merge'):
+
+        """
+        Records an edit sent to the candidate datastore.
+        """
+
+        if not etree.iselement(config):
+            config = etree.fromstring(config)
+        with self._lock:
+            self._pending.append((copy.deepcopy(config), operation or 'merge'))
+
+    def discard(self):
+
+        with self._lock:
+            self._pending = []
+
+    def commit(self):
+
+        """
+        Applies the edits staged in the candidate to the mirror.
+        """
+
+        with self._lock:
+            schemas = self._schemas()
+            for config, operation in self._pending:
+                for container in config:
+                    if not isinstance(container.tag, basestring) or container.tag not in self._loaded:
+                        continue  # not mirrored, will be loaded when needed
+                    apply_edit(self._data,
+                               container,
+                               _schema_child(None, schemas, container.tag),
+                               schemas,
+                               operation)
+            self._pending = []
+            if self._change_check is not None:
+                try:
+                    self._after_commit()
+                except (RPCError, ConnectError):
+                    # committed anyway: download again when read
+                    self._token = None
+                    self._loaded = set()
+
+    def _after_commit(self):
+
+        """
+        Takes the token of our commit, unless another session committed since the last check.
+        """
+
+        history = self._history(self._dev) if self._history is not None else []
+        self._checked = time.time()
+        if len(history) >= 2 and self._token is not None and history[-2] == self._token:
+            self._token = history[-1]  # the last commit is ours, nothing to download
+            return
+        self._token = history[-1] if history else None
+        self._loaded = set()
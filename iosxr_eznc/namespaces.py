@@ -20,36 +20,55 @@ Handles IOS-XR namespaces.
 # import stdlib
 import re
 import six
+import logging
+import threading
 
 # import third party
 import yaml
 import pyang
-from pyang.translators.yin import emit_yin
-from lxml import etree
 
 # import local modules
 from iosxr_eznc.exception import RPCError
+from iosxr_eznc.exception import InvalidRequestError
+from iosxr_eznc.schema import compile_module
 from iosxr_eznc.utils import namespaces as NS
 
 
-class _MetaString(str):
+log = logging.getLogger(__name__)
 
-    def __init__(self, val=''):
-        self._val = val
+# pyang errors of the modules (or their imports) that could not be retrieved
+_FETCH_ERRORS = ('READ_ERROR', 'MODULE_NOT_FOUND', 'MODULE_NOT_FOUND_REV')
 
-    def write(self, val):
-        self._val += val
+class _MetaPyangCtxOpts(object):
 
-    def __str__(self):
-        return self._val
+    """
+    Options of the pyang context: none needed, only parsing and validating.
+    """
 
-    __repr__ = __str__
 
+class _DeviceRepository(pyang.Repository):
 
-class _MetaPyangCtxOpts(object):
+    """
+    pyang repository serving the YANG modules advertised by the device.
+    The modules are retrieved only when pyang needs them.
+    """
+
+    def __init__(self, namespaces):
+        pyang.Repository.__init__(self)
+        self._namespaces = namespaces
+
+    def get_modules_and_revisions(self, ctx):
+        # all the modules advertised, including the submodules sharing the namespace of their module
+        return [
+            (module, revision, module)
+            for (_, module, revision) in self._namespaces.advertised()
+        ]
 
-    yin_canonical = True
-    yin_pretty_strings = True
+    def get_module_from_handle(self, handle):
+        raw_yang_module = self._namespaces.get_yang_source(handle)
+        if raw_yang_module is None:
+            raise self.ReadError('Unable to retrieve {module}'.format(module=handle))
+        return (handle, 'yang', raw_yang_module)
 
 
 class Namespaces(dict):
@@ -57,12 +76,23 @@ class Namespaces(dict):
     _NS_REGEX = r'^(.*)\/(.*)\/([a-zA-Z0-9-_]*)$'
     _CAPAB_REGEX = r'^(.*)\/yang\/(.*)\?module=([a-zA-Z0-9-_]*)&(.*)$'
     # based on the capability format as per RFC 6020, paragraph 5.6.4
+    _REVISION_REGEX = r'revision=([0-9-]+)'
+
+    _SCHEMAS = {}
+    # compiled schema trees, per (module, revision)
+    # shared by all the devices advertising the same revision
 
     def __init__(self, dev=None):
 
         self._dev = dev
         self._namespaces = {}
+        self._custom = {}
+        self._index = None  # container name -> namespaces
+        self._release = getattr(dev, '_release', None)
         self._fetched_namespaces = True
+        self._modules = None
+        self._schema_ctx = None
+        self._schema_lock = threading.Lock()
         if self._dev is not None:
             # load default namespaces as of IOS-XR 6.0.1
             self._load_default_namespaces()
@@ -83,10 +113,24 @@ class Namespaces(dict):
     def _load_default_namespaces(self):
 
         """
-        Loads the standard namespaces.
+        Loads the standard namespaces, of the release of the device when known.
+        """
+
+        self._namespaces = dict(NS.load(self._release))
+        self._reqister_dict(self._custom)
+        self._index = None
+
+    def use_release(self, release):
+
+        """
+        Switches to the namespaces map of a specific release, keeping the custom namespaces registered.
         """
 
-        self._namespaces = NS.MAP
+        if NS.load(release) is NS.load(self._release):
+            self._release = release
+            return
+        self._release = release
+        self._load_default_namespaces()
 
     def _get_schema_ns(self, ns):
 
@@ -109,34 +153,52 @@ class Namespaces(dict):
         self.ctx.opts = _MetaPyangCtxOpts()
 
     @staticmethod
-    def _get_container_name(ele):
-        return ele.attrib.get('name', '')
+    def _module_containers(stmt, containers, used=None):
+
+        """
+        Collects the names of the top level containers of the data tree:
+        defined by the statement directly, or through the `uses` of groupings.
+        The groupings are the ones resolved by pyang when validating the module,
+        thus found in the module itself, in its submodules or in the modules imported.
+        """
+
+        if used is None:
+            used = set()
+        for sub_stmt in stmt.substmts:
+            if sub_stmt.keyword == 'container':
+                if str(sub_stmt.arg) not in containers:
+                    containers.append(str(sub_stmt.arg))
+            elif sub_stmt.keyword == 'uses':
+                grouping = getattr(sub_stmt, 'i_grouping', None)
+                if grouping is None or id(grouping) in used:
+                    # not resolved: the module defining it could not be found
+                    continue
+                used.add(id(grouping))
+                Namespaces._module_containers(grouping, containers, used)
 
     def yang_register(self, name, raw_yang_module):
 
-        yin_output = _MetaString()
-        yang_module = self.ctx.add_module(name, raw_yang_module)
-        if yang_module.keyword != 'module':
+        self._register_module(self.ctx.add_module(name, raw_yang_module))
+
+    def _register_module(self, yang_module):
+
+        if yang_module is None or yang_module.keyword != 'module':
             return
-        emit_yin(self.ctx, yang_module, yin_output)
-        # stripping namespaces
-        yin_output = str(yin_output).replace('<xr:', '<')
-        try:
-            yin_tree = etree.fromstring(yin_output)
-        except etree.XMLSyntaxError as err:
+        namespace = yang_module.search_one('namespace')
+        if namespace is None:
             return
-        namespace = yin_tree.xpath('*[name()="namespace"]')[0].attrib.get('uri')
         # with these containers
-        _containers = yin_tree.xpath('*[name()="container"] | *[name()="grouping"]/container')
-        if not _containers:
+        containers = []
+        self._module_containers(yang_module, containers)
+        if not containers:
             # no containers, no phun
             return
-        containers = map(self._get_container_name, _containers)
 
-        self.register({namespace: containers})
+        self.register({str(namespace.arg): containers})
 
     def _reqister_dict(self, namespaces):
 
+        self._index = None
         for ns, containers in six.iteritems(namespaces):
             if isinstance(containers, list):
                 self._namespaces[ns] = containers
@@ -162,31 +224,136 @@ class Namespaces(dict):
         """
 
         if isinstance(namespaces, dict):
+            self._custom.update(namespaces)
             return self._reqister_dict(namespaces)
         elif isinstance(namespaces, list):
             for namepsace in namespaces:
                 if isinstance(namepsace, dict):
+                    self._custom.update(namepsace)
                     return self._reqister_dict(namepsace)
 
-    def _fetch(self, schemas):
+    def modules(self):
 
         """
-        Retrieves the yang models from the device and builds a namespace-container map.
+        Returns the YANG modules advertised by the device,
+        as a dictionary mapping the namespace to the (module, revision) tuple.
         """
 
-        self.init_pyang_context()
+        if self._modules is None:
+            modules = {}
+            for namespace, module, revision in self.advertised():
+                known = modules.get(namespace)
+                # the submodules share the namespace of their module, and are named after it
+                if known is None or known[0].startswith(module):
+                    modules[namespace] = (module, revision)
+            self._modules = modules
+        return self._modules
 
-        for schema in schemas:
-            if schema is None:
-                # could not parse properly the capability
+    def advertised(self):
+
+        """
+        Returns the list of (namespace, module, revision) tuples of the YANG modules in the device capabilities.
+        """
+
+        advertised = []
+        for capability in self._capabilities:
+            module = self._get_schema_capab(capability)
+            if not module:
                 continue
-            print 'retrieving schema', schema
+            namespace, _, params = capability.partition('?')
+            rgx_search = re.search(self._REVISION_REGEX, params)
+            revision = rgx_search.group(1) if rgx_search else None
+            advertised.append((namespace, module, revision))
+        return advertised
+
+    def get_yang_source(self, module):
+
+        """
+        Retrieves the source of a YANG module from the device.
+        """
+
+        try:
+            schema_content_reply = self._dev.rpc.get_schema(module, format='yang')
+        except RPCError:
+            return
+        return schema_content_reply.get('data')
+
+    def _device_context(self):
+
+        """
+        Returns the pyang context retrieving the modules from the device,
+        shared by the namespaces fetched and the schemas compiled.
+        """
+
+        if self._schema_ctx is None:
+            self._schema_ctx = pyang.Context(_DeviceRepository(self))
+            self._schema_ctx.opts = _MetaPyangCtxOpts()
+        return self._schema_ctx
+
+    def _compile_schema(self, module, revision):
+
+        """
+        Retrieves and compiles a YANG module. Returns None when not possible:
+        the pyang context is dropped as well, as it remembers the modules not found.
+        """
+
+        with self._schema_lock:
+            self._device_context()
+            errors = len(self._schema_ctx.errors)
             try:
-                schema_content_reply = self._dev.rpc.get_schema(schema, format='yang')
-            except RPCError:
-                continue
-            raw_yang_module = schema_content_reply.xpath('data')[0].text
-            self.yang_register(schema, raw_yang_module)
+                yang_module = self._schema_ctx.search_module(pyang.error.Position(module), module, revision)
+                if yang_module is not None:
+                    self._schema_ctx.validate()
+                failed = [
+                    str(args) for (_, tag, args) in self._schema_ctx.errors[errors:] if tag in _FETCH_ERRORS
+                ]
+                if yang_module is None or failed:
+                    log.warning('Unable to retrieve the YANG module %s (revision %s): %s',
+                                module, revision, ', '.join(failed))
+                    self._schema_ctx = None
+                    return None
+                return compile_module(yang_module)
+            except Exception as err:
+                log.warning('Unable to compile the YANG module %s (revision %s): %s', module, revision, err)
+                self._schema_ctx = None
+                return None
+
+    def schema(self, namespace):
+
+        """
+        Returns the compiled schema tree of the YANG module defining `namespace`,
+        as a dictionary mapping the top level data nodes to SchemaNode objects.
+        The module and its imports are retrieved from the device and compiled only once;
+        when not possible (e.g. get-schema failed), the schema is empty and retrieved again the next time.
+        """
+
+        module = self.modules().get(namespace)
+        if module is None:
+            return {}
+        schema = self._SCHEMAS.get(module)
+        if schema is None:
+            schema = self._compile_schema(*module)
+            if schema is None:
+                return {}
+            schema = self._SCHEMAS.setdefault(module, schema)
+        return schema
+
+    def _fetch(self, schemas):
+
+        """
+        Retrieves the yang models from the device and builds a namespace-container map.
+        The modules stay loaded in the device pyang context, reused when compiling the schemas.
+        """
+
+        with self._schema_lock:
+            ctx = self._device_context()
+            for schema in schemas:
+                if schema is None:
+                    # could not parse properly the capability
+                    continue
+                print 'retrieving schema', schema
+                # the imports and submodules are retrieved as well, to resolve the groupings
+                self._register_module(ctx.search_module(pyang.error.Position(schema), schema))
 
     def get(self, container=None, oper=None):
 
@@ -195,18 +362,34 @@ class Namespaces(dict):
         """
         if not container:
             return self._namespaces
+        if self._index is None:
+            index = {}
+            for ns, containers in six.iteritems(self._namespaces):
+                for cont in containers:
+                    nss = index.setdefault(cont.lower(), [])
+                    if ns not in nss:
+                        nss.append(ns)
+            self._index = index
         _nss = []
-        for ns, containers in six.iteritems(self._namespaces):
+        for ns in self._index.get(container.lower(), []):
             if oper is True and not ns.endswith('-oper'):
                 continue
             if oper is False and not ns.endswith('-cfg'):
                 continue
-            for cont in containers:
-                if cont.lower() == container.lower():
-                    _nss.append(ns)
+            _nss.append(ns)
         if len(_nss) > 1:
             # ambiguous
-            raise RPCError(self._dev, 'Please specify the namespace.')
+            raise InvalidRequestError(
+                self._dev,
+                {
+                    'obj': container,
+                    'msg': 'Ambiguous container, please specify the module, e.g. "{module}:{container}"'.format(
+                        module=self._get_schema_ns(_nss[0]),
+                        container=container
+                    ),
+                    'namespaces': ', '.join(sorted(_nss))
+                }
+            )
         elif len(_nss) == 1:
             return _nss[0]
         return
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Pool of open device sessions, leased to the ad-hoc requests.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+# import local modules
+from iosxr_eznc.device import Device
+from iosxr_eznc.exception import ConnectError
+
+
+log = logging.getLogger(__name__)
+
+# small operational request, answered right away
+PROBE_FILTER = '''
+<system-time xmlns="http://cisco.com/ns/yang/Cisco-IOS-XR-shellutil-oper">
+  <uptime/>
+</system-time>
+'''
+
+
+def probe(dev):
+
+    """
+    Default health check: a round trip with a small request.
+    """
+
+    dev.rpc.get(PROBE_FILTER, raw=True)
+    return True
+
+
+class _Idle(object):
+
+    __slots__ = ('dev', 'since', 'checked')
+
+    def __init__(self, dev, checked):
+
+        self.dev = dev
+        self.since = time.time()  # idle since
+        self.checked = checked  # last health check
+
+
+class DevicePool(object):
+
+    """
+    Keeps open Device sessions per host, so the requests pay only the RPC round trip,
+    not the SSH authentication, the capabilities exchange, the namespaces and the facts.
+
+        * at most `max_size` sessions per host, leased or idle; `lease` waits for one to be returned
+        * at least `min_idle` idle sessions per known host (warmed or leased before),
+          opened by `maintain`, also evicting the sessions idle for more than `idle_timeout` seconds
+        * at most `max_idle` idle sessions per host (default `max_size`), the others are closed when returned
+        * before leasing, a session idle for more than `check_interval` seconds is checked
+          with `health_check(dev)` (default: a small get request); if broken, it is closed and replaced
+
+    The devices are built by `factory(host)` when specified, otherwise using `Device(host, **device_kvargs)`.
+    E.g.:
+    >>> pool = DevicePool(user='admin', password='...', max_size=2).start()
+    >>> with pool.session('router1') as dev:
+    ...     dev.rpc.get('bgp/instances')
+    """
+
+    def __init__(self,
+                 factory=None,
+                 min_idle=0,
+                 max_size=4,
+                 max_idle=None,
+                 idle_timeout=600,
+                 check_interval=30,
+                 health_check=probe,
+                 **device_kvargs):
+
+        self._factory = factory
+        self._min_idle = min_idle
+        self._max_size = max_size
+        self._max_idle = max_size if max_idle is None else max_idle
+        self._idle_timeout = idle_timeout
+        self._check_interval = check_interval
+        self._health_check = health_check
+        self._device_kvargs = device_kvargs
+        self._idle = {}  # host -> list of _Idle, most recently returned last
+        self._size = {}  # host -> sessions open (or opening), leased or idle
+        self._hosts = {}  # id(dev) -> host the session was opened for, leased or idle
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = threading.Event()
+        self._closed = False
+        self._stats = {'opened': 0, 'closed': 0, 'leased': 0, 'reused': 0, 'failed_checks': 0, 'waits': 0}
+
+    def _open(self, host):
+
+        if self._factory is not None:
+            dev = self._factory(host)
+        else:
+            dev = Device(host, **self._device_kvargs)
+        if not dev.connected:
+            dev.open()
+        with self._cond:
+            # the hostname of the device may differ from the host requested, e.g. built by the factory
+            self._hosts[id(dev)] = host
+        return dev
+
+    def _close(self, dev):
+
+        with self._cond:
+            host = self._hosts.pop(id(dev))
+            self._size[host] -= 1
+            self._stats['closed'] += 1
+            self._cond.notify_all()
+        try:
+            if dev._conn is not None and dev._conn.connected:
+                dev.close()
+        except Exception as err:
+            log.debug('Unable to close the session with %s: %s', host, err)
+
+    def _healthy(self, host, idle):
+
+        if not idle.dev.connected or not idle.dev._conn.connected:
+            return False
+        if self._health_check is None or time.time() - idle.checked < self._check_interval:
+            return True
+        try:
+            return bool(self._health_check(idle.dev))
+        except Exception as err:  # whatever the check raises, the session is not usable
+            log.info('Health check failed for %s: %s', host, err)
+            return False
+
+    def lease(self, host, timeout=None):
+
+        """
+        Returns an open Device object for `host`, to be given back using `release`.
+        Waits up to `timeout` seconds (forever by default) when all the sessions with the host are leased.
+        """
+
+        deadline = time.time() + timeout if timeout is not None else None
+        while True:
+            idle = None
+            with self._cond:
+                if self._closed:
+                    raise ConnectError(msg='The pool is closed.')
+                self._size.setdefault(host, 0)
+                self._idle.setdefault(host, [])
+                if self._idle[host]:
+                    idle = self._idle[host].pop()  # the most recently used is the least likely to be broken
+                elif self._size[host] < self._max_size:
+                    self._size[host] += 1  # reserved, opening below
+                else:
+                    remaining = deadline - time.time() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        raise ConnectError(msg='No session available with {host}.'.format(host=host))
+                    self._stats['waits'] += 1
+                    self._cond.wait(remaining)
+                    continue
+            if idle is None:
+                try:
+                    dev = self._open(host)
+                except Exception:
+                    with self._cond:
+                        self._size[host] -= 1
+                        self._cond.notify_all()
+                    raise
+                with self._cond:
+                    self._stats['opened'] += 1
+                    self._stats['leased'] += 1
+                return dev
+            if self._healthy(host, idle):
+                with self._cond:
+                    self._stats['reused'] += 1
+                    self._stats['leased'] += 1
+                return idle.dev
+            with self._cond:
+                self._stats['failed_checks'] += 1
+            self._close(idle.dev)
+
+    def release(self, dev, discard=False):
+
+        """
+        Gives back a leased Device object. With `discard`, or when the session is broken, the session is closed.
+        """
+
+        with self._cond:
+            host = self._hosts[id(dev)]
+            keep = not (discard or self._closed or not dev.connected) and \
+                len(self._idle.get(host, [])) < self._max_idle
+            if keep:
+                self._idle.setdefault(host, []).append(_Idle(dev, time.time()))
+                self._cond.notify_all()
+        if not keep:
+            self._close(dev)
+
+    @contextmanager
+    def session(self, host, timeout=None):
+
+        """
+        Leases a Device object for the duration of the block.
+        The session is closed instead of being returned when the connection was lost.
+        """
+
+        dev = self.lease(host, timeout=timeout)
+        try:
+            yield dev
+        except ConnectError:
+            self.release(dev, discard=True)
+            raise
+        except Exception:
+            self.release(dev)
+            raise
+        else:
+            self.release(dev)
+
+    def warm(self, hosts):
+
+        """
+        Opens `min_idle` sessions with each of the `hosts`.
+        """
+
+        with self._cond:
+            for host in hosts:
+                self._size.setdefault(host, 0)
+                self._idle.setdefault(host, [])
+        self.maintain()
+
+    def maintain(self):
+
+        """
+        Closes the sessions idle for too long and opens the missing ones, up to `min_idle` per host.
+        """
+
+        now = time.time()
+        expired = []
+        missing = []
+        with self._cond:
+            for host, idles in self._idle.items():
+                removable = len(idles) - self._min_idle
+                kept = []
+                for idle in idles:  # least recently returned first
+                    if removable > 0 and now - idle.since >= self._idle_timeout:
+                        expired.append(idle.dev)
+                        removable -= 1
+                    else:
+                        kept.append(idle)
+                self._idle[host] = kept
+                count = min(self._min_idle - len(self._idle[host]), self._max_size - self._size[host])
+                if count > 0:
+                    self._size[host] += count
+                    missing.extend([host] * count)
+        for dev in expired:
+            self._close(dev)
+        for host in missing:
+            try:
+                dev = self._open(host)
+            except Exception as err:
+                log.warning('Unable to open a session with %s: %s', host, err)
+                with self._cond:
+                    self._size[host] -= 1
+                    self._cond.notify_all()
+                continue
+            with self._cond:
+                self._stats['opened'] += 1
+                self._idle[host].insert(0, _Idle(dev, time.time()))
+                self._cond.notify_all()
+
+    def _run(self, interval):
+
+        while not self._stopped.wait(interval):
+            try:
+                self.maintain()
+            except Exception:
+                log.exception('Pool maintenance failed')
+
+    def start(self, interval=10):
+
+        """
+        Runs `maintain` in the background every `interval` seconds.
+        """
+
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, args=(interval,), name='iosxr-eznc-pool')
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def close(self):
+
+        """
+        Stops the maintenance and closes the idle sessions; the leased ones are closed when returned.
+        """
+
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._cond:
+            self._closed = True
+            idles = [idle.dev for host_idles in self._idle.values() for idle in host_idles]
+            self._idle = {}
+            self._cond.notify_all()
+        for dev in idles:
+            self._close(dev)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def stats(self):
+
+        with self._cond:
+            stats = dict(self._stats)
+            stats['hosts'] = dict([
+                (host, {'size': size, 'idle': len(self._idle.get(host, []))})
+                for (host, size) in self._size.items()
+            ])
+        return stats
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Profiling of the RPC requests: CPU (cProfile) and memory (tracemalloc, when available).
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import os
+import re
+import time
+import pstats
+import random
+import cProfile
+import threading
+from collections import Counter
+
+try:
+    import tracemalloc  # Python 3.4+
+    HAS_TRACEMALLOC = True
+except ImportError:
+    HAS_TRACEMALLOC = False
+
+# import third party
+from lxml import etree
+
+
+_TAG_RGX = re.compile(r'''<\s*(?:[\w.-]+:)?([\w.-]+)''')
+_WRAPPER_TAGS = ('filter', 'config')
+
+
+def container_name(request):
+
+    """
+    Returns the name of the top level container of a request (XML string or element, or XPath-like).
+    """
+
+    if request is None:
+        return None
+    if etree.iselement(request):
+        ele = request
+        if etree.QName(ele).localname in _WRAPPER_TAGS and len(ele):
+            ele = ele[0]
+        return etree.QName(ele).localname
+    request = request.strip()
+    if request.startswith('<'):
+        for tag in _TAG_RGX.findall(request):
+            if tag not in _WRAPPER_TAGS:
+                return tag
+        return None
+    return re.split(r'[/\[]', request, 1)[0].split(':')[-1] or None
+
+
+class _Entry(object):
+
+    __slots__ = ('calls', 'sampled', 'time', 'max_time', 'profile', 'peak', 'allocations')
+
+    def __init__(self):
+
+        self.calls = 0
+        self.sampled = 0
+        self.time = 0.0
+        self.max_time = 0.0
+        self.profile = None  # pstats.Stats of the sampled calls
+        self.peak = 0  # highest memory peak of a sampled call, in bytes
+        self.allocations = Counter()  # size allocated per source line, over the sampled calls
+
+
+class Profiler(object):
+
+    """
+    Profiles a sample of the RPC requests, through the whole decorator chain
+    (building and qualifying the request, transport, parsing the reply),
+    aggregating the results per (RPC method, top level container).
+
+    A request is sampled with the probability `sample_rate`, and only when no other request is being profiled:
+    both cProfile and tracemalloc can only follow one request at a time.
+    With `memory` and when tracemalloc is available (Python 3), the peak and the `top` allocations are recorded.
+
+    Enable it using `Device(profile=True)` (or a Profiler object, to share it between devices), or temporarily:
+    >>> with Profiler(devices=[dev]) as profiler:
+    ...     dev.rpc.get('interfaces')
+    >>> profiler.dump('/tmp/profiles')  # one .prof file per (method, container), for snakeviz & co
+    """
+
+    def __init__(self, devices=None, sample_rate=1.0, memory=True, top=10):
+
+        self._devices = list(devices or [])
+        self._sample_rate = sample_rate
+        self._memory = memory and HAS_TRACEMALLOC
+        self._top = top
+        self._entries = {}
+        self._busy = threading.Lock()
+        self._lock = threading.Lock()
+        self._previous = {}
+
+    def __enter__(self):
+
+        for dev in self._devices:
+            self._previous[dev] = dev._profiler
+            dev._profiler = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+
+        for dev in self._devices:
+            dev._profiler = self._previous.pop(dev, None)
+
+    def _allocations(self, snapshot, baseline):
+
+        """
+        Returns the `top` (source line, size) allocated while profiling.
+        """
+
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        snapshot = snapshot.filter_traces(filters)
+        if baseline is None:
+            stats = [(stat.traceback[0], stat.size) for stat in snapshot.statistics('lineno')]
+        else:
+            # was already tracing, before profiling
+            stats = [(stat.traceback[0], stat.size_diff)
+                     for stat in snapshot.compare_to(baseline.filter_traces(filters), 'lineno')]
+        return [
+            ('{file}:{line}'.format(file=frame.filename, line=frame.lineno), size)
+            for (frame, size) in stats[:self._top] if size > 0
+        ]
+
+    def run(self, method, container, fun, *vargs, **kvargs):
+
+        """
+        Calls `fun`, profiling it when sampled.
+        """
+
+        sampled = random.random() < self._sample_rate and self._busy.acquire(False)
+        if not sampled:
+            start = time.time()
+            try:
+                return fun(*vargs, **kvargs)
+            finally:
+                self._record((method, container), time.time() - start)
+        try:
+            return self._profile((method, container), fun, *vargs, **kvargs)
+        finally:
+            self._busy.release()
+
+    def _profile(self, key, fun, *vargs, **kvargs):
+
+        started, baseline = False, None
+        if self._memory:
+            if tracemalloc.is_tracing():
+                baseline = tracemalloc.take_snapshot()
+            else:
+                tracemalloc.start()
+                started = True
+            if hasattr(tracemalloc, 'reset_peak'):  # Python 3.9+
+                tracemalloc.reset_peak()
+        profile = cProfile.Profile()
+        start = time.time()
+        try:
+            return profile.runcall(fun, *vargs, **kvargs)
+        finally:
+            duration = time.time() - start
+            peak, allocations = 0, []
+            if self._memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                allocations = self._allocations(tracemalloc.take_snapshot(), baseline)
+                if started:
+                    tracemalloc.stop()
+            profile.create_stats()
+            self._record(key, duration, profile, peak, allocations)
+
+    def _record(self, key, duration, profile=None, peak=0, allocations=()):
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry()
+            entry.calls += 1
+            entry.time += duration
+            entry.max_time = max(entry.max_time, duration)
+            if profile is None:
+                return
+            entry.sampled += 1
+            if entry.profile is None:
+                entry.profile = pstats.Stats(profile)
+            else:
+                entry.profile.add(profile)
+            entry.peak = max(entry.peak, peak)
+            for location, size in allocations:
+                entry.allocations[location] += size
+
+    def reset(self):
+
+        with self._lock:
+            self._entries = {}
+
+    def stats(self, top=None):
+
+        """
+        Returns the aggregated results, slowest first:
+        calls, sampled calls, total / average / max time, memory peak and top allocations (when traced),
+        and the `top` functions by cumulative time.
+        """
+
+        top = top or self._top
+        results = []
+        with self._lock:
+            for (method, container), entry in self._entries.items():
+                functions = []
+                if entry.profile is not None:
+                    by_cumulative = sorted(entry.profile.stats.items(), key=lambda item: item[1][3], reverse=True)
+                    for (filename, line, name), (_, calls, own, cumulative, _) in by_cumulative[:top]:
+                        functions.append({
+                            'function': '{file}:{line}({name})'.format(file=filename, line=line, name=name),
+                            'calls': calls,
+                            'time': own,
+                            'cumulative': cumulative
+                        })
+                results.append({
+                    'method': method,
+                    'container': container,
+                    'calls': entry.calls,
+                    'sampled': entry.sampled,
+                    'time': entry.time,
+                    'avg_time': entry.time / entry.calls,
+                    'max_time': entry.max_time,
+                    'peak_memory': entry.peak if self._memory else None,
+                    'allocations': entry.allocations.most_common(top) if self._memory else None,
+                    'functions': functions
+                })
+        return sorted(results, key=lambda result: result['time'], reverse=True)
+
+    def dump(self, path):
+
+        """
+        Writes the cProfile stats of each (method, container) into `path`, as `<method>-<container>.prof`.
+        Returns the files written.
+        """
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        files = []
+        with self._lock:
+            for (method, container), entry in self._entries.items():
+                if entry.profile is None:
+                    continue
+                filename = re.sub(r'[^\w.-]', '_', '{method}-{container}.prof'.format(method=method,
+                                                                                     container=container or 'all'))
+                filepath = os.path.join(path, filename)
+                entry.profile.dump_stats(filepath)
+                files.append(filepath)
+        return files
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Compact record types generated from the YANG schema.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import re
+from six.moves import intern
+
+
+_NON_IDENTIFIER_RGX = re.compile(r'[^0-9a-zA-Z_]')
+
+_RECORD_CLASSES = {}
+# generated classes, per schema node
+
+
+def _attr_name(yang_name):
+
+    attr_name = _NON_IDENTIFIER_RGX.sub('_', str(yang_name))
+    if attr_name[0].isdigit():
+        attr_name = '_' + attr_name
+    return intern(attr_name)
+
+
+def _class_name(yang_name):
+
+    return str(''.join([part.title() for part in _NON_IDENTIFIER_RGX.split(yang_name)]))
+
+
+class Record(object):
+
+    """
+    Base class of the generated record types.
+    Fields are accessible either as attributes (e.g. `rec.interface_name`)
+    or by their YANG name (e.g. `rec['interface-name']`).
+    Elements not found in the schema are kept in the `_extra` dictionary.
+    """
+
+    __slots__ = ('_extra',)
+
+    _fields = ()
+    _keys = ()
+    _multi = frozenset()
+    _yang_names = {}
+
+    def __init__(self, **kvargs):
+        self._extra = None
+        for field in self._fields:
+            setattr(self, field, kvargs.get(field))
+
+    def _add(self, yang_name, value):
+
+        field = self._yang_names.get(yang_name)
+        if field is None:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[yang_name] = value
+        elif field in self._multi:
+            values = getattr(self, field)
+            if values is None:
+                values = []
+                setattr(self, field, values)
+            values.append(value)
+        else:
+            setattr(self, field, value)
+
+    def __getitem__(self, yang_name):
+
+        field = self._yang_names.get(yang_name)
+        if field is None:
+            if self._extra and yang_name in self._extra:
+                return self._extra[yang_name]
+            raise KeyError(yang_name)
+        return getattr(self, field)
+
+    def get(self, yang_name, default=None):
+
+        try:
+            value = self[yang_name]
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def to_dict(self):
+
+        """
+        Returns the dictionary representation of the record, keyed by the YANG names.
+        """
+
+        ret = dict(self._extra or {})
+        for yang_name, field in self._yang_names.items():
+            value = getattr(self, field)
+            if value is None:
+                continue
+            if isinstance(value, Record):
+                value = value.to_dict()
+            elif isinstance(value, list):
+                value = [ele.to_dict() if isinstance(ele, Record) else ele for ele in value]
+            ret[yang_name] = value
+        return ret
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return '{cls}({fields})'.format(
+            cls=self.__class__.__name__,
+            fields=', '.join([
+                '{field}={value!r}'.format(field=field, value=getattr(self, field))
+                for field in self._fields
+                if getattr(self, field) is not None
+            ])
+        )
+
+
+_RESERVED = frozenset(dir(Record))
+# attributes and methods of the records, not usable as field names
+
+
+def _field_names(yang_names):
+
+    """
+    Returns the field name of each YANG name: a Python identifier,
+    suffixed with underscores when it clashes with a `Record` attribute (e.g. `get`)
+    or with the field of another YANG name (e.g. `foo-bar` and `foo_bar`).
+    """
+
+    fields = []
+    used = set()
+    for yang_name in yang_names:
+        field = _attr_name(yang_name)
+        while field in _RESERVED or field in used:
+            field += '_'
+        used.add(field)
+        fields.append(intern(field))
+    return fields
+
+
+def record_class(node):
+
+    """
+    Returns the record class of a list or container schema node.
+    The class is generated once per node, with one slot per child of the node, the keys first.
+    The field names are the YANG names made Python identifiers, see `_field_names`.
+    """
+
+    cls = _RECORD_CLASSES.get(node)
+    if cls is not None:
+        return cls
+
+    yang_names = list(node.keys) + sorted([name for name in node.children if name not in node.keys])
+    fields = tuple(_field_names(yang_names))
+    yang_fields = dict(zip(yang_names, fields))
+    multi = frozenset([
+        yang_fields[name] for (name, child) in node.children.items()
+        if child.keyword in ('list', 'leaf-list')
+    ])
+    cls = type(_class_name(node.name), (Record,), {
+        '__slots__': fields,
+        '_fields': fields,
+        '_keys': tuple(node.keys),
+        '_multi': multi,
+        '_yang_names': dict([(intern(str(name)), field) for (name, field) in zip(yang_names, fields)])
+    })
+
+    return _RECORD_CLASSES.setdefault(node, cls)
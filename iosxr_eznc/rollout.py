@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Staged configuration rollout: canary first, then waves of devices, with confirmed commits.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import time
+import logging
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+# import local modules
+from iosxr_eznc.config import ConfigSession
+
+
+log = logging.getLogger(__name__)
+
+
+class HostResult(object):
+
+    """
+    Outcome of the rollout on a device:
+        * status: pending, confirmed, rolled-back, failed (nothing committed) or skipped (wave not started)
+        * stage: the last stage reached (connect, push, health, confirm, rollback)
+        * timings: duration of each stage, in seconds
+    """
+
+    def __init__(self, host, wave):
+
+        self.host = host
+        self.wave = wave
+        self.status = 'pending'
+        self.stage = None
+        self.error = None
+        self.timings = OrderedDict()
+        self.committed = None  # when the confirmed commit was accepted
+        self._dev = None
+        self._session = None
+
+    def _timed(self, stage, func, *args):
+
+        self.stage = stage
+        start = time.time()
+        try:
+            return func(*args)
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0.0) + time.time() - start
+
+    def to_dict(self):
+
+        return {
+            'host': self.host,
+            'wave': self.wave,
+            'status': self.status,
+            'stage': self.stage,
+            'error': str(self.error) if self.error is not None else None,
+            'timings': dict(self.timings),
+            'total': sum(self.timings.values())
+        }
+
+
+class Rollout(object):
+
+    """
+    Pushes the same change to many devices, in waves:
+        * the first `canary` devices are changed alone, and any failure stops the rollout
+        * then the other devices, `wave_size` at a time, at most `parallel` at the same time
+        * on each device, the configuration is loaded into the candidate (locked), validated,
+          and committed with `confirmed` and a `confirm_timeout` (seconds)
+        * after `settle` seconds, the `health_check(dev, host)` runs on the devices of the wave;
+          a falsy return value or an exception marks the device as failed
+        * the changes of the failed devices are cancelled; when the failures exceed the `error_budget`
+          (fraction of the devices attempted so far, or absolute count when >= 1),
+          the changes of the whole wave are cancelled and the rollout stops,
+          otherwise the commits of the healthy devices are confirmed
+
+    The devices not confirmed before `confirm_timeout` are rolled back by themselves,
+    hence the timeout must exceed the duration of a wave (push, settle and health check).
+
+    `config` is anything accepted by `ConfigSession.load`, a list of them,
+    or a callable `config(host, dev)` returning them for a device.
+    `connect(host)` returns an open Device object; it is closed after its wave.
+    """
+
+    def __init__(self,
+                 hosts,
+                 config,
+                 connect,
+                 health_check=None,
+                 canary=1,
+                 wave_size=50,
+                 parallel=16,
+                 error_budget=0,
+                 confirm_timeout=600,
+                 settle=0,
+                 operation='merge'):
+
+        self._hosts = list(hosts)
+        self._config = config
+        self._connect = connect
+        self._health_check = health_check
+        self._canary = canary
+        self._wave_size = wave_size
+        self._parallel = parallel
+        self._error_budget = error_budget
+        self._confirm_timeout = int(confirm_timeout)
+        self._settle = settle
+        self._operation = operation
+        self.results = OrderedDict()
+        self.waves = []
+        self.stopped = False
+        self._attempted = 0  # devices of the waves run so far
+
+    def _waves(self):
+
+        waves = []
+        if self._canary:
+            waves.append(self._hosts[:self._canary])
+        rest = self._hosts[self._canary:]
+        for index in range(0, len(rest), self._wave_size):
+            waves.append(rest[index:index + self._wave_size])
+        return waves
+
+    def _snippets(self, host, dev):
+
+        config = self._config
+        if callable(config):
+            config = config(host, dev)
+        if not isinstance(config, (list, tuple)):
+            config = [config]
+        return config
+
+    def _push(self, result):
+
+        """
+        Connects, loads and commits with confirmation. The candidate stays locked until confirmed or cancelled.
+        """
+
+        try:
+            result._dev = result._timed('connect', self._connect, result.host)
+            result._session = ConfigSession(result._dev, operation=self._operation)
+
+            def _commit():
+                result._session.open()
+                for snippet in self._snippets(result.host, result._dev):
+                    result._session.load(snippet)
+                result._session.commit(confirmed=True, timeout=str(self._confirm_timeout))
+
+            result._timed('push', _commit)
+            result.committed = time.time()
+        except Exception as err:
+            log.warning('Rollout failed on %s at %s: %s', result.host, result.stage, err)
+            result.error = err
+            result.status = 'failed'
+            self._release(result)
+
+    def _check(self, result):
+
+        if result.status != 'pending' or self._health_check is None:
+            return
+        try:
+            healthy = result._timed('health', self._health_check, result._dev, result.host)
+            if not healthy:
+                raise ValueError('Health check failed')
+        except Exception as err:
+            log.warning('Health check failed on %s: %s', result.host, err)
+            result.error = err
+            self._rollback(result)
+
+    def _confirm(self, result):
+
+        if result.status != 'pending':
+            return
+        if time.time() - result.committed >= self._confirm_timeout:
+            result.error = RuntimeError('Not confirmed within {timeout}s'.format(timeout=self._confirm_timeout))
+            result.status = 'rolled-back'  # by the device itself
+            self._release(result)
+            return
+        try:
+            result._timed('confirm', result._dev.rpc.commit)
+            result.status = 'confirmed'
+        except Exception as err:
+            log.warning('Unable to confirm the commit on %s: %s', result.host, err)
+            result.error = err
+            result.status = 'failed'
+        self._release(result)
+
+    def _rollback(self, result):
+
+        """
+        Cancels the confirmed commit; when not possible, closing the session rolls back as well.
+        """
+
+        if result.committed is None:
+            return
+        try:
+            result._timed('rollback', result._dev.rpc.cancel_commit)
+        except Exception as err:
+            log.warning('Unable to cancel the commit on %s (%s), closing the session', result.host, err)
+        result.status = 'rolled-back'
+        self._release(result)
+
+    def _release(self, result):
+
+        if result._session is not None:
+            try:
+                result._session.close(discard=True)
+            except Exception:
+                pass
+            result._session = None
+        if result._dev is not None:
+            try:
+                result._dev.close()
+            except Exception:
+                pass
+            result._dev = None
+
+    def _failures(self):
+
+        return len([result for result in self.results.values()
+                    if result.error is not None and result.status != 'skipped'])
+
+    def _over_budget(self, canary):
+
+        failures = self._failures()
+        if canary:
+            return failures > 0
+        if self._error_budget >= 1:
+            return failures > self._error_budget
+        return failures > self._error_budget * self._attempted
+
+    def run(self):
+
+        """
+        Runs the rollout. Returns the report, also available via `report()`.
+        """
+
+        waves = self._waves()
+        for index, hosts in enumerate(waves):
+            for host in hosts:
+                self.results[host] = HostResult(host, index)
+        pool = ThreadPool(self._parallel)
+        try:
+            for index, hosts in enumerate(waves):
+                if self.stopped:
+                    for host in hosts:
+                        self.results[host].status = 'skipped'
+                    continue
+                canary = index == 0 and self._canary > 0
+                self._run_wave(pool, index, [self.results[host] for host in hosts], canary)
+        finally:
+            pool.close()
+            pool.join()
+        return self.report()
+
+    def _run_wave(self, pool, index, results, canary):
+
+        start = time.time()
+        self._attempted += len(results)
+        pool.map(self._push, results)
+        if self._health_check is not None and self._settle:
+            time.sleep(self._settle)
+        pool.map(self._check, results)
+        if self._over_budget(canary):
+            log.error('Error budget exceeded in wave %d, rolling back and stopping', index)
+            self.stopped = True
+            pool.map(self._rollback, [result for result in results if result.status == 'pending'])
+        else:
+            pool.map(self._confirm, results)
+        self.waves.append({
+            'wave': index,
+            'hosts': len(results),
+            'confirmed': len([result for result in results if result.status == 'confirmed']),
+            'duration': time.time() - start
+        })
+
+    def report(self):
+
+        statuses = {}
+        for result in self.results.values():
+            statuses[result.status] = statuses.get(result.status, 0) + 1
+        return {
+            'stopped': self.stopped,
+            'statuses': statuses,
+            'waves': self.waves,
+            'hosts': [result.to_dict() for result in self.results.values()]
+        }
@@ -19,8 +19,32 @@ NETCONF RPC classes.
 
 from __future__ import absolute_import
 
+# import third party
+from lxml import etree
+from ncclient.operations import Get
+from ncclient.operations import Lock
+from ncclient.operations import Unlock
+from ncclient.operations import Commit
+from ncclient.operations import Validate
+from ncclient.operations import GetConfig
+from ncclient.operations import GetSchema
+from ncclient.operations import EditConfig
+from ncclient.operations import CopyConfig
+from ncclient.operations import DeleteConfig
+from ncclient.operations import DiscardChanges
+from ncclient.operations.edit import CancelCommit
+
 # import local modules
-from iosxr_eznc.decorators import wrap_xml, qualify, raise_eznc_exception, jsonify
+from iosxr_eznc import deadline as eznc_deadline
+from iosxr_eznc.decorators import wrap_xml, qualify, raise_eznc_exception, jsonify, limit_concurrency, profiled
+from iosxr_eznc.decorators import within_deadline
+from iosxr_eznc.exception import InvalidRequestError
+from iosxr_eznc.exception import InvalidXMLReplyError
+from iosxr_eznc.transport import parsing_replies
+
+
+# the options of RPC.get not applicable to the changes
+_NOT_WITH_CHANGES = ('sink', 'compress', 'records', 'raw')
 
 
 class _RPCBase(object):
@@ -32,6 +56,34 @@ class _RPCBase(object):
     def __init__(self, dev):
         self._dev = dev
 
+    def _execute(self, operation, *vargs, **kvargs):
+
+        """
+        Sends the request, waiting for the reply at most the device timeout,
+        or the time left before the deadline when shorter.
+        The reply is parsed with the parser of iosxr-eznc (see `transport.REPLY_PARSER`).
+        """
+
+        conn = self._dev._conn
+        timeout = eznc_deadline.rpc_timeout(conn.timeout)
+        try:
+            # as `Manager.execute`, without changing the timeout of the manager, shared with the other threads;
+            # relies on the attributes of the manager and the signature of the operations of ncclient 0.5.x,
+            # hence the version pinned in the requirements
+            return parsing_replies(operation)(conn._session,
+                                              conn._device_handler,
+                                              False,  # synchronous
+                                              timeout,
+                                              conn._raise_mode).request(*vargs, **kvargs)
+        except etree.XMLSyntaxError as xml_err:
+            raise InvalidXMLReplyError(
+                self._dev,
+                {
+                    'msg': 'Invalid XML reply',
+                    'obj': str(xml_err)
+                }
+            )
+
     # not yet supported in ncclient 0.5.2
     # @raise_eznc_exception
     # def rpc(self, xml_rpc_command):
@@ -50,46 +102,93 @@ class RPC(_RPCBase):
     def __init__(self, dev):
         _RPCBase.__init__(self, dev)
 
+    @profiled()
     @jsonify
+    @within_deadline
+    @limit_concurrency
     @raise_eznc_exception
     def get_schema(self, identifier, version=None, format=None):
-        return self._dev._conn.get_schema(identifier,
-                                          version=version,
-                                          format=format)
+        return self._execute(GetSchema,
+                             identifier,
+                             version=version,
+                             format=format)
 
+    @profiled('filter')
     @jsonify
+    @within_deadline
+    @limit_concurrency
     @raise_eznc_exception
     @qualify('filter', True)
     @wrap_xml('filter')
     def _get(self, filter=None):
-        return self._dev._conn.get(filter=filter)
+        return self._execute(Get, filter=filter)
 
-    def get(self, filter):
-        return self._get(filter=filter)
+    def get(self, filter, **kvargs):
 
+        """
+        Retrieves operational data.
+
+        :param filter: the XML or XPath-like filter.
+        :param sink: write the XML payload into this path or file-like object, instead of returning it.
+        :param compress: gzip compress the payload written into the `sink`.
+        :param typed: decode the leaves into native Python types.
+        :param records: return the list entries as compact record objects.
+        :param raw: return the <data> element of the reply, without any transformation.
+        :param changes: return only the list entries added, changed or removed since the previous
+                        request with the same filter (see `ChangeTracker`); only `typed` and `deadline` apply.
+        :param deadline: seconds, or a `Deadline` object: the reply is waited for at most until then.
+        """
+
+        if kvargs.pop('changes', False):
+            ignored = [option for option in _NOT_WITH_CHANGES if kvargs.get(option)]
+            if ignored:
+                raise InvalidRequestError(
+                    self._dev,
+                    {
+                        'obj': 'changes',
+                        'msg': 'Unable to return the changes with: {}'.format(', '.join(ignored))
+                    }
+                )
+            with eznc_deadline.scope(kvargs.get('deadline')):
+                return self._dev.changes.poll(filter, typed=kvargs.get('typed'))
+
+        return self._get(filter=filter, **kvargs)
+
+    @profiled('filter')
     @jsonify
+    @within_deadline
+    @limit_concurrency
     @raise_eznc_exception
     @qualify('filter', False)
     @wrap_xml('filter')
     def get_configuration(self, filter=None, source=None):
         if not source:
             source = 'running'
-        return self._dev._conn.get_config(filter=filter, source=source)
+        return self._execute(GetConfig, filter=filter, source=source)
 
-    def get_config(self, filter=None, source=None):
-        return self.get_configuration(filter=filter, source=source)
+    def get_config(self, filter=None, source=None, **kvargs):
+        return self.get_configuration(filter=filter, source=source, **kvargs)
 
+    @profiled()
     @jsonify
+    @within_deadline
+    @limit_concurrency
     @raise_eznc_exception
     def lock(self, target='candidate'):
-        return self._dev._conn.lock(target=target)
+        return self._execute(Lock, target=target)
 
+    @profiled()
     @jsonify
+    @within_deadline
+    @limit_concurrency
     @raise_eznc_exception
     def unlock(self, target='candidate'):
-        return self._dev._conn.unlock(target=target)
+        return self._execute(Unlock, target=target)
 
+    @profiled('config')
     @jsonify
+    @within_deadline
+    @limit_concurrency
     @raise_eznc_exception
     def edit_config(self,
                     config,
@@ -105,35 +204,81 @@ class RPC(_RPCBase):
         if error_action:
             error_action = 'rollback-on-error'
 
-        return self._dev._conn.edit_config(config,
-                                           format=format,
-                                           target=target,
-                                           default_operation=operation,
-                                           test_option=test_option,
-                                           error_option=error_action)
+        ret = self._execute(EditConfig,
+                            config,
+                            format=format,
+                            target=target,
+                            default_operation=operation,
+                            test_option=test_option,
+                            error_option=error_action)
+
+        if self._dev._mirror is not None and target == 'candidate' and format == 'xml':
+            self._dev._mirror.stage(config, operation)
 
+        return ret
+
+    @profiled()
     @jsonify
+    @within_deadline
+    @limit_concurrency
     @raise_eznc_exception
     def commit(self, confirmed=None, timeout=None):
-        return self._dev._conn.commit(confirmed=confirmed,
-                                      timeout=timeout)
+        ret = self._execute(Commit,
+                            confirmed=confirmed,
+                            timeout=timeout)
+
+        if self._dev._mirror is not None:
+            self._dev._mirror.commit()
+
+        return ret
+
+    @profiled()
+    @jsonify
+    @within_deadline
+    @limit_concurrency
+    @raise_eznc_exception
+    def cancel_commit(self):
+        # not available as manager method in ncclient 0.5.x
+        ret = self._execute(CancelCommit)
+
+        if self._dev._mirror is not None:
+            self._dev._mirror.sync(force=True)  # rolled back, download again when read
+
+        return ret
 
+    @profiled()
     @jsonify
+    @within_deadline
+    @limit_concurrency
     @raise_eznc_exception
     def discard_changes(self):
-        return self._dev._conn.discard_changes()
+        ret = self._execute(DiscardChanges)
+
+        if self._dev._mirror is not None:
+            self._dev._mirror.discard()
+
+        return ret
 
+    @profiled()
     @jsonify
+    @within_deadline
+    @limit_concurrency
     @raise_eznc_exception
     def validate(self, source='candidate'):
-        return self._dev._conn.validate(source=source)
+        return self._execute(Validate, source=source)
 
+    @profiled()
     @jsonify
+    @within_deadline
+    @limit_concurrency
     @raise_eznc_exception
     def delete_config(self, target):
-        return self._dev._conn.delete_config(target)
+        return self._execute(DeleteConfig, target)
 
+    @profiled()
     @jsonify
+    @within_deadline
+    @limit_concurrency
     @raise_eznc_exception
     def copy_config(self, source, target):
-        return self._dev._conn.copy_config(source, target)
+        return self._execute(CopyConfig, source, target)
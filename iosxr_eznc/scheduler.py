@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Polling scheduler: many (host, filter, interval) jobs, bounded load on the devices.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import time
+import heapq
+import random
+import logging
+import itertools
+import threading
+from collections import defaultdict
+from multiprocessing.pool import ThreadPool
+
+# import local modules
+from iosxr_eznc.exception import RPCTimeoutError
+
+
+log = logging.getLogger(__name__)
+
+
+class Job(object):
+
+    """
+    Periodic retrieval of the operational data selected by `filter` from `host`.
+    `callback(host, filter, reply)` is called for every successful poll,
+    `errback(host, filter, exception)` for every failed poll.
+    """
+
+    def __init__(self, host, filter, interval, callback=None, errback=None, **kvargs):
+
+        self.host = host
+        self.filter = filter
+        self.interval = float(interval)
+        self.callback = callback
+        self.errback = errback
+        self.kvargs = kvargs  # passed to RPC.get
+        self.running = False
+        self.runs = 0
+        self.skipped = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.last_duration = 0.0
+        self._base = None
+
+    def stats(self):
+
+        return {
+            'host': self.host,
+            'filter': self.filter if isinstance(self.filter, basestring) else repr(self.filter),
+            'interval': self.interval,
+            'runs': self.runs,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'last_lag': self.last_lag,
+            'max_lag': self.max_lag,
+            'avg_lag': self.total_lag / self.runs if self.runs else 0.0,
+            'last_duration': self.last_duration
+        }
+
+
+class Scheduler(object):
+
+    """
+    Runs polling jobs against many devices:
+        * the first poll of each job is spread randomly over its interval,
+          and every poll is shifted by up to +/- `jitter` / 2 of the interval
+        * at most `per_device` polls run at the same time on a device, `max_polls` overall
+        * a poll due while the previous one of the same job is still running is skipped (coalesced),
+          as well as the polls overdue by more than a whole interval
+        * each poll waits for the reply at most the `timeout` of its device,
+          or `timeout` when specified (as the `deadline` of the request, the devices are not changed)
+
+    `devices` is either a dictionary host -> Device object (already open),
+    or a callable returning the open Device object for a host.
+    """
+
+    def __init__(self, devices, per_device=2, max_polls=32, jitter=0.1, timeout=None):
+
+        self._devices = devices
+        self._per_device = per_device
+        self._max_polls = max_polls
+        self._jitter = jitter
+        self._timeout = timeout
+        self._jobs = []
+        self._queue = []  # heap of (due time, seq, job)
+        self._blocked = []  # due jobs waiting for a free slot
+        self._seq = itertools.count()
+        self._inflight = defaultdict(int)
+        self._inflight_total = 0
+        self._cond = threading.Condition()
+        self._pool = None
+        self._thread = None
+        self._stopped = True
+        self._dev_cache = {}
+        self._dev_locks = defaultdict(threading.Lock)  # one factory call per host
+
+    def add(self, host, filter, interval, callback=None, errback=None, **kvargs):
+
+        """
+        Adds a polling job. Returns the Job object.
+        """
+
+        job = Job(host, filter, interval, callback=callback, errback=errback, **kvargs)
+        with self._cond:
+            self._jobs.append(job)
+            job._base = time.time() + random.uniform(0, job.interval)
+            self._push(job, job._base)
+            self._cond.notify()
+        return job
+
+    def _push(self, job, due):
+
+        heapq.heappush(self._queue, (due, next(self._seq), job))
+
+    def _reschedule(self, job, now):
+
+        """
+        Schedules the next poll of a job, after `now`, skipping the missed ones.
+        """
+
+        job._base += job.interval
+        if job._base <= now:
+            missed = int((now - job._base) // job.interval) + 1
+            job.skipped += missed
+            job._base += missed * job.interval
+        shift = random.uniform(-self._jitter / 2, self._jitter / 2) * job.interval
+        self._push(job, max(now, job._base + shift))
+
+    def _device(self, host):
+
+        """
+        Returns the Device object of a host, opened once even when many polls of the host start together.
+        """
+
+        with self._cond:
+            host_lock = self._dev_locks[host]
+        with host_lock:
+            dev = self._dev_cache.get(host)
+            if dev is None:
+                if callable(self._devices):
+                    dev = self._devices(host)
+                else:
+                    dev = self._devices[host]
+                self._dev_cache[host] = dev
+        return dev
+
+    def _run(self, job, due):
+
+        start = time.time()
+        lag = start - due
+        kvargs = dict(job.kvargs)
+        if self._timeout is not None:
+            kvargs.setdefault('deadline', self._timeout)
+        try:
+            reply = self._device(job.host).rpc.get(job.filter, **kvargs)
+        except RPCTimeoutError as err:
+            job.timeouts += 1
+            self._failed(job, err)
+        except Exception as err:  # RPC errors, as well as e.g. the factory of the devices failing
+            job.errors += 1
+            self._failed(job, err)
+        else:
+            if job.callback is not None:
+                try:
+                    job.callback(job.host, job.filter, reply)
+                except Exception:
+                    log.exception('Callback failed for %s', job.host)
+        finally:
+            with self._cond:
+                job.runs += 1
+                job.last_lag = lag
+                job.max_lag = max(job.max_lag, lag)
+                job.total_lag += lag
+                job.last_duration = time.time() - start
+                job.running = False
+                self._inflight[job.host] -= 1
+                self._inflight_total -= 1
+                # some slots are free now
+                for blocked_due, blocked_job in self._blocked:
+                    self._push(blocked_job, blocked_due)
+                self._blocked = []
+                self._cond.notify()
+
+    def _failed(self, job, err):
+
+        if job.errback is None:
+            log.warning('Poll failed for %s: %s', job.host, err)
+            return
+        try:
+            job.errback(job.host, job.filter, err)
+        except Exception:
+            log.exception('Errback failed for %s', job.host)
+
+    def _dispatch(self):
+
+        with self._cond:
+            while not self._stopped:
+                if not self._queue:
+                    self._cond.wait()
+                    continue
+                due, _, job = self._queue[0]
+                now = time.time()
+                if due > now:
+                    self._cond.wait(due - now)
+                    continue
+                heapq.heappop(self._queue)
+                if job.running:
+                    # the previous poll is still running, will cover this one
+                    job.skipped += 1
+                    self._reschedule(job, now)
+                    continue
+                if now - due > job.interval:
+                    # overdue, the next one is closer
+                    job.skipped += 1
+                    self._reschedule(job, now)
+                    continue
+                if (self._inflight_total >= self._max_polls or
+                        self._inflight[job.host] >= self._per_device):
+                    self._blocked.append((due, job))
+                    continue
+                job.running = True
+                self._inflight[job.host] += 1
+                self._inflight_total += 1
+                self._reschedule(job, now)
+                self._pool.apply_async(self._run, (job, due))
+
+    def start(self):
+
+        """
+        Starts polling, in background threads.
+        """
+
+        with self._cond:
+            if not self._stopped:
+                return
+            self._stopped = False
+        self._pool = ThreadPool(self._max_polls)
+        self._thread = threading.Thread(target=self._dispatch, name='iosxr-eznc-scheduler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, wait=True):
+
+        """
+        Stops polling. With `wait`, returns after the running polls completed.
+        """
+
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._pool is not None:
+            self._pool.close()
+            if wait:
+                self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def stats(self):
+
+        """
+        Returns the poll statistics, per job and overall.
+        Lag is the time between the moment a poll was due and the moment it started.
+        """
+
+        with self._cond:
+            jobs = [job.stats() for job in self._jobs]
+            now = time.time()
+            queued_lag = [now - due for (due, _, _) in self._queue if due < now]
+            queued_lag.extend([now - due for (due, _) in self._blocked])
+        runs = sum([job['runs'] for job in jobs])
+        return {
+            'jobs': jobs,
+            'runs': runs,
+            'skipped': sum([job['skipped'] for job in jobs]),
+            'errors': sum([job['errors'] for job in jobs]),
+            'timeouts': sum([job['timeouts'] for job in jobs]),
+            'max_lag': max([job['max_lag'] for job in jobs] or [0.0]),
+            'avg_lag': sum([job['avg_lag'] * job['runs'] for job in jobs]) / runs if runs else 0.0,
+            'pending_lag': max(queued_lag or [0.0]),
+            'inflight': self._inflight_total
+        }
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Compiled YANG schema trees.
+"""
+
+from __future__ import absolute_import
+
+
+_DATA_KEYWORDS = ('container', 'list', 'leaf', 'leaf-list', 'anyxml')
+_SCHEMA_KEYWORDS = ('choice', 'case')  # not present in the data tree
+
+
+def _to_bool(val):
+    if val not in ('true', 'false'):
+        raise ValueError('Invalid boolean: {val}'.format(val=val))
+    return val == 'true'
+
+
+def _to_empty(val):
+    if val:
+        raise ValueError('Invalid empty leaf: {val}'.format(val=val))
+    return True
+
+
+def _kept(val):
+    return val
+
+
+def _enumeration(names):
+
+    def _to_enum(val):
+        if val not in names:
+            raise ValueError('Invalid enum: {val}'.format(val=val))
+        return val
+
+    return _to_enum
+
+
+def _union(decoders):
+
+    """
+    Decodes using the first member type accepting the value, as the value of a union is interpreted.
+    """
+
+    def _to_union(val):
+        for decode in decoders:
+            try:
+                return decode(val)
+            except ValueError:
+                continue
+        raise ValueError('Invalid union value: {val}'.format(val=val))
+
+    return _to_union
+
+
+_DECODERS = {
+    'int8': int,
+    'int16': int,
+    'int32': int,
+    'int64': int,
+    'uint8': int,
+    'uint16': int,
+    'uint32': int,
+    'uint64': int,
+    'decimal64': float,
+    'boolean': _to_bool,
+    'empty': _to_empty
+}
+
+
+class SchemaNode(object):
+
+    """
+    Data node of a compiled YANG schema tree.
+    """
+
+    __slots__ = ('name', 'keyword', 'namespace', 'keys', 'decode', 'children')
+
+    def __init__(self, name, keyword, namespace=None, keys=None, decode=None):
+        self.name = name
+        self.keyword = keyword
+        self.namespace = namespace
+        self.keys = keys or []
+        self.decode = decode
+        self.children = {}
+
+    def __repr__(self):
+        return '<SchemaNode {keyword} {name}>'.format(
+            keyword=self.keyword,
+            name=self.name
+        )
+
+
+def _namespace(stmt, default=None):
+
+    module = getattr(stmt, 'i_module', None)
+    if module is None:
+        return default
+    namespace = module.search_one('namespace')
+    if namespace is None:
+        # submodule
+        return default
+    return namespace.arg
+
+
+def _type_decoder(type_stmt, member=False):
+
+    """
+    Follows the typedef chain of a type down to the YANG built-in type.
+    Returns None when the value should be kept as string.
+    The `member` types of a union also check the enumerations, kept as strings.
+    """
+
+    while type_stmt is not None and getattr(type_stmt, 'i_typedef', None) is not None:
+        type_stmt = type_stmt.i_typedef.search_one('type')
+    if type_stmt is None:
+        return None
+    if type_stmt.arg == 'union':
+        decoders = [_type_decoder(member_stmt, member=True) for member_stmt in type_stmt.search('type')]
+        if not [decode for decode in decoders if decode is not _kept]:
+            return None
+        return _union(decoders)
+    if member and type_stmt.arg == 'enumeration':
+        return _enumeration(frozenset([enum.arg for enum in type_stmt.search('enum')]))
+    decode = _DECODERS.get(type_stmt.arg)
+    if decode is None and member:
+        return _kept  # e.g. string, accepting any value
+    return decode
+
+
+def _decoder(stmt):
+
+    """
+    Returns the decoder of a leaf: of its type, or of the leaf referred to by a leafref.
+    Returns None when the leaf should be kept as string.
+    """
+
+    leafref = getattr(stmt, 'i_leafref_ptr', None)
+    if leafref is not None and leafref[0] is not stmt:
+        return _decoder(leafref[0])
+    return _type_decoder(stmt.search_one('type'))
+
+
+def _compile_children(stmt, parent, namespace):
+
+    for child in getattr(stmt, 'i_children', []):
+        if child.keyword in _SCHEMA_KEYWORDS:
+            # choice and case are flattened into the parent
+            _compile_children(child, parent, namespace)
+            continue
+        if child.keyword not in _DATA_KEYWORDS:
+            continue
+        node = _compile(child, namespace)
+        parent.children[node.name] = node
+
+
+def _compile(stmt, namespace=None):
+
+    namespace = _namespace(stmt, default=namespace)
+    keys = None
+    decode = None
+    if stmt.keyword == 'list':
+        key_stmt = stmt.search_one('key')
+        if key_stmt is not None:
+            keys = key_stmt.arg.split()
+    elif stmt.keyword in ('leaf', 'leaf-list'):
+        decode = _decoder(stmt)
+    node = SchemaNode(stmt.arg, stmt.keyword, namespace=namespace, keys=keys, decode=decode)
+    _compile_children(stmt, node, namespace)
+    return node
+
+
+def compile_module(module):
+
+    """
+    Compiles a validated pyang module into a dictionary
+    mapping the name of the top level data nodes to SchemaNode objects.
+    """
+
+    root = SchemaNode(module.arg, module.keyword, namespace=_namespace(module))
+    _compile_children(module, root, root.namespace)
+    return root.children
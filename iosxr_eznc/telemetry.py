@@ -0,0 +1,701 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Model-driven telemetry: receives the TCP dial-out streams of the devices,
+and converts the data into the same structure as returned by the RPC requests.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import json
+import time
+import base64
+import socket
+import struct
+import logging
+import threading
+from collections import OrderedDict
+
+# import third party
+import six
+from six.moves import socketserver
+from lxml import etree
+
+# import local modules
+from iosxr_eznc.namespaces import Namespaces
+from iosxr_eznc.decorators import _nsmap
+from iosxr_eznc.decorators import _etree_to_dict
+from iosxr_eznc.decorators import OPENCONFIG_NAMESPACE
+
+
+log = logging.getLogger(__name__)
+
+# TCP dial-out framing: type, encapsulation, header version, flags, length of the message (big endian)
+_HEADER = struct.Struct('>HHHHI')
+_CAPTURE_HEADER = struct.Struct('>dH')  # timestamp, length of the peer address
+MESSAGE_TYPE_DATA = 1
+HEADER_VERSION = 1
+ENCODING_GPB = 1  # self-describing (key-value) GPB; compact GPB is not supported
+ENCODING_JSON = 2
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+
+NETCONF_NAMESPACE = 'urn:ietf:params:xml:ns:netconf:base:1.0'
+_DATA_TAG = '{{{ns}}}data'.format(ns=NETCONF_NAMESPACE)
+
+# fields of the `Telemetry` message (telemetry.proto)
+_TELEMETRY_NODE_ID = 1
+_TELEMETRY_SUBSCRIPTION_ID = 3
+_TELEMETRY_ENCODING_PATH = 6
+_TELEMETRY_COLLECTION_ID = 8
+_TELEMETRY_MSG_TIMESTAMP = 10
+_TELEMETRY_DATA_GPBKV = 11
+_TELEMETRY_DATA_GPB = 12
+
+# fields of the `TelemetryField` message
+_FIELD_NAME = 2
+_FIELD_BYTES = 4
+_FIELD_STRING = 5
+_FIELD_BOOL = 6
+_FIELD_UINT = (7, 8)
+_FIELD_SINT = (9, 10)
+_FIELD_DOUBLE = 11
+_FIELD_FLOAT = 12
+_FIELD_FIELDS = 15
+
+
+def _varint(buf, pos):
+
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _pb_fields(buf, pos, end):
+
+    """
+    Iterates over the (field number, value) of a protobuf message, in the bytearray `buf` between `pos` and `end`.
+    The length-delimited values are returned as (start, end) offsets, the fixed size values as bytes.
+    """
+
+    while pos < end:
+        tag, pos = _varint(buf, pos)
+        number, wire_type = tag >> 3, tag & 0x07
+        if wire_type == 0:
+            value, pos = _varint(buf, pos)
+        elif wire_type == 1:
+            value = bytes(buf[pos:pos + 8])
+            pos += 8
+        elif wire_type == 2:
+            length, pos = _varint(buf, pos)
+            value = (pos, pos + length)
+            pos += length
+        elif wire_type == 5:
+            value = bytes(buf[pos:pos + 4])
+            pos += 4
+        else:
+            raise ValueError('Unsupported protobuf wire type {wire_type}'.format(wire_type=wire_type))
+        if pos > end:
+            raise ValueError('Truncated protobuf message')
+        yield number, value
+
+
+def _pb_text(buf, span):
+
+    return bytes(buf[span[0]:span[1]]).decode('utf-8')
+
+
+def _gpbkv_field(buf, pos, end):
+
+    """
+    Decodes a `TelemetryField`: returns (name, value), the value being the list of the (name, value)
+    of the children for the containers and list entries.
+    """
+
+    name, value, children = '', None, []
+    for number, raw in _pb_fields(buf, pos, end):
+        if number == _FIELD_NAME:
+            name = _pb_text(buf, raw)
+        elif number == _FIELD_FIELDS:
+            children.append(_gpbkv_field(buf, *raw))
+        elif number == _FIELD_STRING:
+            value = _pb_text(buf, raw)
+        elif number == _FIELD_BYTES:
+            value = bytes(buf[raw[0]:raw[1]])
+        elif number == _FIELD_BOOL:
+            value = bool(raw)
+        elif number in _FIELD_UINT:
+            value = raw
+        elif number in _FIELD_SINT:
+            value = (raw >> 1) ^ -(raw & 1)  # zigzag
+        elif number == _FIELD_DOUBLE:
+            value = struct.unpack('<d', raw)[0]
+        elif number == _FIELD_FLOAT:
+            value = struct.unpack('<f', raw)[0]
+    return name, (children if children else value)
+
+
+def _decode_gpbkv(payload):
+
+    """
+    Decodes a `Telemetry` message with self-describing (key-value) GPB rows.
+    """
+
+    buf = bytearray(payload)
+    message = {'rows': []}
+    compact = False
+    for number, raw in _pb_fields(buf, 0, len(buf)):
+        if number == _TELEMETRY_NODE_ID:
+            message['node'] = _pb_text(buf, raw)
+        elif number == _TELEMETRY_SUBSCRIPTION_ID:
+            message['subscription'] = _pb_text(buf, raw)
+        elif number == _TELEMETRY_ENCODING_PATH:
+            message['path'] = _pb_text(buf, raw)
+        elif number == _TELEMETRY_COLLECTION_ID:
+            message['collection_id'] = raw
+        elif number == _TELEMETRY_MSG_TIMESTAMP:
+            message['timestamp'] = raw / 1000.0
+        elif number == _TELEMETRY_DATA_GPBKV:
+            _, row = _gpbkv_field(buf, *raw)
+            row = dict(row or [])
+            message['rows'].append((row.get('keys') or [], row.get('content') or []))
+        elif number == _TELEMETRY_DATA_GPB:
+            compact = True
+    message['compact'] = compact and not message['rows']
+    return message
+
+
+def _json_pairs(obj):
+
+    pairs = []
+    for name, value in obj.items():
+        for item in (value if isinstance(value, list) else [value]):
+            pairs.append((name, _json_pairs(item) if isinstance(item, dict) else item))
+    return pairs
+
+
+def _decode_json(payload):
+
+    document = json.loads(payload.decode('utf-8'), object_pairs_hook=OrderedDict)
+    rows = []
+    for row in document.get('data_json') or []:
+        keys = row.get('keys') or {}
+        if isinstance(keys, list):  # list of single key objects
+            keys = OrderedDict([(name, value) for key in keys for (name, value) in key.items()])
+        rows.append((_json_pairs(keys), _json_pairs(row.get('content') or {})))
+    msg_timestamp = document.get('msg_timestamp')
+    return {
+        'node': document.get('node_id_str'),
+        'subscription': document.get('subscription_id_str'),
+        'path': document.get('encoding_path'),
+        'collection_id': document.get('collection_id'),
+        'timestamp': int(msg_timestamp) / 1000.0 if msg_timestamp is not None else None,
+        'rows': rows,
+        'compact': False
+    }
+
+
+def _leaf_text(value):
+
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, six.text_type):
+        return value
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode('ascii')  # YANG binary
+    return str(value)
+
+
+def _append(parent, namespace, pairs):
+
+    for name, value in pairs:
+        child = etree.SubElement(parent, '{{{ns}}}{name}'.format(ns=namespace, name=name.split(':')[-1]))
+        if isinstance(value, list):
+            _append(child, namespace, value)
+        else:
+            child.text = _leaf_text(value)
+
+
+def _plural(name):
+
+    if name.endswith('y'):
+        return (name + 's', name[:-1] + 'ies')
+    return (name + 's', name + 'es')
+
+
+def _list_depth(containers, nodes):
+
+    """
+    Returns the index of the deepest list of a sensor path, where the keys unknown to the schema are added.
+    Without schema, the lists are recognized by their naming in the IOS-XR models (e.g. 'interfaces/interface').
+    """
+
+    lists = [index for (index, node) in enumerate(nodes) if node is not None and node.keyword == 'list']
+    if lists:
+        return lists[-1]
+    lists = [index for index in range(1, len(containers)) if containers[index - 1] in _plural(containers[index])]
+    if lists:
+        return lists[-1]
+    return len(containers) - 1
+
+
+def encode_frame(payload, encoding=ENCODING_GPB):
+
+    """
+    Returns the TCP dial-out frame of a message: the 12 bytes header, then the payload.
+    """
+
+    return _HEADER.pack(MESSAGE_TYPE_DATA, encoding, HEADER_VERSION, 0, len(payload)) + payload
+
+
+def read_frame(stream):
+
+    """
+    Reads a TCP dial-out frame from a file-like object.
+    Returns (message type, encoding, payload), or None at the end of the stream.
+    """
+
+    frame = _read_frame(stream)
+    if frame is None:
+        return None
+    return frame[1:]
+
+
+def _read_frame(stream):
+
+    """
+    Reads a TCP dial-out frame, returning the header as received as well:
+    (header, message type, encoding, payload), or None at the end of the stream.
+    """
+
+    header = stream.read(_HEADER.size)
+    if not header:
+        return None
+    if len(header) < _HEADER.size:
+        raise ValueError('Truncated header')
+    msg_type, encoding, version, _, length = _HEADER.unpack(header)
+    if version != HEADER_VERSION:
+        raise ValueError('Unsupported header version {version}'.format(version=version))
+    if length > MAX_MESSAGE_SIZE:
+        raise ValueError('Message too large: {length} bytes'.format(length=length))
+    payload = stream.read(length)
+    if len(payload) < length:
+        raise ValueError('Truncated message')
+    return header, msg_type, encoding, payload
+
+
+def read_capture(capture):
+
+    """
+    Iterates over the frames of a capture written by `TelemetryReceiver`: (timestamp, peer, frame) tuples.
+    Each frame of the capture is preceded by its time of arrival and the address of the device.
+    """
+
+    capture_file = open(capture, 'rb') if isinstance(capture, six.string_types) else capture
+    try:
+        while True:
+            record = capture_file.read(_CAPTURE_HEADER.size)
+            if len(record) < _CAPTURE_HEADER.size:
+                return
+            timestamp, peer_length = _CAPTURE_HEADER.unpack(record)
+            peer = capture_file.read(peer_length).decode('utf-8')
+            header = capture_file.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            payload = capture_file.read(_HEADER.unpack(header)[4])
+            yield timestamp, peer, header + payload
+    finally:
+        if capture_file is not capture:
+            capture_file.close()
+
+
+def replay(capture, host='127.0.0.1', port=57500, speed=1.0):
+
+    """
+    Sends the frames of a capture to a receiver, one TCP connection per device of the capture,
+    as the devices would. With `speed`, the frames are sent at the pace they were captured
+    (2.0: twice as fast), otherwise as fast as possible. Returns the number of frames sent.
+    """
+
+    connections = {}
+    count = 0
+    first = start = None
+    try:
+        for timestamp, peer, frame in read_capture(capture):
+            if speed:
+                if first is None:
+                    first, start = timestamp, time.time()
+                delay = (timestamp - first) / speed - (time.time() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            if peer not in connections:
+                connections[peer] = socket.create_connection((host, port))
+            connections[peer].sendall(frame)
+            count += 1
+    finally:
+        for connection in connections.values():
+            connection.close()
+    return count
+
+
+class TelemetryUpdate(object):
+
+    """
+    Message received from a device: the rows collected from a sensor path, as `data`,
+    structured as returned by `RPC.get` for the same path, e.g.:
+    {'data': {'infra-statistics': {'interfaces': {'interface': [...]}}}}
+    """
+
+    __slots__ = ('peer', 'node', 'subscription', 'path', 'collection_id', 'timestamp', 'data_ele', 'data')
+
+    def __init__(self, peer, message, data_ele, data):
+
+        self.peer = peer
+        self.node = message.get('node')
+        self.subscription = message.get('subscription')
+        self.path = message.get('path')
+        self.collection_id = message.get('collection_id')
+        self.timestamp = message.get('timestamp')
+        self.data_ele = data_ele  # the <data> element, as with `raw`
+        self.data = data
+
+    def __repr__(self):
+        return '<TelemetryUpdate {node} {path}>'.format(node=self.node, path=self.path)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        self.server.receiver._serve(self.rfile, self.client_address[0])
+
+
+class _Server(socketserver.ThreadingTCPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def process_request(self, request, client_address):
+        # tracked before the thread starts: once `shutdown` returns, all the connections accepted are known
+        self.receiver._connected(request)
+        socketserver.ThreadingTCPServer.process_request(self, request, client_address)
+
+    def shutdown_request(self, request):
+        self.receiver._disconnected(request)
+        socketserver.ThreadingTCPServer.shutdown_request(self, request)
+
+
+class TelemetryReceiver(object):
+
+    """
+    Receives the model-driven telemetry of the devices (TCP dial-out, self-describing GPB or JSON encoding),
+    calling `callback(update)` with a `TelemetryUpdate` for each message, from the thread of the connection.
+
+    The data of the updates has the same structure as the replies of `RPC.get`, hence the code processing
+    the polled data can process the streamed data as well:
+    >>> def on_update(update):
+    ...     process(update.node, update.data)  # as process(host, dev.rpc.get(update.path))
+    >>> receiver = TelemetryReceiver(on_update, port=57500, dev=dev).start()
+
+    The namespaces of the sensor paths are resolved using the namespaces map of the device `dev`
+    if specified, otherwise the map of the IOS-XR `release`.
+    With `dev`, the keys of the nested lists are placed using the YANG schema,
+    and the leaves can be decoded into native types (`typed`, defaults to the `typed` option of the device),
+    or the list entries converted into records (`records`); without, all the keys are added to the deepest list.
+    The keys and leaves are converted into text first, as if received via NETCONF,
+    so the typed data is identical as well.
+
+    With `capture` (path or file-like object), the frames received are also written into the capture,
+    to be replayed later using `replay`.
+    """
+
+    def __init__(self,
+                 callback,
+                 host='0.0.0.0',
+                 port=57500,
+                 dev=None,
+                 release=None,
+                 typed=None,
+                 records=False,
+                 capture=None):
+
+        self._callback = callback
+        self._bind = (host, port)
+        self._dev = dev
+        if dev is not None:
+            self._namespaces = dev.namespaces
+        else:
+            self._namespaces = Namespaces()
+            self._namespaces._release = release
+            self._namespaces._load_default_namespaces()
+        if typed is None:
+            typed = getattr(dev, '_typed', False)
+        self._typed = typed
+        self._records = records
+        self._paths = {}  # sensor path -> (namespace, containers, schema nodes, depth of the deepest list)
+        self._capture = open(capture, 'wb') if isinstance(capture, six.string_types) else capture
+        self._capture_owned = self._capture is not capture
+        self._capture_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self._connections = set()
+        self._stats = {'connections': 0, 'messages': 0, 'rows': 0, 'bytes': 0, 'errors': 0, 'unsupported': 0}
+
+    def _namespace(self, module, container):
+
+        if not module:
+            namespace = self._namespaces.get(container, oper=True)
+            if namespace is None:
+                raise ValueError('Unable to determine the namespace of {container}'.format(container=container))
+            return namespace
+        for namespace in self._namespaces.get():
+            if self._namespaces._get_schema_ns(namespace) == module:
+                return namespace
+        if self._dev is not None:
+            for namespace, (name, _) in self._namespaces.modules().items():
+                if name == module:
+                    return namespace
+        if module.startswith('openconfig-'):
+            return OPENCONFIG_NAMESPACE + module[len('openconfig-'):]
+        return _nsmap(module)
+
+    def _path(self, path):
+
+        """
+        Returns the namespace, the containers, their schema nodes and the depth of the deepest list of a sensor path.
+        """
+
+        info = self._paths.get(path)
+        if info is not None:
+            return info
+        module, _, containers = path.rpartition(':')
+        containers = [container for container in containers.split('/') if container]
+        namespace = self._namespace(module, containers[0])
+        nodes = []
+        node = None
+        for index, container in enumerate(containers):
+            if index == 0:
+                node = self._namespaces.schema(namespace).get(container) if self._dev is not None else None
+            elif node is not None:
+                node = node.children.get(container)
+            nodes.append(node)
+        info = self._paths[path] = (namespace, containers, nodes, _list_depth(containers, nodes))
+        return info
+
+    def _data_ele(self, path, rows):
+
+        """
+        Builds the <data> element of the rows, as the reply of a get request for the sensor path.
+        The rows of the same list entries (e.g. the neighbors of a BGP instance) are merged.
+        """
+
+        namespace, containers, nodes, list_depth = self._path(path)
+        data_ele = etree.Element(_DATA_TAG)
+        entries = {}
+        for keys, content in rows:
+            keys = OrderedDict([(name.split(':')[-1], value) for (name, value) in keys])
+            parent = data_ele
+            identity = ()
+            for depth, (container, node) in enumerate(zip(containers, nodes)):
+                names = []
+                if node is not None and node.keyword == 'list':
+                    names = [name for name in node.keys if name in keys]
+                if depth == list_depth:
+                    names.extend([name for name in keys if name not in names])
+                values = [keys.pop(name) for name in names]
+                identity += ((container, tuple(values)),)
+                ele = entries.get(identity)
+                if ele is None:
+                    tag = '{{{ns}}}{name}'.format(ns=namespace, name=container)
+                    if depth == 0:
+                        ele = etree.SubElement(parent, tag, nsmap={None: namespace})
+                    else:
+                        ele = etree.SubElement(parent, tag)
+                    _append(ele, namespace, zip(names, values))
+                    entries[identity] = ele
+                parent = ele
+            _append(parent, namespace, content)
+        return data_ele
+
+    def decode(self, payload, encoding=ENCODING_GPB, peer=None):
+
+        """
+        Decodes a message. Returns the `TelemetryUpdate`, or None when there is no data
+        (e.g. end of collection) or when the encoding is not supported.
+        """
+
+        if encoding == ENCODING_JSON:
+            message = _decode_json(payload)
+        elif encoding == ENCODING_GPB:
+            message = _decode_gpbkv(payload)
+        else:
+            message = {'compact': True}
+        if message['compact']:
+            with self._lock:
+                self._stats['unsupported'] += 1
+            log.warning('Unsupported telemetry encoding from %s (%s): use self-describing GPB or JSON',
+                        peer, message.get('path'))
+            return None
+        if not message['rows'] or not message.get('path'):
+            return None
+        data_ele = self._data_ele(message['path'], message['rows'])
+        schemas = None
+        if self._dev is not None and (self._typed or self._records):
+            schemas = self._namespaces.schema
+        data = {
+            etree.QName(data_ele).localname: _etree_to_dict(data_ele,
+                                                            schemas=schemas,
+                                                            records=self._records and schemas is not None)
+        }
+        with self._lock:
+            self._stats['rows'] += len(message['rows'])
+        return TelemetryUpdate(peer, message, data_ele, data)
+
+    def _serve(self, stream, peer):
+
+        with self._lock:
+            self._stats['connections'] += 1
+        log.info('Telemetry connection from %s', peer)
+        while True:
+            try:
+                frame = _read_frame(stream)
+            except (ValueError, socket.error) as err:
+                log.warning('Closing the telemetry connection from %s: %s', peer, err)
+                with self._lock:
+                    self._stats['errors'] += 1
+                return
+            if frame is None:
+                log.info('Telemetry connection from %s closed', peer)
+                return
+            header, msg_type, encoding, payload = frame
+            with self._lock:
+                self._stats['messages'] += 1
+                self._stats['bytes'] += _HEADER.size + len(payload)
+            # as received: the frames of any type are replayed as they were sent
+            self._write_capture(peer, header + payload)
+            if msg_type != MESSAGE_TYPE_DATA:
+                continue
+            self.process(payload, encoding=encoding, peer=peer)
+
+    def process(self, payload, encoding=ENCODING_GPB, peer=None):
+
+        """
+        Decodes a message and calls the callback. The errors are logged, not raised.
+        """
+
+        try:
+            update = self.decode(payload, encoding=encoding, peer=peer)
+        except Exception as err:
+            with self._lock:
+                self._stats['errors'] += 1
+            log.warning('Unable to decode the telemetry message from %s: %s', peer, err)
+            return
+        if update is None:
+            return
+        try:
+            self._callback(update)
+        except Exception:
+            log.exception('Telemetry callback failed for %r', update)
+
+    def _write_capture(self, peer, frame):
+
+        peer = peer.encode('utf-8')
+        with self._capture_lock:
+            if self._capture is None:
+                # no capture, or closed
+                return
+            self._capture.write(_CAPTURE_HEADER.pack(time.time(), len(peer)) + peer + frame)
+            self._capture.flush()
+
+    @property
+    def address(self):
+
+        """
+        The (host, port) the receiver listens on, e.g. to find the port chosen with port=0.
+        """
+
+        if self._server is None:
+            return self._bind
+        return self._server.server_address
+
+    def start(self):
+
+        """
+        Listens and receives in the background.
+        """
+
+        if self._server is None:
+            self._server = _Server(self._bind, _Handler)
+            self._server.receiver = self
+            self._thread = threading.Thread(target=self._server.serve_forever, name='iosxr-eznc-telemetry')
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def _connected(self, connection):
+
+        with self._lock:
+            self._connections.add(connection)
+
+    def _disconnected(self, connection):
+
+        with self._lock:
+            self._connections.discard(connection)
+
+    def close(self):
+
+        """
+        Stops listening, and closes the connections of the devices.
+        """
+
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = self._thread = None
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                # the thread of the connection reads the end of the stream, and returns
+                connection.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass  # already closed by the device
+        with self._capture_lock:
+            if self._capture is not None:
+                if self._capture_owned:
+                    self._capture.close()
+                else:
+                    self._capture.flush()
+                self._capture = None  # nothing written after closing
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def stats(self):
+
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Configuration templates: compiled once into XML, rendered for many devices.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import re
+import copy
+
+# import third party
+import six
+from lxml import etree
+
+# import local modules
+from iosxr_eznc.exception import InvalidRequestError
+from iosxr_eznc.namespaces import Namespaces
+from iosxr_eznc.decorators import _build_xml
+from iosxr_eznc.decorators import _split_tag
+
+
+_SLOT_RGX = re.compile(r'''\{\{|\}\}|\{([\w.-]+)\}''')
+_ESCAPE = (('&', '&amp;'), ('<', '&lt;'), ('>', '&gt;'), ('"', '&quot;'))
+
+
+def _escape(value):
+
+    if isinstance(value, bool):
+        value = 'true' if value else 'false'  # YANG boolean
+    elif not isinstance(value, six.string_types):
+        value = str(value)
+    for char, entity in _ESCAPE:
+        value = value.replace(char, entity)
+    return value
+
+
+def _text(value):
+
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return value if isinstance(value, six.string_types) else str(value)
+
+
+def _attach(parent, chain):
+
+    """
+    Appends the chain of elements built from an XPath-like expression to `parent`,
+    reusing the containers already there. Returns the last element of the chain.
+    """
+
+    while len(chain):
+        match = None
+        for child in parent:
+            if child.tag == chain.tag and dict(child.attrib) == dict(chain.attrib):
+                match = child
+                break
+        if match is None:
+            break
+        parent = match
+        chain = chain[0]
+    parent.append(chain)
+    while len(chain):
+        chain = chain[0]
+    return chain
+
+
+def _from_dict(parent, data, dev):
+
+    for path, value in data.items():
+        for item in (value if isinstance(value, list) else [value]):
+            ele = _attach(parent, _build_xml(path, dev))
+            if isinstance(item, dict):
+                _from_dict(ele, item, dev)
+            elif item is not None:
+                ele.text = _text(item)
+
+
+class ConfigTemplate(object):
+
+    """
+    Configuration snippet with variables, compiled once, then rendered for each device.
+
+    The template is either an XML string, or a dictionary shaped as the YANG model,
+    the keys being XPath-like expressions as accepted by the requests (e.g. 'module:container/list').
+    Leaf values and attributes can contain variables, `{name}`; use `{{` and `}}` for literal braces.
+    E.g.:
+    >>> tpl = ConfigTemplate({
+    ...     'interface-configurations/interface-configuration': OrderedDict([
+    ...         ('active', 'act'),
+    ...         ('interface-name', '{name}'),
+    ...         ('description', '{description}')
+    ...     ])
+    ... })
+    >>> dev.rpc.edit_config(tpl.render(name='GigabitEthernet0/0/0/0', description='uplink'))
+
+    The namespaces of the top level containers are resolved when compiling, using the namespaces map
+    of the device `dev` if specified, otherwise the map of the IOS-XR `release`.
+    Use ordered dictionaries: the keys of the list entries must come first.
+
+    Compiling serializes the whole <config> document, split around the variables:
+    rendering only escapes the values and joins the strings, no XML is built or parsed.
+    The structure does not change between renderings; for a variable number of list entries,
+    render a template per entry and load them into the same `ConfigSession`.
+    """
+
+    def __init__(self, template, dev=None, release=None):
+
+        self._dev = dev
+        if dev is not None:
+            self._namespaces = dev.namespaces
+        else:
+            self._namespaces = Namespaces()
+            self._namespaces._release = release
+            self._namespaces._load_default_namespaces()
+        self._segments = []
+        self._slots = []  # (index in segments, variable name)
+        self._compile(self._build(template))
+
+    def _build(self, template):
+
+        config = etree.Element('config')
+        if isinstance(template, dict):
+            _from_dict(config, template, self._dev)
+        elif etree.iselement(template):
+            config.append(copy.deepcopy(template))
+        else:
+            try:
+                config.append(etree.fromstring(template))
+            except etree.XMLSyntaxError:
+                config.append(_build_xml(template, self._dev))
+        for index, container in enumerate(config):
+            namespace, tag = _split_tag(container.tag)
+            if namespace is not None or container.get('xmlns'):
+                continue
+            namespace = self._namespaces.get(tag, oper=False)
+            if namespace is None:
+                raise InvalidRequestError(
+                    self._dev,
+                    {
+                        'obj': tag,
+                        'msg': 'Unable to determine the namespace'
+                    }
+                )
+            container.set('xmlns', namespace)
+        # serialize and parse back to have the namespaces applied to the whole tree
+        return etree.fromstring(etree.tostring(config))
+
+    def _compile(self, config):
+
+        document = etree.tostring(config)
+        start = 0
+        literal = []
+        for match in _SLOT_RGX.finditer(document):
+            literal.append(document[start:match.start()])
+            start = match.end()
+            if match.group(1) is None:
+                literal.append(match.group(0)[0])  # escaped brace
+                continue
+            self._segments.append(''.join(literal))
+            literal = []
+            self._slots.append((len(self._segments), match.group(1)))
+            self._segments.append(None)
+        literal.append(document[start:])
+        self._segments.append(''.join(literal))
+
+    @property
+    def variables(self):
+
+        return set([name for (_, name) in self._slots])
+
+    def render(self, variables=None, **kvargs):
+
+        """
+        Returns the <config> document with the values of the variables, as string,
+        ready to be sent via `RPC.edit_config` or loaded into a `ConfigSession`.
+        The values are taken from the `variables` dictionary and the keyword arguments.
+        """
+
+        if variables is None:
+            variables = kvargs
+        elif kvargs:
+            variables = dict(variables, **kvargs)
+        segments = list(self._segments)
+        try:
+            for index, name in self._slots:
+                segments[index] = _escape(variables[name])
+        except KeyError as err:
+            raise InvalidRequestError(
+                self._dev,
+                {
+                    'obj': err.args[0],
+                    'msg': 'Missing template variable'
+                }
+            )
+        return ''.join(segments)
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Bounded in-memory store of the polled time series.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import time
+import threading
+from collections import OrderedDict
+
+# import third party
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+# import local modules
+from iosxr_eznc.columnar import extract
+from iosxr_eznc.columnar import _check_numpy
+
+
+_SAMPLE_SIZE = 16  # bytes per sample: timestamp and value, both float64
+
+
+class Series(object):
+
+    """
+    Fixed size ring buffer of (timestamp, value) samples.
+    Appending is O(1); when full, the oldest sample is overwritten.
+    """
+
+    __slots__ = ('_timestamps', '_values', '_next', '_count')
+
+    def __init__(self, capacity):
+
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._values = np.zeros(capacity, dtype=np.float64)
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def capacity(self):
+        return len(self._values)
+
+    def copy(self):
+
+        series = Series.__new__(Series)
+        series._timestamps = self._timestamps.copy()
+        series._values = self._values.copy()
+        series._next = self._next
+        series._count = self._count
+        return series
+
+    def append(self, timestamp, value):
+
+        self._timestamps[self._next] = timestamp
+        self._values[self._next] = value
+        self._next = (self._next + 1) % len(self._values)
+        self._count = min(self._count + 1, len(self._values))
+
+    def window(self, seconds=None, now=None):
+
+        """
+        Returns the arrays of timestamps and values of the last `seconds` (all samples by default),
+        oldest first.
+        """
+
+        start = self._next - self._count
+        if start >= 0:
+            timestamps = self._timestamps[start:self._next]
+            values = self._values[start:self._next]
+        else:
+            timestamps = np.concatenate((self._timestamps[start:], self._timestamps[:self._next]))
+            values = np.concatenate((self._values[start:], self._values[:self._next]))
+        if seconds is not None and self._count:
+            if now is None:
+                now = timestamps[-1]
+            first = np.searchsorted(timestamps, now - seconds, side='left')
+            timestamps = timestamps[first:]
+            values = values[first:]
+        return timestamps, values
+
+    def _deltas(self, seconds=None, wrap=None):
+
+        timestamps, values = self.window(seconds)
+        delta = np.diff(values)
+        if wrap:
+            delta = np.where(delta < 0, delta + wrap, delta)
+        else:
+            delta = np.where(delta < 0, np.nan, delta)
+        return timestamps[1:], delta, np.diff(timestamps)
+
+    def rates(self, seconds=None, wrap=None):
+
+        """
+        Returns the timestamps and the per second rates between consecutive samples of a counter.
+        A negative delta (counter wrapped or reset) is corrected by `wrap`, if specified, otherwise becomes NaN.
+        """
+
+        timestamps, delta, interval = self._deltas(seconds, wrap=wrap)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return timestamps, delta / interval
+
+    def rate(self, seconds=None, wrap=None):
+
+        """
+        Returns the average per second rate of a counter over the window, NaN if fewer than two samples.
+        The intervals where the counter was reset are not counted.
+        """
+
+        _, delta, interval = self._deltas(seconds, wrap=wrap)
+        valid = ~np.isnan(delta)
+        duration = np.sum(interval[valid])
+        if not duration:
+            return np.nan
+        return np.sum(delta[valid]) / duration
+
+    def min(self, seconds=None):
+        values = self.window(seconds)[1]
+        return np.nanmin(values) if len(values) else np.nan
+
+    def max(self, seconds=None):
+        values = self.window(seconds)[1]
+        return np.nanmax(values) if len(values) else np.nan
+
+    def percentile(self, q, seconds=None):
+        values = self.window(seconds)[1]
+        return np.nanpercentile(values, q) if len(values) else np.nan
+
+
+def _entry_path(path, keys, row):
+
+    """
+    Path of a list entry, in the XPath-like format, e.g.: 'interfaces/interface[interface-name="Gi0/0/0/0"]'.
+    """
+
+    if not keys:
+        return path
+    return '{path}[{keys}]'.format(
+        path=path,
+        keys=' and '.join(['{key}="{value}"'.format(key=key, value=value) for (key, value) in zip(keys, row)])
+    )
+
+
+class TimeSeriesStore(object):
+
+    """
+    Time series of numeric leaves, per (host, path, leaf), each in a ring buffer of `capacity` samples.
+
+    The memory used by the samples never exceeds `max_bytes` for the whole store:
+    when full, the least recently updated series are evicted to make room for the new ones.
+    """
+
+    def __init__(self, capacity=720, max_bytes=64 * 1024 * 1024):
+
+        _check_numpy()
+
+        self._capacity = capacity
+        self._max_series = max(1, max_bytes // (capacity * _SAMPLE_SIZE))
+        self._series = OrderedDict()  # least recently updated first
+        self._evicted = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._series)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._series
+
+    def _get_series(self, key):
+
+        series = self._series.pop(key, None)
+        if series is None:
+            while len(self._series) >= self._max_series:
+                self._series.popitem(last=False)
+                self._evicted += 1
+            series = Series(self._capacity)
+        self._series[key] = series  # most recently updated
+        return series
+
+    def append(self, host, path, leaf, value, timestamp=None):
+
+        """
+        Records a sample.
+        """
+
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            self._get_series((host, path, leaf)).append(timestamp, value)
+
+    def add_snapshot(self, snapshot, path, host=None):
+
+        """
+        Records the columns of a columnar Snapshot, the list entries being under `path`.
+        """
+
+        if host is None:
+            host = snapshot.host
+        keys = list(snapshot.keys.keys())
+        rows = list(zip(*[snapshot.keys[key] for key in keys])) if keys else [()] * len(snapshot)
+        entry_paths = [_entry_path(path, keys, row) for row in rows]
+        with self._lock:
+            for leaf, column in snapshot.columns.items():
+                for entry_path, value in zip(entry_paths, column):
+                    if not np.isnan(value):
+                        self._get_series((host, entry_path, leaf)).append(snapshot.timestamp, value)
+
+    def add(self, reply, path, keys, host=None, timestamp=None):
+
+        """
+        Records the numeric leaves of the list found under `path` of an `RPC.get` reply.
+        The series paths are the list path followed by the keys of the entry,
+        e.g. 'data/infra-statistics/interfaces/interface[interface-name="Gi0/0/0/0"]'.
+        """
+
+        snapshot = extract(reply, path, keys, timestamp=timestamp, host=host)
+        self.add_snapshot(snapshot, path.strip('/'), host=host)
+
+    def series(self, host, path, leaf):
+
+        """
+        Returns a copy of the Series of a leaf, None if not recorded:
+        consistent, while the samples keep being appended to the store.
+        """
+
+        with self._lock:
+            series = self._series.get((host, path, leaf))
+            return series.copy() if series is not None else None
+
+    def select(self, host=None, path=None, leaf=None):
+
+        """
+        Returns the keys (host, path, leaf) of the series matching the criteria;
+        `path` matches the series path prefix.
+        """
+
+        with self._lock:
+            return [
+                key for key in self._series
+                if (host is None or key[0] == host) and
+                   (path is None or key[1].startswith(path)) and
+                   (leaf is None or key[2] == leaf)
+            ]
+
+    def rates(self, keys, seconds=None, wrap=None):
+
+        """
+        Returns the average rates of several series over the last `seconds`, as an array.
+        """
+
+        with self._lock:
+            return np.array([self._series[key].rate(seconds, wrap=wrap) if key in self._series else np.nan
+                             for key in keys])
+
+    def stats(self):
+
+        with self._lock:
+            return {
+                'series': len(self._series),
+                'max_series': self._max_series,
+                'evicted': self._evicted,
+                'bytes': len(self._series) * self._capacity * _SAMPLE_SIZE
+            }
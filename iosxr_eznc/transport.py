@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+NETCONF transport: parsing of the replies, and the on-box transport,
+talking to the local agent through a pipe, without SSH.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import os
+import shlex
+import threading
+from subprocess import Popen, PIPE
+
+# import third party
+import six
+from lxml import etree
+from ncclient import manager
+from ncclient.xml_ import XMLError
+from ncclient.xml_ import validated_element
+from ncclient.transport.ssh import SSHSession
+from ncclient.transport.ssh import MSG_DELIM
+from ncclient.transport.ssh import END_DELIM
+from ncclient.transport.errors import SessionCloseError
+
+
+# the NETCONF subsystem started by sshd on IOS-XR, speaking NETCONF on stdin / stdout
+LOCAL_AGENT = '/pkg/bin/netconf_sshd_proxy'
+BASE_11 = 'urn:ietf:params:netconf:base:1.1'
+HELLO_TAG = '{urn:ietf:params:xml:ns:netconf:base:1.0}hello'
+
+# the replies to the requests of iosxr-eznc are parsed once, with this parser, and the reply tree is then converted as-is:
+# no limit on the size of the text nodes and the depth (`huge_tree`),
+# and no whitespace-only text, as there is no mixed content in NETCONF.
+# The module level parser of ncclient, used by the other applications in the same process, is left alone.
+REPLY_PARSER = etree.XMLParser(huge_tree=True, remove_blank_text=True)
+
+
+class _ReplyParsing(object):
+
+    """
+    Mixin of the ncclient reply classes, parsing the reply with `REPLY_PARSER`:
+    `RPCReply.parse` takes an element as-is.
+    """
+
+    def parse(self):
+        if self._parsed:
+            return
+        raw = self._raw
+        self._raw = etree.fromstring(raw.encode('utf-8') if isinstance(raw, six.text_type) else raw,
+                                     parser=REPLY_PARSER)
+        try:
+            super(_ReplyParsing, self).parse()
+        finally:
+            self._raw = raw
+
+
+_OPERATIONS = {}
+
+
+def parsing_replies(operation):
+
+    """
+    Returns the subclass of the ncclient `operation` class parsing its replies with `REPLY_PARSER`.
+    """
+
+    parsing = _OPERATIONS.get(operation)
+    if parsing is None:
+        reply_cls = type(operation.REPLY_CLS.__name__, (_ReplyParsing, operation.REPLY_CLS), {})
+        parsing = _OPERATIONS[operation] = type(operation.__name__, (operation,), {'REPLY_CLS': reply_cls})
+    return parsing
+
+
+class _PipeChannel(object):
+
+    """
+    Channel over the stdin / stdout pipes of the local agent process,
+    with the subset of the paramiko channel API used by `SSHSession.run`.
+    """
+
+    def __init__(self, process):
+        self._process = process
+        self._stdin = process.stdin.fileno()
+        self._stdout = process.stdout.fileno()
+
+    def fileno(self):
+        # select() waits for data to read
+        return self._stdout
+
+    def recv(self, size):
+        return os.read(self._stdout, size)
+
+    def send_ready(self):
+        return True
+
+    def send(self, data):
+        return os.write(self._stdin, data)
+
+    def close(self):
+        if self._process.poll() is None:
+            self._process.terminate()
+        self._process.wait()
+
+
+class LocalSession(SSHSession):
+
+    """
+    NETCONF session with the agent running on the same box.
+    Reuses the parsing (1.0 and 1.1 framing) and the receiving loop of `SSHSession`, over the pipes of the
+    agent process; the messages are written right away by the caller, instead of waiting for the loop to wake up.
+    """
+
+    def __init__(self, device_handler):
+        SSHSession.__init__(self, device_handler)
+        self._host_keys = None
+        self._process = None
+        self._send_lock = threading.Lock()
+
+    def _frame(self, message):
+        try:
+            validated_element(message, tags=HELLO_TAG)
+            return '{message}{delim}'.format(message=message, delim=MSG_DELIM)  # hello: 1.0 framing
+        except XMLError:
+            pass
+        if BASE_11 in self._client_capabilities and self._server_capabilities and \
+                BASE_11 in self._server_capabilities:
+            return '\n#{length}\n{message}{delim}'.format(length=len(message), message=message, delim=END_DELIM)
+        return '{message}{delim}'.format(message=message, delim=MSG_DELIM)
+
+    def send(self, message):
+        data = self._frame(message)
+        with self._send_lock:
+            try:
+                while data:
+                    data = data[self._channel.send(data):]
+            except (OSError, AttributeError):
+                raise SessionCloseError(self._buffer.getvalue(), data)
+
+    def connect(self, command=LOCAL_AGENT):
+        if isinstance(command, basestring):
+            command = shlex.split(command)
+        self._process = Popen(command, stdin=PIPE, stdout=PIPE, bufsize=0)
+        self._channel = _PipeChannel(self._process)
+        self._channel_id = self._process.pid
+        self._channel_name = 'netconf-local'
+        self._connected = True
+        self._post_connect()
+
+    def close(self):
+        if self._channel is not None:
+            self._channel.close()
+        self._channel = None
+        self._connected = False
+
+    @property
+    def transport(self):
+        return None
+
+
+def connect_local(command=LOCAL_AGENT, timeout=None, device_params=None):
+
+    """
+    Initializes a `Manager` over the local agent, similar to `ncclient.manager.connect`.
+    """
+
+    device_handler = manager.make_device_handler(device_params or {'name': 'iosxr'})
+    manager.VENDOR_OPERATIONS.update(device_handler.add_additional_operations())
+    session = LocalSession(device_handler)
+    try:
+        session.connect(command=command)
+    except Exception:
+        session.close()
+        raise
+    return manager.Manager(session, device_handler, timeout=timeout)
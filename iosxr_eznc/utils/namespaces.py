@@ -20,6 +20,8 @@ Loads namespaces YAML file.
 from __future__ import absolute_import
 
 # import stdlib
+import os
+import re
 from os.path import splitext
 
 # third party libs
@@ -28,3 +30,46 @@ import yaml
 yaml_filename = splitext(__file__)[0] + '.yml'
 with open(yaml_filename) as ns_file:
     MAP = yaml.load(ns_file)
+
+# per release maps, e.g. namespaces-6.1.2.yml
+_RELEASE_REGEX = r'^namespaces-(.+)\.yml$'
+_MAPS = {}
+
+
+def releases():
+
+    """
+    Returns the releases having a specific namespaces map.
+    """
+
+    matches = [re.match(_RELEASE_REGEX, name) for name in os.listdir(os.path.dirname(yaml_filename))]
+    return sorted([match.group(1) for match in matches if match])
+
+
+def _components(release):
+
+    return [component for component in re.split(r'[^0-9a-zA-Z]+', release) if component]
+
+
+def load(release=None):
+
+    """
+    Returns the namespaces map of a release, e.g. '6.1.2' or '6.1.2.14I'.
+    Uses the map of the longest matching release (e.g. '6.1' for '6.1.3'), or the default map.
+    """
+
+    if not release:
+        return MAP
+    version = _components(release)
+    best = None
+    for candidate in releases():
+        components = _components(candidate)
+        if version[:len(components)] == components and (best is None or len(components) > len(_components(best))):
+            best = candidate
+    if best is None:
+        return MAP
+    if best not in _MAPS:
+        release_filename = os.path.join(os.path.dirname(yaml_filename), 'namespaces-{}.yml'.format(best))
+        with open(release_filename) as ns_file:
+            _MAPS[best] = yaml.load(ns_file)
+    return _MAPS[best]
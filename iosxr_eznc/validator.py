@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Validates the request filters against the YANG models, before sending them.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import difflib
+import logging
+
+# import local modules
+from iosxr_eznc.exception import InvalidRequestError
+
+
+log = logging.getLogger(__name__)
+
+
+def _split(ele, inherited=None):
+
+    """
+    Returns the namespace and the local name of a filter element,
+    the namespace being either in the tag, or in the `xmlns` attribute, or inherited from the parent.
+    """
+
+    if ele.tag[0] == '{':
+        namespace, name = ele.tag[1:].split('}', 1)
+        return namespace, name
+    return ele.get('xmlns', inherited), ele.tag
+
+
+def _suggest(name, candidates):
+
+    matches = difflib.get_close_matches(name, list(candidates), n=1)
+    if matches:
+        return ', did you mean "{}"?'.format(matches[0])
+    return ''
+
+
+def _check(ele, node, namespace, path, dev, prune, pruned):
+
+    """
+    Checks the children of a filter element against its schema node.
+    Returns False when all the children were pruned.
+    """
+
+    children = [child for child in ele if isinstance(child.tag, basestring)]
+    for child in children:
+        child_ns, name = _split(child, namespace)
+        child_path = '{path}/{name}'.format(path=path, name=name)
+        child_node = node.children.get(name)
+        if child_node is None:
+            if child_ns != namespace:
+                continue  # augmented by another module, unknown here
+            if not prune:
+                raise InvalidRequestError(
+                    dev,
+                    {
+                        'obj': child_path,
+                        'msg': 'Unknown node "{name}"{suggestion}'.format(
+                            name=name,
+                            suggestion=_suggest(name, node.children)
+                        )
+                    }
+                )
+            ele.remove(child)
+            pruned.append(child_path)
+            continue
+        if child_node.keyword in ('leaf', 'leaf-list', 'anyxml'):
+            if len(child):
+                if not prune:
+                    raise InvalidRequestError(
+                        dev,
+                        {
+                            'obj': child_path,
+                            'msg': 'Cannot select under the {keyword} "{name}"'.format(
+                                keyword=child_node.keyword,
+                                name=name
+                            )
+                        }
+                    )
+                ele.remove(child)
+                pruned.append(child_path)
+            continue
+        if not _check(child, child_node, child_ns, child_path, dev, prune, pruned):
+            ele.remove(child)
+    # an element whose children were all pruned would select everything under it
+    return not children or len([child for child in ele if isinstance(child.tag, basestring)]) > 0
+
+
+def validate_filter(filter_tree, dev, prune=False):
+
+    """
+    Checks a filter tree against the YANG models known to `Namespaces`: the top level containers of the
+    namespaces map, and the compiled schema trees of the modules advertised by the device.
+
+    In strict mode, raises InvalidRequestError on the first unknown node, with a suggestion,
+    and when the schema of a container is not available;
+    with `prune`, removes the unknown nodes instead and raises only when nothing valid is left,
+    the containers without schema being sent as they are.
+    The schemas are compiled in the pyang context of the device, reusing the modules already retrieved.
+    Returns the filter tree.
+    """
+
+    containers = [filter_tree]
+    if _split(filter_tree)[1] == 'filter':
+        containers = [child for child in filter_tree if isinstance(child.tag, basestring)]
+
+    pruned = []
+    for container in containers:
+        namespace, name = _split(container)
+        if namespace is None:
+            known = set([known_container
+                         for known_containers in dev.namespaces.get().values()
+                         for known_container in known_containers])
+            raise InvalidRequestError(
+                dev,
+                {
+                    'obj': name,
+                    'msg': 'Unknown container "{name}"{suggestion}'.format(
+                        name=name,
+                        suggestion=_suggest(name, known)
+                    )
+                }
+            )
+        schema = dev.namespaces.schema(namespace)
+        if not schema:
+            # module not available (not advertised or not retrieved), the filter cannot be checked
+            if not prune:
+                raise InvalidRequestError(
+                    dev,
+                    {
+                        'obj': name,
+                        'msg': 'Cannot validate "{name}", the schema of {namespace} is not available'.format(
+                            name=name,
+                            namespace=namespace
+                        )
+                    }
+                )
+            log.warning('Schema of %s not available, container "%s" not validated', namespace, name)
+            continue
+        node = schema.get(name)
+        if node is None:
+            raise InvalidRequestError(
+                dev,
+                {
+                    'obj': name,
+                    'msg': 'Unknown container "{name}" in {namespace}{suggestion}'.format(
+                        name=name,
+                        namespace=namespace,
+                        suggestion=_suggest(name, schema)
+                    )
+                }
+            )
+        if not _check(container, node, namespace, name, dev, prune, pruned):
+            raise InvalidRequestError(
+                dev,
+                {
+                    'obj': name,
+                    'msg': 'No valid node left after pruning {pruned}'.format(pruned=', '.join(pruned))
+                }
+            )
+
+    if pruned:
+        log.warning('Pruned invalid filter nodes: %s', ', '.join(pruned))
+
+    return filter_tree
@@ -29,6 +29,9 @@ setup(
     packages = find_packages(),
     platforms = 'any',
     install_requires = reqs,
+    extras_require = {
+        'numpy': ['numpy>=1.15']
+    },
     include_package_data = True,
     description = 'Python library for Cisco IOS-XR automation via NETCONF',
     author = 'Mircea Ulinic',
@@ -38,6 +41,9 @@ setup(
     keywords = ['network', 'automation', 'NETCONF', 'IOS-XR', 'IOSXR', 'Cisco'],
     license = 'Apache 2.0',
     scripts = ['iosxr_eznc/utils/iosxr_yang_namespaces'],
+    entry_points = {
+        'console_scripts': ['iosxr-eznc = iosxr_eznc.cli:main']
+    },
     classifiers = [
         'Development Status :: 5 - Production/Stable',
         'Environment :: Console',
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+
+"""
+Stand-in of the NETCONF agent of IOS-XR, over stdin/stdout, as started by the local transport.
+Replies the same operational data to every request, <ok/> to close-session.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import os
+import re
+import sys
+
+
+EOM = ']]>]]>'
+
+HELLO = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<hello xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"><capabilities>'
+    '<capability>urn:ietf:params:netconf:base:1.0</capability>'
+    '<capability>http://cisco.com/ns/yang/Cisco-IOS-XR-test-oper?'
+    'module=Cisco-IOS-XR-test-oper&amp;revision=2016-01-01</capability>'
+    '</capabilities><session-id>7</session-id></hello>'
+)
+
+DATA = (
+    '<stats xmlns="http://cisco.com/ns/yang/Cisco-IOS-XR-test-oper">'
+    '<interface><interface-name>Gi0</interface-name><packets>10</packets></interface>'
+    '<total>30</total>'
+    '</stats>'
+)
+
+REPLY = '<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0" message-id="{id}">{content}</rpc-reply>'
+
+
+def _send(message):
+
+    sys.stdout.write(message + EOM)
+    sys.stdout.flush()
+
+
+def run():
+
+    _send(HELLO)
+    buf = ''
+    while True:
+        chunk = os.read(0, 65536)
+        if not chunk:
+            return
+        buf += chunk
+        while EOM in buf:
+            message, buf = buf.split(EOM, 1)
+            message_id = re.search(r'message-id="([^"]+)"', message)
+            if not message_id:
+                continue  # hello of the client
+            if 'close-session' in message:
+                _send(REPLY.format(id=message_id.group(1), content='<ok/>'))
+                return
+            _send(REPLY.format(id=message_id.group(1), content='<data>{}</data>'.format(DATA)))
+
+
+if __name__ == '__main__':
+    run()
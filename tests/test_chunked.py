@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+
+"""
+Tests of the chunked retrieval.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import time
+import threading
+import unittest
+
+# import third party
+from lxml import etree
+
+# import local modules
+from iosxr_eznc.chunked import ChunkedGet
+from iosxr_eznc.chunked import _with_keys
+from iosxr_eznc.exception import DeadlineExceededError
+
+
+_NS = 'http://cisco.com/ns/yang/Cisco-IOS-XR-ipv4-bgp-oper'
+
+
+class _Dev(object):
+
+    hostname = 'router'
+
+
+class _Chunks(ChunkedGet):
+
+    """
+    Chunks of two keys, the second one replied only once `release` is set.
+    """
+
+    def __init__(self, deadline):
+
+        self._dev = _Dev()
+        self._deadline = deadline
+        self._parallel = 2
+        self.release = threading.Event()
+
+    def keys(self):
+
+        return [('default',), ('blue',)]
+
+    def _get(self, key):
+
+        if key == ('blue',):
+            self.release.wait(5)
+        return [key]
+
+
+class TestWithKeys(unittest.TestCase):
+
+    def _instance(self, xml):
+
+        return etree.fromstring('<instance xmlns="{ns}">{xml}</instance>'.format(ns=_NS, xml=xml))
+
+    def test_inserts_missing_keys(self):
+
+        instance = self._instance('<instance-active/>')
+        _with_keys(instance, ['instance-name'], ['default'])
+        self.assertEqual(
+            [(etree.QName(child).localname, child.text) for child in instance],
+            [('instance-name', 'default'), ('instance-active', None)]
+        )
+
+    def test_updates_selected_keys(self):
+
+        instance = self._instance('<instance-active/><instance-name/>')
+        _with_keys(instance, ['instance-name'], ['default'])
+        names = instance.findall('{{{ns}}}instance-name'.format(ns=_NS))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(names[0].text, 'default')
+
+
+class TestDeadline(unittest.TestCase):
+
+    def test_in_flight_reply_not_waited_for(self):
+
+        chunks = _Chunks(deadline=0.3)
+        entries = []
+        start = time.time()
+        try:
+            with self.assertRaises(DeadlineExceededError):
+                for entry in chunks:
+                    entries.append(entry)
+        finally:
+            chunks.release.set()
+        self.assertLess(time.time() - start, 2)
+        self.assertEqual(entries, [('default',)])
+
+    def test_without_deadline(self):
+
+        chunks = _Chunks(deadline=None)
+        chunks.release.set()
+        self.assertEqual(list(chunks), [('default',), ('blue',)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Tests of the command line tool, the devices replaced by stand-ins.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+# import third party
+import six
+
+# import local modules
+from iosxr_eznc import cli
+from iosxr_eznc.exception import ConnectError
+
+
+DATA = {'data': {'bgp': {'instances': {'instance': {'instance-name': 'default'}}}}}
+
+
+class _RPC(object):
+
+    def __init__(self, dev):
+
+        self._dev = dev
+
+    def get(self, filter, typed=False):
+
+        self._dev.requests.append(('get', filter, typed))
+        return DATA
+
+    def get_configuration(self, filter=None, typed=False):
+
+        self._dev.requests.append(('get_configuration', filter, typed))
+        return DATA
+
+
+class _Device(object):
+
+    """
+    Device answering the requests, except the hosts named "down*" that cannot be reached.
+    """
+
+    opened = []
+
+    def __init__(self, host, **kvargs):
+
+        self.hostname = host
+        self.kvargs = kvargs
+        self.connected = False
+        self.requests = []
+        self.rpc = _RPC(self)
+        self.facts = {'hostname': host}
+
+    def open(self):
+
+        if self.hostname.startswith('down'):
+            raise ConnectError(self)
+        self.connected = True
+        self.opened.append(self)
+
+    def close(self):
+
+        self.connected = False
+
+
+class TestReadHosts(unittest.TestCase):
+
+    def test_read_hosts(self):
+
+        hosts_file = tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False)
+        try:
+            hosts_file.write('edge01\n# comment\n\n  edge02  # second\n')
+            hosts_file.close()
+            args = cli._parser().parse_args(['facts', '--host', 'core01', '--hosts', hosts_file.name])
+            self.assertEqual(cli._read_hosts(args), ['core01', 'edge01', 'edge02'])
+        finally:
+            os.remove(hosts_file.name)
+
+    def test_stdin(self):
+
+        stdin = sys.stdin
+        sys.stdin = six.StringIO('edge01\nedge02\n')
+        try:
+            args = cli._parser().parse_args(['facts', '--hosts', '-'])
+            self.assertEqual(cli._read_hosts(args), ['edge01', 'edge02'])
+        finally:
+            sys.stdin = stdin
+
+
+class TestMain(unittest.TestCase):
+
+    def setUp(self):
+
+        self._device, cli.Device = cli.Device, _Device
+        self._stdout, sys.stdout = sys.stdout, six.StringIO()
+        self._stderr, sys.stderr = sys.stderr, six.StringIO()
+        _Device.opened = []
+        self._path = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        cli.Device = self._device
+        sys.stdout, sys.stderr = self._stdout, self._stderr
+        shutil.rmtree(self._path)
+
+    def _results(self):
+
+        return dict([
+            (result['host'], result)
+            for result in [json.loads(line) for line in sys.stdout.getvalue().splitlines()]
+        ])
+
+    def test_all_answered(self):
+
+        code = cli.main(['get', '--host', 'edge01', '--host', 'edge02', '--typed', '-q', 'bgp/instances'])
+        self.assertEqual(code, 0)
+        results = self._results()
+        self.assertEqual(sorted(results), ['edge01', 'edge02'])
+        self.assertTrue(results['edge01']['ok'])
+        self.assertEqual(results['edge01']['data'], DATA)
+        self.assertEqual([dev.requests for dev in _Device.opened], [[('get', 'bgp/instances', True)]] * 2)
+        self.assertFalse([dev for dev in _Device.opened if dev.connected])  # all closed
+        self.assertEqual(sys.stderr.getvalue(), '')
+
+    def test_failed_exit_code(self):
+
+        code = cli.main(['facts', '--host', 'edge01', '--host', 'down01'])
+        self.assertEqual(code, 1)
+        results = self._results()
+        self.assertTrue(results['edge01']['ok'])
+        self.assertEqual(results['edge01']['data'], {'hostname': 'edge01'})
+        self.assertFalse(results['down01']['ok'])
+        self.assertEqual(results['down01']['error_type'], 'ConnectError')
+        self.assertIn('2 hosts, 1 failed', sys.stderr.getvalue())
+
+    def test_output_dir(self):
+
+        output_dir = os.path.join(self._path, 'configs')
+        code = cli.main(['get-config', '--host', 'edge01', '--host', 'down01', '-q', '--output-dir', output_dir,
+                         'bgp'])
+        self.assertEqual(code, 1)
+        results = self._results()
+        # the data in the file, not on stdout
+        self.assertNotIn('data', results['edge01'])
+        self.assertEqual(results['edge01']['file'], os.path.join(output_dir, 'edge01.json'))
+        with open(results['edge01']['file']) as data_file:
+            self.assertEqual(json.load(data_file), DATA)
+        self.assertEqual(os.listdir(output_dir), ['edge01.json'])
+
+    def test_no_host(self):
+
+        with self.assertRaises(SystemExit) as raised:
+            cli.main(['facts'])
+        self.assertEqual(raised.exception.code, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
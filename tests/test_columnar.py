@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+
+"""
+Tests of the columnar snapshots.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import unittest
+
+# import local modules
+from iosxr_eznc import columnar
+from iosxr_eznc.exception import InvalidRequestError
+
+
+def _reply(counters):
+
+    return {
+        'data': {
+            'interfaces': {
+                'interface': [
+                    {'name': name, 'unit': unit, 'packets': packets}
+                    for (name, unit, packets) in counters
+                ]
+            }
+        }
+    }
+
+
+PATH = 'data/interfaces/interface'
+
+
+@unittest.skipUnless(columnar.HAS_NUMPY, 'numpy not installed')
+class SnapshotTest(unittest.TestCase):
+
+    def test_rates(self):
+
+        previous = columnar.extract(_reply([('Gi0', 0, 100), ('Gi1', 0, 200)]), PATH, ['name', 'unit'], timestamp=0)
+        current = columnar.extract(_reply([('Gi1', 0, 400), ('Gi0', 0, 110)]), PATH, ['name', 'unit'], timestamp=10)
+        self.assertEqual(len(current), 2)
+        result = columnar.rates(previous, current)
+        rates = dict(zip(result['name'], result['packets']))
+        self.assertEqual(rates, {'Gi0': 1.0, 'Gi1': 20.0})
+
+    def test_rates_64bit(self):
+
+        previous = columnar.extract(_reply([('Gi0', 0, 2 ** 64 - 6)]), PATH, ['name', 'unit'], timestamp=0)
+        current = columnar.extract(_reply([('Gi0', 0, 2 ** 64 - 1)]), PATH, ['name', 'unit'], timestamp=10)
+        # beyond the precision of the floats, the delta is exact
+        self.assertEqual(list(columnar.rates(previous, current)['packets']), [0.5])
+
+    def test_rates_wrap(self):
+
+        previous = columnar.extract(_reply([('Gi0', 0, 2 ** 64 - 5), ('Gi1', 0, 2 ** 32 - 5)]), PATH, ['name', 'unit'],
+                                    timestamp=0)
+        current = columnar.extract(_reply([('Gi0', 0, 5), ('Gi1', 0, 5)]), PATH, ['name', 'unit'], timestamp=10)
+        result = columnar.rates(previous, current, wrap=2 ** 64)
+        self.assertEqual(dict(zip(result['name'], result['packets']))['Gi0'], 1.0)
+        result = columnar.rates(previous, current, wrap=2 ** 32)
+        self.assertEqual(dict(zip(result['name'], result['packets']))['Gi1'], 1.0)
+        # without wrap, reset
+        result = columnar.rates(previous, current)
+        self.assertTrue(all(rate != rate for rate in result['packets']))
+
+    def test_no_keys(self):
+
+        with self.assertRaises(InvalidRequestError):
+            columnar.extract(_reply([('Gi0', 0, 100)]), PATH, [])
+
+    def test_empty_without_keys(self):
+
+        self.assertEqual(len(columnar.concat([])), 0)
+        self.assertEqual(len(columnar.extract({}, PATH, [])), 0)
+
+    def test_duplicate_keys(self):
+
+        with self.assertRaises(InvalidRequestError):
+            columnar.extract(_reply([('Gi0', 0, 100), ('Gi0', 1, 200)]), PATH, ['name'])
+
+
+if __name__ == '__main__':
+    unittest.main()
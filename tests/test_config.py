@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+
+"""
+Tests of the configuration diff and sessions.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import unittest
+
+# import third party
+from lxml import etree
+
+# import local modules
+from iosxr_eznc.schema import SchemaNode
+from iosxr_eznc.config import diff
+from iosxr_eznc.config import _schema_child
+from iosxr_eznc.config import ConfigSession
+from iosxr_eznc.exception import RPCError
+
+
+NS = 'http://cisco.com/ns/yang/Cisco-IOS-XR-test-cfg'
+OPERATION = '{urn:ietf:params:xml:ns:netconf:base:1.0}operation'
+
+
+def _schema():
+
+    bgp = SchemaNode('bgp', 'container', namespace=NS)
+    neighbor = SchemaNode('neighbor', 'list', namespace=NS, keys=['address'])
+    neighbor.children['address'] = SchemaNode('address', 'leaf')
+    neighbor.children['remote-as'] = SchemaNode('remote-as', 'leaf')
+    bgp.children['neighbor'] = neighbor
+    bgp.children['community'] = SchemaNode('community', 'leaf-list')
+    log = SchemaNode('log', 'list', namespace=NS)  # without keys
+    log.children['message'] = SchemaNode('message', 'leaf')
+    bgp.children['log'] = log
+    return {'bgp': bgp}
+
+
+def _tree(xml):
+
+    return etree.fromstring('<bgp xmlns="{ns}">{xml}</bgp>'.format(ns=NS, xml=xml),
+                            etree.XMLParser(remove_blank_text=True))
+
+
+def _diff(desired, running, schema=True):
+
+    schemas = (lambda namespace: _schema()) if schema else None
+    desired = _tree(desired)
+    return diff(desired, _tree(running), _schema_child(None, schemas, desired.tag), schemas)
+
+
+def _summary(delta):
+
+    """
+    (path, operation, text) of the elements of the delta, the operations inherited are not repeated.
+    """
+
+    if delta is None:
+        return None
+    return [
+        ('/' + '/'.join(reversed([etree.QName(node).localname for node in [ele] + list(ele.iterancestors())])),
+         ele.get(OPERATION),
+         (ele.text or '').strip() or None)
+        for ele in delta.iter()
+    ]
+
+
+def _neighbor(address, remote_as='65000'):
+
+    return '<neighbor><address>{}</address><remote-as>{}</remote-as></neighbor>'.format(address, remote_as)
+
+
+class TestDiff(unittest.TestCase):
+
+    def test_keyed_list_key_changed(self):
+
+        delta = _diff(_neighbor('2.2.2.2'), _neighbor('1.1.1.1'))
+        self.assertEqual(etree.QName(delta[0]).localname, 'neighbor')
+        self.assertEqual(delta[0].get(OPERATION), 'merge')
+        self.assertEqual([child.text for child in delta[0]], ['2.2.2.2', '65000'])
+        self.assertEqual(delta[1].get(OPERATION), 'delete')
+        self.assertEqual([child.text for child in delta[1]], ['1.1.1.1'])  # only the key
+
+    def test_keyed_list_leaf_changed(self):
+
+        delta = _diff(_neighbor('1.1.1.1', '65001'), _neighbor('1.1.1.1'))
+        self.assertEqual(
+            _summary(delta),
+            [('/bgp', None, None),
+             ('/bgp/neighbor', None, None),
+             ('/bgp/neighbor/address', None, '1.1.1.1'),
+             ('/bgp/neighbor/remote-as', 'merge', '65001')]
+        )
+
+    def test_unchanged(self):
+
+        self.assertIsNone(_diff(_neighbor('1.1.1.1'), _neighbor('1.1.1.1')))
+        self.assertIsNone(_diff(_neighbor('1.1.1.1'), _neighbor('1.1.1.1'), schema=False))
+
+    def test_keyless_list(self):
+
+        delta = _diff('<log><message>b</message></log>', '<log><message>a</message></log>')
+        self.assertEqual(_summary(delta), [('/bgp', 'replace', None), ('/bgp/log', None, None),
+                                           ('/bgp/log/message', None, 'b')])
+
+    def test_leaf_list(self):
+
+        delta = _diff('<community>a</community><community>c</community>',
+                      '<community>a</community><community>b</community>')
+        self.assertEqual(
+            _summary(delta),
+            [('/bgp', None, None),
+             ('/bgp/community', 'merge', 'c'),
+             ('/bgp/community', 'delete', 'b')]
+        )
+
+    def test_without_schema(self):
+
+        # the entries cannot be matched by their keys: the parent is replaced, the old entry removed with it
+        delta = _diff(_neighbor('2.2.2.2'), _neighbor('1.1.1.1'), schema=False)
+        self.assertEqual(delta.get(OPERATION), 'replace')
+        self.assertEqual([child.text for child in delta[0]], ['2.2.2.2', '65000'])
+        self.assertEqual(len(delta), 1)
+
+    def test_without_schema_leaves(self):
+
+        delta = _diff('<as>65001</as>', '<as>65000</as>', schema=False)
+        self.assertEqual(_summary(delta), [('/bgp', None, None), ('/bgp/as', 'merge', '65001')])
+
+
+class _Namespaces(object):
+
+    def get(self, container, oper=False):
+
+        return NS if container == 'bgp' else None
+
+    def schema(self, namespace):
+
+        return _schema() if namespace == NS else {}
+
+
+class _RPC(object):
+
+    def __init__(self, dev, fail=None, error_path=None):
+
+        self._dev = dev
+        self._fail = fail
+        self._error_path = error_path
+        self.calls = []
+
+    def _call(self, name, *vargs, **kvargs):
+
+        self.calls.append((name, vargs, kvargs))
+        if name == self._fail:
+            raise RPCError(self._dev, {'path': self._error_path, 'message': 'Invalid value'})
+
+    def lock(self, target='candidate'):
+        self._call('lock', target=target)
+
+    def unlock(self, target='candidate'):
+        self._call('unlock', target=target)
+
+    def edit_config(self, config, operation='merge', target='candidate'):
+        self._call('edit_config', config, operation=operation, target=target)
+
+    def validate(self, source='candidate'):
+        self._call('validate', source=source)
+
+    def commit(self, confirmed=None, timeout=None):
+        self._call('commit', confirmed=confirmed, timeout=timeout)
+        return True
+
+    def discard_changes(self):
+        self._call('discard_changes')
+
+
+class _Dev(object):
+
+    hostname = 'router'
+
+    def __init__(self, fail=None, error_path=None):
+
+        self.namespaces = _Namespaces()
+        self.rpc = _RPC(self, fail=fail, error_path=error_path)
+
+
+def _snippet(xml):
+
+    return '<bgp>{xml}</bgp>'.format(xml=xml)
+
+
+class TestConfigSession(unittest.TestCase):
+
+    def _names(self, dev):
+
+        return [name for (name, _, _) in dev.rpc.calls]
+
+    def test_commit(self):
+
+        dev = _Dev()
+        with ConfigSession(dev) as cfg:
+            self.assertEqual(cfg.load(_snippet(_neighbor('10.0.0.1'))), 0)
+            self.assertEqual(cfg.load(_snippet(_neighbor('10.0.0.2') + _neighbor('10.0.0.1', '65001'))), 1)
+            self.assertTrue(cfg.commit(confirmed=True, timeout=120))
+            self.assertEqual(len(cfg), 0)
+        self.assertEqual(self._names(dev), ['lock', 'edit_config', 'validate', 'commit', 'unlock'])
+        _, (config,), kvargs = dev.rpc.calls[1]
+        self.assertEqual(kvargs, {'operation': 'merge', 'target': 'candidate'})
+        # a single document, the list entries merged by their keys
+        self.assertEqual(
+            [(path, text) for (path, _, text) in _summary(config) if path.endswith('remote-as')],
+            [('/config/bgp/neighbor/remote-as', '65001'), ('/config/bgp/neighbor/remote-as', '65000')]
+        )
+        self.assertEqual(dev.rpc.calls[3][2], {'confirmed': True, 'timeout': 120})
+
+    def test_config_document(self):
+
+        cfg = ConfigSession(_Dev(), lock=False)
+        self.assertEqual(cfg.load('<config>{}{}</config>'.format(_snippet(''), _snippet(''))), 1)
+        self.assertEqual(len(cfg), 2)
+
+    def test_push_failed(self):
+
+        dev = _Dev(fail='validate', error_path="/bgp/neighbor[address = '10.0.0.2']/remote-as")
+        snippets = [
+            _snippet(_neighbor('10.0.0.1')),
+            _snippet(_neighbor('10.0.0.2')),
+            _snippet('<community>1</community>')
+        ]
+        with self.assertRaises(RPCError) as raised:
+            with ConfigSession(dev) as cfg:
+                for snippet in snippets:
+                    cfg.load(snippet)
+                cfg.commit()
+        # the snippet defining the neighbor the error refers to
+        self.assertEqual(raised.exception.snippets, [(1, snippets[1])])
+        self.assertEqual(raised.exception._err['snippets'], [1])
+        self.assertEqual(self._names(dev), ['lock', 'edit_config', 'validate', 'discard_changes', 'unlock'])
+
+    def test_snippets_for(self):
+
+        cfg = ConfigSession(_Dev(), lock=False)
+        for snippet in (_snippet(_neighbor('10.0.0.1')), _snippet('<community>1</community>')):
+            cfg.load(snippet)
+        error = lambda path: RPCError(None, {'path': path})
+        # not deep enough to tell: all the snippets of the container
+        self.assertEqual([index for (index, _) in cfg.snippets_for(error('/bgp'))], [0, 1])
+        self.assertEqual([index for (index, _) in cfg.snippets_for(error("/bgp/neighbor[address='10.0.0.1']"))], [0])
+        # the other neighbors contradict the path, the snippet without neighbors does not
+        self.assertEqual([index for (index, _) in cfg.snippets_for(error("/bgp/neighbor[address='10.0.0.9']"))], [1])
+        self.assertEqual(cfg.snippets_for(error('/routing')), [])
+        self.assertEqual(cfg.snippets_for(error(None)), [])
+
+    def test_unlocked_after_failed_commit(self):
+
+        dev = _Dev(fail='commit')
+        with self.assertRaises(RPCError):
+            with ConfigSession(dev, validate=False) as cfg:
+                cfg.load(_snippet(_neighbor('10.0.0.1')))
+                cfg.commit()
+        self.assertEqual(self._names(dev), ['lock', 'edit_config', 'commit', 'discard_changes', 'unlock'])
+
+
+if __name__ == '__main__':
+    unittest.main()
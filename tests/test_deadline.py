@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+
+"""
+Tests of the deadlines.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import time
+import threading
+import unittest
+
+# import local modules
+from iosxr_eznc import deadline
+from iosxr_eznc.deadline import Deadline
+
+
+class TestDeadline(unittest.TestCase):
+
+    def test_remaining(self):
+
+        self.assertIsNone(Deadline().remaining())
+        self.assertAlmostEqual(Deadline(10).remaining(), 10, places=1)
+        self.assertEqual(Deadline(-1).remaining(), 0.0)
+        self.assertTrue(Deadline(-1).expired)
+
+    def test_cancel(self):
+
+        cancelled = Deadline()
+        thread = threading.Thread(target=cancelled.cancel)
+        thread.start()
+        thread.join()
+        self.assertTrue(cancelled.cancelled)
+        self.assertTrue(cancelled.expired)
+
+
+class TestNesting(unittest.TestCase):
+
+    def test_no_deadline(self):
+
+        self.assertEqual(deadline.active(), [])
+        self.assertIsNone(deadline.remaining())
+        self.assertFalse(deadline.expired())
+        self.assertEqual(deadline.rpc_timeout(30), 30)
+        self.assertIsNone(deadline.rpc_timeout(None))
+
+    def test_earliest_applies(self):
+
+        with deadline.scope(10) as outer:
+            with deadline.scope(None) as inner:
+                self.assertIsNone(inner)
+                self.assertEqual(deadline.active(), [outer])
+            with deadline.scope(Deadline(1)) as inner:
+                self.assertEqual(deadline.active(), [inner, outer])
+                self.assertLessEqual(deadline.remaining(), 1)
+                self.assertLessEqual(deadline.rpc_timeout(30), 1)
+                self.assertEqual(deadline.rpc_timeout(0.5), 0.5)  # the device timeout, when shorter
+                self.assertLessEqual(deadline.rpc_timeout(None), 1)
+            with deadline.scope(20):
+                self.assertLessEqual(deadline.remaining(), 10)
+            self.assertEqual(deadline.active(), [outer])
+        self.assertEqual(deadline.active(), [])
+
+    def test_popped_on_error(self):
+
+        with self.assertRaises(ValueError):
+            with deadline.scope(10):
+                raise ValueError()
+        self.assertEqual(deadline.active(), [])
+
+    def test_shield(self):
+
+        with deadline.scope(-1):
+            self.assertTrue(deadline.expired())
+            with deadline.shield(5) as shielded:
+                self.assertEqual(deadline.active(), [shielded])
+                self.assertFalse(deadline.expired())
+                self.assertLessEqual(deadline.rpc_timeout(30), 5)
+                with deadline.scope(1) as inner:
+                    # the deadlines within the shield still apply
+                    self.assertEqual(deadline.active(), [inner, shielded])
+            with deadline.shield():
+                self.assertIsNone(deadline.remaining())
+                self.assertEqual(deadline.rpc_timeout(30), 30)
+            self.assertTrue(deadline.expired())
+
+    def test_explicit_deadlines(self):
+
+        with deadline.scope(1):
+            deadlines = deadline.active()
+        self.assertEqual(deadline.active(), [])
+        self.assertLessEqual(deadline.remaining(deadlines), 1)
+
+
+class TestPropagate(unittest.TestCase):
+
+    def _in_thread(self, fun):
+
+        results = []
+        thread = threading.Thread(target=lambda: results.append(fun()))
+        thread.start()
+        thread.join()
+        return results[0]
+
+    def test_other_thread(self):
+
+        with deadline.scope(10) as outer:
+            with deadline.shield(5):
+                # the thread local stack is not inherited by the other threads
+                self.assertIsNone(self._in_thread(deadline.remaining))
+                propagated = deadline.propagate(deadline.active)
+        self.assertEqual(len(self._in_thread(propagated)), 1)  # the shield hides the outer deadline
+        with deadline.scope(1):
+            propagated = deadline.propagate(deadline.remaining)
+        self.assertLessEqual(self._in_thread(propagated), 1)
+        self.assertFalse(outer.expired)
+
+    def test_restored(self):
+
+        with deadline.scope(1):
+            propagated = deadline.propagate(deadline.active)
+        with deadline.scope(10) as current:
+            self.assertEqual(len(propagated()), 1)
+            self.assertEqual(deadline.active(), [current])
+
+    def test_expiration(self):
+
+        with deadline.scope(0.05):
+            propagated = deadline.propagate(deadline.expired)
+        time.sleep(0.1)
+        self.assertTrue(self._in_thread(propagated))
+
+
+if __name__ == '__main__':
+    unittest.main()
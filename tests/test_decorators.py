@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+
+"""
+Tests of the RPC decorators.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import io
+import gzip
+import unittest
+
+# import third party
+from lxml import etree
+from ncclient.operations.rpc import RPCError as NcRPCError
+from ncclient.operations.retrieve import GetReply
+
+# import local modules
+from iosxr_eznc.decorators import jsonify
+from iosxr_eznc.decorators import raise_eznc_exception
+from iosxr_eznc.exception import EditConfigError
+
+
+_BASE_NS = 'urn:ietf:params:xml:ns:netconf:base:1.0'
+
+
+def _rpc_error(tag, path, message, severity):
+
+    return etree.fromstring(
+        '<rpc-error xmlns="{ns}">'
+        '<error-type>application</error-type>'
+        '<error-tag>{tag}</error-tag>'
+        '<error-severity>{severity}</error-severity>'
+        '<error-path>\n  {path}\n</error-path>'
+        '<error-message>{message}</error-message>'
+        '</rpc-error>'.format(ns=_BASE_NS, tag=tag, path=path, message=message, severity=severity)
+    )
+
+
+class _Dev(object):
+
+    hostname = 'router'
+    timeout = 30
+
+
+class _RPC(object):
+
+    def __init__(self, nc_err):
+
+        self._dev = _Dev()
+        self._nc_err = nc_err
+
+    @raise_eznc_exception
+    def edit_config(self):
+
+        raise self._nc_err
+
+
+class TestRaiseEzncException(unittest.TestCase):
+
+    def test_single_error(self):
+
+        raw = _rpc_error('invalid-value', '/a:interfaces/a:mtu', 'Invalid MTU', 'error')
+        with self.assertRaises(EditConfigError) as raised:
+            _RPC(NcRPCError(raw)).edit_config()
+        err = raised.exception
+        self.assertEqual((err.tag, err.path, err.message, err.severity),
+                         ('invalid-value', '/a:interfaces/a:mtu', 'Invalid MTU', 'error'))
+        self.assertEqual(err.errors, [])
+
+    def test_many_errors(self):
+
+        # ncclient sets only `errors`, `_severity` and `_message` on the error with many `rpc-error`
+        raws = [
+            _rpc_error('data-exists', '/a:interfaces/a:description', 'Already set', 'warning'),
+            _rpc_error('invalid-value', '/a:interfaces/a:mtu', 'Invalid MTU', 'error')
+        ]
+        nc_err = NcRPCError(etree.Element('rpc-reply'), [NcRPCError(raw) for raw in raws])
+        with self.assertRaises(EditConfigError) as raised:
+            _RPC(nc_err).edit_config()
+        err = raised.exception
+        self.assertEqual(err.tag, 'invalid-value')
+        self.assertEqual(err.path, '/a:interfaces/a:mtu')
+        self.assertEqual(err.severity, 'error')
+        self.assertEqual(err.message, 'warning: Already set\nerror: Invalid MTU')
+        self.assertEqual([error['tag'] for error in err.errors], ['data-exists', 'invalid-value'])
+
+
+GET_REPLY = (
+    '<rpc-reply xmlns="{ns}" message-id="urn:uuid:1">'
+    '<data>'
+    '<stats xmlns="http://cisco.com/ns/yang/Cisco-IOS-XR-test-oper">'
+    '<interface><interface-name>Gi0</interface-name><packets>10</packets></interface>'
+    '</stats>'
+    '<system xmlns="http://cisco.com/ns/yang/Cisco-IOS-XR-test-cfg"><hostname>router</hostname></system>'
+    '</data>'
+    '</rpc-reply>'
+).format(ns=_BASE_NS)
+
+
+class _GetRPC(object):
+
+    _dev = _Dev()
+
+    @jsonify
+    def get(self):
+
+        reply = GetReply(GET_REPLY)
+        reply.parse()
+        return reply
+
+
+def _elements(data_ele):
+
+    return [(ele.tag, ele.text) for ele in data_ele.iter()]
+
+
+class TestDumpReply(unittest.TestCase):
+
+    def test_sink(self):
+
+        raw = _GetRPC().get(raw=True)
+        sink = io.BytesIO()
+        self.assertIs(_GetRPC().get(sink=sink), sink)
+        dumped = etree.fromstring(sink.getvalue())
+        # the same document as with `raw`, <data> qualified
+        self.assertEqual(dumped.tag, '{{{ns}}}data'.format(ns=_BASE_NS))
+        self.assertEqual(_elements(dumped), _elements(raw))
+
+    def test_compress(self):
+
+        raw = _GetRPC().get(raw=True)
+        sink = io.BytesIO()
+        _GetRPC().get(sink=sink, compress=True)
+        dumped = etree.fromstring(gzip.GzipFile(fileobj=io.BytesIO(sink.getvalue())).read())
+        self.assertEqual(_elements(dumped), _elements(raw))
+
+
+if __name__ == '__main__':
+    unittest.main()
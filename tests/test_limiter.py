@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Tests of the adaptive limit of the requests in flight.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import time
+import threading
+import unittest
+
+# import local modules
+from iosxr_eznc.limiter import AdaptiveLimiter
+
+
+def _in_thread(fun):
+
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fun()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+class _Request(threading.Thread):
+
+    """
+    Request in flight in its own thread, holding its slot until `finish`.
+    """
+
+    def __init__(self, limiter, **outcome):
+
+        threading.Thread.__init__(self)
+        self._limiter = limiter
+        self._outcome = outcome
+        self._acquired = threading.Event()
+        self._done = threading.Event()
+        self.start()
+        self._acquired.wait()
+
+    def run(self):
+
+        ticket = self._limiter.acquire()
+        self._acquired.set()
+        self._done.wait()
+        self._limiter.release(ticket, **self._outcome)
+
+    def finish(self):
+
+        self._done.set()
+        self.join()
+
+
+class TestAIMD(unittest.TestCase):
+
+    def test_increase(self):
+
+        limiter = AdaptiveLimiter(initial=1)
+        limiter.release(limiter.acquire())
+        self.assertEqual(limiter.limit, 2)
+        # by 1 / limit for each request completed while the limit was reached
+        requests = [_Request(limiter), _Request(limiter)]
+        for request in requests:
+            request.finish()
+        self.assertEqual(limiter.stats()['increases'], 2)
+        self.assertEqual(limiter._limit, 2.5)
+
+    def test_not_saturated(self):
+
+        limiter = AdaptiveLimiter(initial=4)
+        limiter.release(limiter.acquire())
+        self.assertEqual(limiter.limit, 4)
+
+    def test_maximum(self):
+
+        limiter = AdaptiveLimiter(initial=2, maximum=2)
+        for request in [_Request(limiter), _Request(limiter)]:
+            request.finish()
+        self.assertEqual(limiter.limit, 2)
+
+    def test_decrease_once_per_round(self):
+
+        limiter = AdaptiveLimiter(initial=8)
+        for request in [_Request(limiter, congested=True) for _ in range(4)]:
+            request.finish()
+        # the requests in flight when the first one timed out are not counted again
+        self.assertEqual(limiter.limit, 4)
+        self.assertEqual(limiter.stats()['decreases'], 1)
+        self.assertEqual(limiter.stats()['timeouts'], 4)
+        limiter.release(limiter.acquire(), congested=True)
+        self.assertEqual(limiter.limit, 2)
+
+    def test_minimum(self):
+
+        limiter = AdaptiveLimiter(initial=2, minimum=2)
+        limiter.release(limiter.acquire(), congested=True)
+        self.assertEqual(limiter.limit, 2)
+
+    def test_slow(self):
+
+        limiter = AdaptiveLimiter(initial=4, slow_ratio=0.5)
+        seq, saturated, start = limiter.acquire()
+        limiter.release((seq, saturated, start - 6), timeout=10)
+        self.assertEqual(limiter.limit, 2)
+        self.assertEqual(limiter.stats()['slow'], 1)
+        # without timeout nor latency target, never slow
+        seq, saturated, start = limiter.acquire()
+        limiter.release((seq, saturated, start - 6))
+        self.assertEqual(limiter.limit, 2)
+
+    def test_failed_or_cancelled(self):
+
+        limiter = AdaptiveLimiter(initial=1)
+        limiter.release(limiter.acquire(), failed=True)
+        limiter.release(limiter.acquire(), cancelled=True)
+        stats = limiter.stats()
+        self.assertEqual((stats['limit'], stats['inflight'], stats['errors'], stats['requests']), (1, 0, 1, 1))
+
+
+class TestSlots(unittest.TestCase):
+
+    def test_wait_timeout(self):
+
+        limiter = AdaptiveLimiter(initial=1)
+        ticket = limiter.acquire()
+        start = time.time()
+        self.assertIs(_in_thread(lambda: limiter.acquire(timeout=0.05)), False)
+        self.assertGreaterEqual(time.time() - start, 0.05)
+        limiter.release(ticket)
+        self.assertTrue(_in_thread(lambda: limiter.acquire(timeout=0.05)))
+
+    def test_released_to_waiting(self):
+
+        limiter = AdaptiveLimiter(initial=1)
+        ticket = limiter.acquire()
+        acquired = []
+        thread = threading.Thread(target=lambda: acquired.append(limiter.acquire(timeout=5)))
+        thread.start()
+        time.sleep(0.05)
+        self.assertEqual(acquired, [])
+        limiter.release(ticket)
+        thread.join()
+        self.assertTrue(acquired[0])
+
+    def test_nested_held(self):
+
+        limiter = AdaptiveLimiter(initial=1)
+        ticket = limiter.acquire()
+        # e.g. the mirror refreshed during a commit: the slot of the thread is used
+        nested = limiter.acquire(timeout=0)
+        self.assertIsNone(nested)
+        self.assertEqual(limiter.stats()['inflight'], 1)
+        limiter.release(nested)
+        self.assertEqual(limiter.stats()['inflight'], 1)
+        # the other threads still wait
+        self.assertIs(_in_thread(lambda: limiter.acquire(timeout=0)), False)
+        limiter.release(ticket)
+        self.assertEqual(limiter.stats()['inflight'], 0)
+        self.assertEqual(limiter.stats()['requests'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+
+"""
+Tests of the running configuration mirror.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import unittest
+
+# import third party
+from lxml import etree
+
+# import local modules
+from iosxr_eznc.mirror import Mirror
+from iosxr_eznc.exception import ConnectionClosedError
+
+NAMESPACE = 'http://cisco.com/ns/yang/Cisco-IOS-XR-test-cfg'
+CONTAINER = '{%s}hostname' % NAMESPACE
+
+
+class _FakeRPC(object):
+
+    def __init__(self, dev):
+        self._dev = dev
+        self.downloads = 0
+
+    def get_configuration(self, filter=None, raw=False):
+        self.downloads += 1
+        data = etree.Element('data')
+        etree.SubElement(data, CONTAINER, nsmap={None: NAMESPACE}).text = self._dev.running
+        return data
+
+
+class _FakeDev(object):
+
+    hostname = 'fake'
+    _typed = False
+
+    def __init__(self):
+        self.running = 'r1'
+        self.commits = ['c1']
+        self.broken = False
+        self.rpc = _FakeRPC(self)
+
+    def commit(self, running):
+        self.running = running
+        self.commits.append('c{}'.format(len(self.commits) + 1))
+
+
+def _last(dev):
+    return dev.commits[-1]
+
+
+def _history(dev):
+    if dev.broken:
+        raise ConnectionClosedError(dev)
+    return list(dev.commits)
+
+
+def _edit(text):
+    config = etree.Element('config')
+    etree.SubElement(config, CONTAINER, nsmap={None: NAMESPACE}).text = text
+    return config
+
+
+class MirrorCommitTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.dev = _FakeDev()
+        self.mirror = Mirror(self.dev, change_check=_last, history=_history, schema=False)
+        self.container = etree.Element(CONTAINER)
+        self.assertEqual(self.mirror.tree(self.container).text, 'r1')
+
+    def _commit(self, text):
+
+        self.mirror.stage(_edit(text))
+        self.dev.commit(text)
+        self.mirror.commit()
+
+    def test_own_commit(self):
+
+        self._commit('r2')
+        self.assertEqual(self.mirror.tree(self.container).text, 'r2')
+        self.assertEqual(self.dev.rpc.downloads, 1)  # applied locally
+
+    def test_other_session_committed_before(self):
+
+        self.dev.commit('other')  # not seen by the mirror
+        self._commit('r3')
+        self.dev.running = 'other+r3'
+        self.assertEqual(self.mirror.tree(self.container).text, 'other+r3')
+        self.assertEqual(self.dev.rpc.downloads, 2)
+
+    def test_connection_error(self):
+
+        self.dev.broken = True
+        self._commit('r2')  # does not raise: the commit succeeded
+        self.dev.broken = False
+        self.dev.running = 'r2'
+        self.assertEqual(self.mirror.tree(self.container).text, 'r2')
+        self.assertEqual(self.dev.rpc.downloads, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Tests of the namespaces map built from the YANG modules.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import os
+import shutil
+import tempfile
+import unittest
+
+# import local modules
+from iosxr_eznc.namespaces import Namespaces
+from iosxr_eznc.exception import RPCError
+
+
+NAMESPACE = 'http://cisco.com/ns/yang/Cisco-IOS-XR-test-cfg'
+
+MODULES = {
+    'Cisco-IOS-XR-types': '''
+module Cisco-IOS-XR-types {
+  namespace "http://cisco.com/ns/yang/Cisco-IOS-XR-types";
+  prefix xr;
+  revision 2016-01-01;
+
+  grouping system {
+    container system {
+      leaf hostname { type string; }
+    }
+  }
+}
+''',
+    'Cisco-IOS-XR-test-cfg-sub1': '''
+submodule Cisco-IOS-XR-test-cfg-sub1 {
+  belongs-to Cisco-IOS-XR-test-cfg { prefix test; }
+  revision 2016-01-01;
+
+  grouping interfaces {
+    container interfaces {
+      leaf mtu { type uint32; }
+    }
+    uses routing;
+  }
+
+  grouping routing {
+    container routing {
+      leaf enabled { type boolean; }
+    }
+  }
+}
+''',
+    'Cisco-IOS-XR-test-cfg': '''
+module Cisco-IOS-XR-test-cfg {
+  namespace "http://cisco.com/ns/yang/Cisco-IOS-XR-test-cfg";
+  prefix test;
+  import Cisco-IOS-XR-types { prefix xr; }
+  include Cisco-IOS-XR-test-cfg-sub1 { revision-date 2016-01-01; }
+  revision 2016-01-01;
+
+  container global {
+    leaf name { type string; }
+  }
+  uses xr:system;
+  uses interfaces;
+}
+'''
+}
+
+CAPABILITIES = [
+    'http://cisco.com/ns/yang/Cisco-IOS-XR-types?module=Cisco-IOS-XR-types&revision=2016-01-01',
+    '{ns}?module=Cisco-IOS-XR-test-cfg&revision=2016-01-01'.format(ns=NAMESPACE),
+    '{ns}?module=Cisco-IOS-XR-test-cfg-sub1&revision=2016-01-01'.format(ns=NAMESPACE)
+]
+
+CONTAINERS = ['global', 'system', 'interfaces', 'routing']
+
+
+class _RPC(object):
+
+    def __init__(self, dev):
+
+        self._dev = dev
+        self.fetched = []
+
+    def get_schema(self, identifier, version=None, format=None):
+
+        self.fetched.append(identifier)
+        if identifier not in MODULES:
+            raise RPCError(self._dev, {'message': 'Unknown module'})
+        return {'data': MODULES[identifier]}
+
+
+class _Conn(object):
+
+    server_capabilities = CAPABILITIES
+
+
+class _Dev(object):
+
+    _release = None
+    _preload_schemas = True
+    _conn = _Conn()
+
+    def __init__(self):
+
+        self.rpc = _RPC(self)
+
+
+class TestGroupings(unittest.TestCase):
+
+    def test_repository_path(self):
+
+        path = tempfile.mkdtemp()
+        try:
+            for name, raw_yang_module in MODULES.items():
+                with open(os.path.join(path, '{name}.yang'.format(name=name)), 'w') as yang_file:
+                    yang_file.write(raw_yang_module)
+            namespaces = Namespaces()
+            namespaces.init_pyang_context(path)
+            namespaces.yang_register('Cisco-IOS-XR-test-cfg', MODULES['Cisco-IOS-XR-test-cfg'])
+        finally:
+            shutil.rmtree(path)
+        # the imported grouping, the submodule grouping, and the grouping used by the latter
+        self.assertEqual(namespaces.get()[NAMESPACE], CONTAINERS)
+
+    def test_device(self):
+
+        dev = _Dev()
+        namespaces = Namespaces(dev)
+        self.assertEqual(namespaces.get()[NAMESPACE], CONTAINERS)
+        # each module retrieved once
+        self.assertEqual(sorted(dev.rpc.fetched), sorted(MODULES))
+
+    def test_schema_reuses_modules(self):
+
+        dev = _Dev()
+        namespaces = Namespaces(dev)
+        self.assertEqual(namespaces.modules()[NAMESPACE], ('Cisco-IOS-XR-test-cfg', '2016-01-01'))
+        fetched = list(dev.rpc.fetched)
+        try:
+            schema = namespaces.schema(NAMESPACE)
+        finally:
+            Namespaces._SCHEMAS.clear()
+        self.assertEqual(sorted(schema), sorted(CONTAINERS))
+        # compiled from the modules retrieved when preloading
+        self.assertEqual(dev.rpc.fetched, fetched)
+
+    def test_unresolved(self):
+
+        namespaces = Namespaces()
+        namespaces.init_pyang_context()
+        namespaces.yang_register('Cisco-IOS-XR-test-cfg', MODULES['Cisco-IOS-XR-test-cfg'])
+        # the groupings of the modules not found are skipped
+        self.assertEqual(namespaces.get()[NAMESPACE], ['global'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+
+"""
+Tests of the pool of device sessions.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import unittest
+
+# import local modules
+from iosxr_eznc.pool import DevicePool
+
+
+class _Conn(object):
+
+    connected = True
+
+
+class _Dev(object):
+
+    def __init__(self, hostname):
+
+        self.hostname = hostname
+        self.connected = True
+        self._conn = _Conn()
+        self.closed = False
+
+    def close(self):
+
+        self.closed = True
+        self.connected = False
+
+
+class TestPool(unittest.TestCase):
+
+    def test_release_to_the_host_leased(self):
+
+        # the factory resolves the names, the hostname of the devices is the address
+        pool = DevicePool(factory=lambda host: _Dev('192.0.2.1'), max_size=1, health_check=None)
+        dev = pool.lease('router1')
+        pool.release(dev)
+        self.assertEqual(pool.stats()['hosts'], {'router1': {'size': 1, 'idle': 1}})
+        self.assertIs(pool.lease('router1', timeout=0), dev)
+        pool.release(dev, discard=True)
+        self.assertTrue(dev.closed)
+        self.assertEqual(pool.stats()['hosts'], {'router1': {'size': 0, 'idle': 0}})
+
+    def test_health_check_error_replaces_the_session(self):
+
+        def _check(dev):
+            raise ValueError('Unexpected reply')
+
+        pool = DevicePool(factory=_Dev, max_size=1, check_interval=0, health_check=_check)
+        dev = pool.lease('router1')
+        pool.release(dev)
+        replacement = pool.lease('router1', timeout=0)
+        self.assertIsNot(replacement, dev)
+        self.assertTrue(dev.closed)
+        self.assertEqual(pool.stats()['failed_checks'], 1)
+        pool.release(replacement)
+        pool.close()
+        self.assertTrue(replacement.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
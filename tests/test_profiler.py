@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Tests of the RPC requests profiler.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+
+# import third party
+from lxml import etree
+
+# import local modules
+from iosxr_eznc.profiler import Profiler
+from iosxr_eznc.profiler import container_name
+
+
+def _request(size=1000):
+
+    return sum(range(size))
+
+
+class _Dev(object):
+
+    _profiler = None
+
+
+class TestContainerName(unittest.TestCase):
+
+    def test_container_name(self):
+
+        self.assertEqual(container_name('<filter><interfaces xmlns="urn:test"/></filter>'), 'interfaces')
+        self.assertEqual(container_name('<xr:bgp xmlns:xr="urn:test"/>'), 'bgp')
+        self.assertEqual(container_name(etree.fromstring('<config><bgp/></config>')), 'bgp')
+        self.assertEqual(container_name('interfaces/interface[name="Gi0"]'), 'interfaces')
+        self.assertIsNone(container_name(None))
+
+
+class TestSampling(unittest.TestCase):
+
+    def test_not_sampled(self):
+
+        profiler = Profiler(sample_rate=0)
+        for _ in range(3):
+            self.assertEqual(profiler.run('get', 'interfaces', _request), 499500)
+        stats, = profiler.stats()
+        self.assertEqual((stats['method'], stats['container'], stats['calls'], stats['sampled']),
+                         ('get', 'interfaces', 3, 0))
+        self.assertEqual(stats['functions'], [])
+
+    def test_sampled(self):
+
+        profiler = Profiler(sample_rate=1.0, memory=False)
+        profiler.run('get', 'interfaces', _request, size=10)
+        profiler.run('get', 'interfaces', _request, size=10)
+        profiler.run('get_config', 'bgp', _request)
+        stats = dict([((stats['method'], stats['container']), stats) for stats in profiler.stats()])
+        self.assertEqual((stats[('get', 'interfaces')]['calls'], stats[('get', 'interfaces')]['sampled']), (2, 2))
+        functions = [function['function'] for function in stats[('get_config', 'bgp')]['functions']]
+        self.assertTrue([function for function in functions if function.endswith('(_request)')])
+        self.assertIsNone(stats[('get', 'interfaces')]['peak_memory'])
+
+    def test_one_at_a_time(self):
+
+        profiler = Profiler(sample_rate=1.0, memory=False)
+        # nested: the request profiled already, the inner one is only timed
+        profiler.run('commit', None, profiler.run, 'get', 'interfaces', _request)
+        stats = dict([(stats['method'], stats) for stats in profiler.stats()])
+        self.assertEqual(stats['commit']['sampled'], 1)
+        self.assertEqual((stats['get']['calls'], stats['get']['sampled']), (1, 0))
+
+    def test_failed_recorded(self):
+
+        profiler = Profiler(sample_rate=1.0, memory=False)
+        with self.assertRaises(ZeroDivisionError):
+            profiler.run('get', 'interfaces', lambda: 1 / 0)
+        self.assertEqual(profiler.stats()[0]['sampled'], 1)
+        # released: the next request can be profiled
+        profiler.run('get', 'interfaces', _request)
+        self.assertEqual(profiler.stats()[0]['sampled'], 2)
+        profiler.reset()
+        self.assertEqual(profiler.stats(), [])
+
+    def test_devices(self):
+
+        dev = _Dev()
+        with Profiler(devices=[dev]) as profiler:
+            self.assertIs(dev._profiler, profiler)
+        self.assertIsNone(dev._profiler)
+
+
+class TestDump(unittest.TestCase):
+
+    def setUp(self):
+
+        self._path = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        shutil.rmtree(self._path)
+
+    def test_dump(self):
+
+        profiler = Profiler(sample_rate=1.0, memory=False)
+        profiler.run('get', 'interfaces/interface', _request)
+        profiler.run('commit', None, _request)
+        path = os.path.join(self._path, 'profiles')
+        files = sorted(profiler.dump(path))
+        self.assertEqual([os.path.basename(filepath) for filepath in files],
+                         ['commit-all.prof', 'get-interfaces_interface.prof'])
+        # readable by the pstats tools
+        functions = [name for (_, _, name) in pstats.Stats(files[1]).stats]
+        self.assertIn('_request', functions)
+
+    def test_dump_not_sampled(self):
+
+        profiler = Profiler(sample_rate=0)
+        profiler.run('get', 'interfaces', _request)
+        self.assertEqual(profiler.dump(self._path), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Tests of the record classes generated from the schema.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import unittest
+
+# import local modules
+from iosxr_eznc.schema import SchemaNode
+from iosxr_eznc.records import record_class
+
+
+def _node(name, keys, leaves):
+
+    node = SchemaNode(name, 'list', keys=keys)
+    for leaf in leaves:
+        node.children[leaf] = SchemaNode(leaf, 'leaf')
+    return node
+
+
+class RecordClassTest(unittest.TestCase):
+
+    def test_fields(self):
+
+        cls = record_class(_node('interface', ['interface-name'], ['interface-name', 'mtu']))
+        rec = cls()
+        rec._add('interface-name', 'Gi0/0/0/0')
+        rec._add('mtu', 1514)
+        self.assertEqual(cls._fields, ('interface_name', 'mtu'))
+        self.assertEqual(rec.interface_name, 'Gi0/0/0/0')
+        self.assertEqual(rec.to_dict(), {'interface-name': 'Gi0/0/0/0', 'mtu': 1514})
+
+    def test_reserved_names(self):
+
+        cls = record_class(_node('entry', ['name'], ['name', 'get', 'to-dict', '_extra']))
+        rec = cls()
+        for yang_name in ('name', 'get', 'to-dict', '_extra'):
+            rec._add(yang_name, yang_name.upper())
+        self.assertEqual(rec['get'], 'GET')
+        self.assertEqual(rec['to-dict'], 'TO-DICT')
+        self.assertEqual(rec['_extra'], '_EXTRA')
+        self.assertEqual(rec.get('name'), 'NAME')  # the method is not shadowed
+        self.assertEqual(rec.to_dict()['get'], 'GET')
+
+    def test_mangled_names_clash(self):
+
+        cls = record_class(_node('entry', ['foo-bar'], ['foo-bar', 'foo_bar', 'foo.bar']))
+        self.assertEqual(len(set(cls._fields)), 3)
+        rec = cls()
+        rec._add('foo-bar', 1)
+        rec._add('foo_bar', 2)
+        rec._add('foo.bar', 3)
+        self.assertEqual(rec.to_dict(), {'foo-bar': 1, 'foo_bar': 2, 'foo.bar': 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
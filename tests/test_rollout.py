@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+
+"""
+Tests of the staged rollout.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import unittest
+
+# import local modules
+from iosxr_eznc.rollout import Rollout
+
+
+class _RPC(object):
+
+    def __init__(self, calls):
+
+        self._calls = calls
+
+    def __getattr__(self, name):
+
+        def _call(*vargs, **kvargs):
+            self._calls.append(name)
+        return _call
+
+
+class _Dev(object):
+
+    def __init__(self, host):
+
+        self.hostname = host
+        self.calls = []
+        self.rpc = _RPC(self.calls)
+
+    def close(self):
+
+        pass
+
+
+class TestErrorBudget(unittest.TestCase):
+
+    def _rollout(self, unhealthy, error_budget):
+
+        devices = {}
+
+        def _connect(host):
+            devices[host] = _Dev(host)
+            return devices[host]
+
+        rollout = Rollout(
+            ['r{}'.format(index) for index in range(10)],
+            [],
+            _connect,
+            health_check=lambda dev, host: host not in unhealthy,
+            canary=0,
+            wave_size=5,
+            parallel=5,
+            error_budget=error_budget
+        )
+        return rollout, rollout.run(), devices
+
+    def test_fraction_of_the_first_wave(self):
+
+        # 2 failures out of the 5 devices attempted: over 20%, though not over 20% of all the 10 devices
+        rollout, report, devices = self._rollout(unhealthy=('r0', 'r1'), error_budget=0.2)
+        self.assertTrue(report['stopped'])
+        self.assertEqual(report['statuses'], {'rolled-back': 5, 'skipped': 5})
+        self.assertEqual(len(report['waves']), 1)
+        self.assertEqual(sorted(devices), ['r0', 'r1', 'r2', 'r3', 'r4'])
+        self.assertIn('cancel_commit', devices['r4'].calls)
+
+    def test_within_budget(self):
+
+        rollout, report, devices = self._rollout(unhealthy=('r0',), error_budget=0.2)
+        self.assertFalse(report['stopped'])
+        self.assertEqual(report['statuses'], {'rolled-back': 1, 'confirmed': 9})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+
+"""
+Tests of the RPC calls.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import unittest
+
+# import local modules
+from iosxr_eznc.rpc import RPC
+from iosxr_eznc.exception import InvalidRequestError
+
+
+class _Changes(object):
+
+    def __init__(self):
+
+        self.polls = []
+
+    def poll(self, filter, typed=None):
+
+        self.polls.append((filter, typed))
+        return []
+
+
+class _Dev(object):
+
+    hostname = 'router'
+
+    def __init__(self):
+
+        self.changes = _Changes()
+
+
+class TestGetChanges(unittest.TestCase):
+
+    def test_typed_passed(self):
+
+        dev = _Dev()
+        self.assertEqual(RPC(dev).get('interfaces', changes=True, typed=True, deadline=5), [])
+        self.assertEqual(dev.changes.polls, [('interfaces', True)])
+
+    def test_rejects_options_not_applicable(self):
+
+        dev = _Dev()
+        for option in ('sink', 'compress', 'records', 'raw'):
+            with self.assertRaises(InvalidRequestError):
+                RPC(dev).get('interfaces', changes=True, **{option: True})
+        self.assertEqual(dev.changes.polls, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+
+"""
+Tests of the polling scheduler.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import time
+import threading
+import unittest
+
+# import local modules
+from iosxr_eznc.scheduler import Job
+from iosxr_eznc.scheduler import Scheduler
+from iosxr_eznc.exception import RPCTimeoutError
+
+
+class _RPC(object):
+
+    def __init__(self, error=None):
+
+        self.requests = []
+        self._error = error
+
+    def get(self, filter, **kvargs):
+
+        self.requests.append((filter, kvargs))
+        if self._error is not None:
+            raise self._error
+        return {'data': {}}
+
+
+class _Dev(object):
+
+    timeout = 30
+
+    def __init__(self, error=None):
+
+        self.rpc = _RPC(error)
+
+
+class TestDevice(unittest.TestCase):
+
+    def test_opened_once_per_host(self):
+
+        opened = []
+
+        def _open(host):
+            opened.append(host)
+            time.sleep(0.1)  # slow connection, the other polls of the host start meanwhile
+            return _Dev()
+
+        scheduler = Scheduler(_open, timeout=5)
+        devices = []
+        threads = [
+            threading.Thread(target=lambda: devices.append(scheduler._device('router')))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(opened, ['router'])
+        self.assertEqual(len(set([id(dev) for dev in devices])), 1)
+        self.assertEqual(devices[0].timeout, 30)  # the device shared with the caller is not changed
+
+
+class TestRun(unittest.TestCase):
+
+    def _run(self, scheduler, **kvargs):
+
+        failures = []
+        job = Job('router', 'interfaces', 10, errback=lambda host, filter, err: failures.append(err), **kvargs)
+        scheduler._inflight['router'] += 1
+        scheduler._inflight_total += 1
+        scheduler._run(job, time.time())
+        return job, failures
+
+    def test_timeout_as_deadline(self):
+
+        dev = _Dev()
+        job, failures = self._run(Scheduler({'router': dev}, timeout=5), typed=True)
+        self.assertEqual(dev.rpc.requests, [('interfaces', {'typed': True, 'deadline': 5})])
+        self.assertEqual((job.runs, job.errors, failures), (1, 0, []))
+
+    def test_timeout_counted(self):
+
+        err = RPCTimeoutError(None, {'fun': 'rpc.get'})
+        job, failures = self._run(Scheduler({'router': _Dev(err)}))
+        self.assertEqual((job.timeouts, job.errors, failures), (1, 0, [err]))
+
+    def test_any_error_counted(self):
+
+        def _open(host):
+            raise ValueError('Unknown host')
+
+        scheduler = Scheduler(_open)
+        job, failures = self._run(scheduler)
+        self.assertEqual((job.runs, job.errors), (1, 1))
+        self.assertEqual([type(err) for err in failures], [ValueError])
+        self.assertEqual(scheduler._inflight_total, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
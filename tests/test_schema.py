@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+
+"""
+Tests of the compiled YANG schemas and the typed decoding.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import unittest
+
+# import third party
+import pyang
+from lxml import etree
+
+# import local modules
+from iosxr_eznc.schema import compile_module
+from iosxr_eznc.namespaces import Namespaces
+from iosxr_eznc.decorators import _etree_to_dict
+from iosxr_eznc.exception import RPCError
+
+
+NAMESPACE = 'http://cisco.com/ns/yang/Cisco-IOS-XR-test-oper'
+CAPABILITY = '{ns}?module=Cisco-IOS-XR-test-oper&revision=2016-01-01'.format(ns=NAMESPACE)
+
+MODULE = '''
+module Cisco-IOS-XR-test-oper {
+  namespace "http://cisco.com/ns/yang/Cisco-IOS-XR-test-oper";
+  prefix test;
+  revision 2016-01-01;
+
+  typedef counter {
+    type uint64;
+  }
+
+  container stats {
+    config false;
+    leaf packets { type counter; }
+    leaf delta { type int32; }
+    leaf rate { type decimal64 { fraction-digits 2; } }
+    leaf up { type boolean; }
+    leaf shutdown { type empty; }
+    leaf mtu {
+      type union {
+        type enumeration { enum unlimited; }
+        type uint32;
+      }
+    }
+    leaf description { type string; }
+    list interface {
+      key "name";
+      leaf name { type string; }
+      leaf index { type int32; }
+    }
+    leaf primary {
+      type leafref { path "../interface/index"; }
+    }
+    choice mode {
+      case fixed {
+        leaf speed { type uint8; }
+      }
+    }
+  }
+}
+'''
+
+
+def _compile():
+
+    ctx = pyang.Context(pyang.FileRepository(''))
+    ctx.opts = type('Options', (object,), {})()
+    module = ctx.add_module('Cisco-IOS-XR-test-oper', MODULE)
+    ctx.validate()
+    return compile_module(module)
+
+
+def _decoded(schema, xml):
+
+    ele = etree.fromstring('<stats xmlns="{ns}">{xml}</stats>'.format(ns=NAMESPACE, xml=xml))
+    return _etree_to_dict(ele, node=schema['stats'])
+
+
+class TestCompileModule(unittest.TestCase):
+
+    def test_tree(self):
+
+        schema = _compile()
+        stats = schema['stats']
+        self.assertEqual(stats.keyword, 'container')
+        self.assertEqual(stats.namespace, NAMESPACE)
+        self.assertEqual(stats.children['interface'].keyword, 'list')
+        self.assertEqual(stats.children['interface'].keys, ['name'])
+        self.assertIn('speed', stats.children)  # choice and case flattened
+        self.assertIsNone(stats.children['description'].decode)
+
+    def test_decoders(self):
+
+        decoded = _decoded(
+            _compile(),
+            '<packets>18446744073709551615</packets><delta>-3</delta><rate>1.25</rate>'
+            '<up>true</up><shutdown/><description>uplink</description><primary>7</primary><speed>10</speed>'
+        )
+        self.assertEqual(decoded, {
+            'packets': 18446744073709551615,
+            'delta': -3,
+            'rate': 1.25,
+            'up': True,
+            'shutdown': True,
+            'description': 'uplink',
+            'primary': 7,  # as the leaf referred to
+            'speed': 10
+        })
+
+    def test_union(self):
+
+        schema = _compile()
+        self.assertEqual(_decoded(schema, '<mtu>unlimited</mtu>'), {'mtu': 'unlimited'})
+        self.assertEqual(_decoded(schema, '<mtu>1514</mtu>'), {'mtu': 1514})
+        self.assertEqual(_decoded(schema, '<mtu>jumbo</mtu>'), {'mtu': 'jumbo'})  # invalid, kept as string
+
+    def test_invalid_kept(self):
+
+        self.assertEqual(_decoded(_compile(), '<up>yes</up><delta>n/a</delta>'), {'up': 'yes', 'delta': 'n/a'})
+
+
+class _RPC(object):
+
+    def __init__(self, dev):
+
+        self._dev = dev
+        self.failures = 1
+
+    def get_schema(self, identifier, version=None, format=None):
+
+        if self.failures:
+            self.failures -= 1
+            raise RPCError(self._dev, {'message': 'Resource temporarily unavailable'})
+        return {'data': MODULE}
+
+
+class _Conn(object):
+
+    server_capabilities = [CAPABILITY]
+
+
+class _Dev(object):
+
+    _release = None
+    _preload_schemas = False
+    _conn = _Conn()
+
+    def __init__(self):
+
+        self.rpc = _RPC(self)
+
+
+class TestNamespacesSchema(unittest.TestCase):
+
+    def setUp(self):
+
+        Namespaces._SCHEMAS.clear()
+
+    tearDown = setUp
+
+    def test_failed_compile_not_cached(self):
+
+        namespaces = Namespaces(_Dev())
+        self.assertEqual(namespaces.schema(NAMESPACE), {})
+        self.assertEqual(Namespaces._SCHEMAS, {})
+        schema = namespaces.schema(NAMESPACE)
+        self.assertEqual(sorted(schema), ['stats'])
+        # compiled once, then shared by the devices advertising the same revision
+        self.assertIs(Namespaces(_Dev()).schema(NAMESPACE), schema)
+
+
+if __name__ == '__main__':
+    unittest.main()
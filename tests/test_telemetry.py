@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+
+"""
+Tests of the telemetry receiver: frames encoded as the devices do, replayed from a capture.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import io
+import json
+import time
+import socket
+import unittest
+
+# import local modules
+from iosxr_eznc.schema import SchemaNode
+from iosxr_eznc.telemetry import replay
+from iosxr_eznc.telemetry import read_capture
+from iosxr_eznc.telemetry import encode_frame
+from iosxr_eznc.telemetry import ENCODING_GPB
+from iosxr_eznc.telemetry import ENCODING_JSON
+from iosxr_eznc.telemetry import TelemetryReceiver
+from iosxr_eznc.telemetry import _HEADER
+
+
+COUNTERS_PATH = 'Cisco-IOS-XR-infra-statsd-oper:infra-statistics/interfaces/interface/latest/generic-counters'
+NEIGHBORS_PATH = 'Cisco-IOS-XR-ipv4-bgp-oper:bgp/instances/instance/instance-active/default-vrf/neighbors/neighbor'
+BGP_NAMESPACE = 'http://cisco.com/ns/yang/Cisco-IOS-XR-ipv4-bgp-oper'
+
+# the keys are placed on the list entry (interface), not on the deepest container of the path
+COUNTERS = {
+    'data': {
+        'infra-statistics': {
+            'interfaces': {
+                'interface': [
+                    {
+                        'interface-name': 'Gi0/0/0/0',
+                        'latest': {'generic-counters': {'packets-received': '10', 'up': 'true', 'delta': '-3'}}
+                    },
+                    {
+                        'interface-name': 'Gi0/0/0/1',
+                        'latest': {'generic-counters': {'packets-received': '20'}}
+                    }
+                ]
+            }
+        }
+    }
+}
+
+
+def _varint(value):
+
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if not value:
+            out.append(byte)
+            return bytes(out)
+        out.append(byte | 0x80)
+
+
+def _bytes(number, value):
+
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    return _varint(number << 3 | 2) + _varint(len(value)) + value
+
+
+def _number(number, value):
+
+    return _varint(number << 3) + _varint(value)
+
+
+def _field(name, value=None, children=()):
+
+    """
+    TelemetryField of the self-describing GPB encoding.
+    """
+
+    field = _bytes(2, name)
+    if isinstance(value, bool):
+        field += _number(6, int(value))
+    elif isinstance(value, int) and value >= 0:
+        field += _number(8, value)
+    elif isinstance(value, int):
+        field += _number(10, (value << 1) ^ (value >> 63))  # zigzag
+    elif value is not None:
+        field += _bytes(5, value)
+    for child in children:
+        field += _bytes(15, child)
+    return field
+
+
+def _gpbkv(path, rows):
+
+    message = _bytes(1, 'rtr1') + _bytes(3, 'sub1') + _bytes(6, path) + _number(8, 42) + _number(10, 1500000000123)
+    for keys, content in rows:
+        row = _field('', children=[
+            _field('keys', children=[_field(name, value) for (name, value) in keys]),
+            _field('content', children=[_field(name, value) for (name, value) in content])
+        ])
+        message += _bytes(11, row)
+    return message
+
+
+def _json(path, rows):
+
+    return json.dumps({
+        'node_id_str': 'rtr1',
+        'subscription_id_str': 'sub1',
+        'encoding_path': path,
+        'collection_id': 42,
+        'msg_timestamp': 1500000000123,
+        'data_json': [
+            {'timestamp': 1500000000123, 'keys': dict(keys), 'content': dict(content)}
+            for (keys, content) in rows
+        ]
+    })
+
+
+COUNTERS_ROWS = [
+    ([('interface-name', u'Gi0/0/0/0')], [('packets-received', 10), ('up', True), ('delta', -3)]),
+    ([('interface-name', u'Gi0/0/0/1')], [('packets-received', 20)])
+]
+
+NEIGHBORS_ROWS = [
+    ([('instance-name', u'default'), ('neighbor-address', u'10.0.0.{}'.format(index))], [('remote-as', 65000)])
+    for index in (1, 2)
+]
+
+
+class _Namespaces(object):
+
+    def get(self, container=None, oper=None):
+
+        return {BGP_NAMESPACE: ['bgp']}
+
+    def _get_schema_ns(self, namespace):
+
+        return 'Cisco-IOS-XR-ipv4-bgp-oper'
+
+    def schema(self, namespace):
+
+        neighbor = SchemaNode('neighbor', 'list', keys=['neighbor-address'])
+        neighbor.children['remote-as'] = SchemaNode('remote-as', 'leaf', decode=int)
+        parent = neighbor
+        for name in ('neighbors', 'default-vrf', 'instance-active'):
+            node = SchemaNode(name, 'container')
+            node.children[parent.name] = parent
+            parent = node
+        instance = SchemaNode('instance', 'list', keys=['instance-name'])
+        instance.children[parent.name] = parent
+        instances = SchemaNode('instances', 'container')
+        instances.children['instance'] = instance
+        bgp = SchemaNode('bgp', 'container')
+        bgp.children['instances'] = instances
+        return {'bgp': bgp}
+
+
+class _Dev(object):
+
+    namespaces = _Namespaces()
+    _typed = True
+
+
+class TestRoundTrip(unittest.TestCase):
+
+    def _wait(self, updates, count):
+
+        start = time.time()
+        while len(updates) < count and time.time() - start < 5:
+            time.sleep(0.01)
+        self.assertEqual(len(updates), count)
+
+    def test_replayed_capture(self):
+
+        frames = [
+            encode_frame(_gpbkv(COUNTERS_PATH, COUNTERS_ROWS), ENCODING_GPB),
+            encode_frame(_json(COUNTERS_PATH, COUNTERS_ROWS), ENCODING_JSON),
+            encode_frame(_gpbkv(NEIGHBORS_PATH, NEIGHBORS_ROWS), ENCODING_GPB)
+        ]
+        capture = io.BytesIO()
+        received = []
+        with TelemetryReceiver(received.append, host='127.0.0.1', port=0, capture=capture) as receiver:
+            connection = socket.create_connection(receiver.address)
+            connection.sendall(b''.join(frames))
+            connection.close()
+            self._wait(received, len(frames))
+
+        replayed = []
+        with TelemetryReceiver(replayed.append, host='127.0.0.1', port=0) as receiver:
+            self.assertEqual(replay(io.BytesIO(capture.getvalue()), *receiver.address, speed=None), len(frames))
+            self._wait(replayed, len(frames))
+
+        gpbkv, json_, neighbors = [update.data for update in replayed]
+        self.assertEqual(gpbkv, COUNTERS)
+        self.assertEqual(json_, COUNTERS)
+        # without schema, all the keys are placed on the deepest list recognized by its name
+        self.assertEqual(
+            neighbors['data']['bgp']['instances']['instance']['instance-active']['default-vrf']['neighbors'],
+            {
+                'neighbor': [
+                    {'instance-name': 'default', 'neighbor-address': '10.0.0.1', 'remote-as': '65000'},
+                    {'instance-name': 'default', 'neighbor-address': '10.0.0.2', 'remote-as': '65000'}
+                ]
+            }
+        )
+        self.assertEqual([update.data for update in received], [gpbkv, json_, neighbors])
+        self.assertEqual((replayed[0].node, replayed[0].subscription, replayed[0].collection_id),
+                         ('rtr1', 'sub1', 42))
+
+    def test_capture_as_received(self):
+
+        # not a data frame, with flags: captured as sent, not replayed as data
+        frame = _HEADER.pack(2, ENCODING_GPB, 1, 0x8000, 4) + b'ping'
+        capture = io.BytesIO()
+        received = []
+        receiver = TelemetryReceiver(received.append, capture=capture)
+        receiver._serve(io.BytesIO(frame), '10.0.0.1')
+        receiver.close()
+        receiver._write_capture('10.0.0.1', frame)  # from a connection still open: ignored once closed
+        self.assertEqual([(peer, captured) for (_, peer, captured) in read_capture(io.BytesIO(capture.getvalue()))],
+                         [('10.0.0.1', frame)])
+        self.assertEqual(received, [])
+
+    def test_close_connections(self):
+
+        receiver = TelemetryReceiver(None, host='127.0.0.1', port=0).start()
+        connection = socket.create_connection(receiver.address)
+        try:
+            start = time.time()
+            while not receiver.stats()['connections'] and time.time() - start < 5:
+                time.sleep(0.01)
+            receiver.close()
+            connection.settimeout(5)
+            # closed by the receiver, as the device would see it
+            self.assertEqual(connection.recv(1), b'')
+            start = time.time()
+            while receiver._connections and time.time() - start < 5:
+                time.sleep(0.01)
+            self.assertEqual(receiver._connections, set())
+        finally:
+            connection.close()
+
+    def test_keys_placed_using_the_schema(self):
+
+        receiver = TelemetryReceiver(None, dev=_Dev())
+        for payload, encoding in ((_gpbkv(NEIGHBORS_PATH, NEIGHBORS_ROWS), ENCODING_GPB),
+                                  (_json(NEIGHBORS_PATH, NEIGHBORS_ROWS), ENCODING_JSON)):
+            update = receiver.decode(payload, encoding)
+            self.assertEqual(
+                update.data['data']['bgp']['instances'],
+                {
+                    'instance': {
+                        'instance-name': 'default',
+                        'instance-active': {
+                            'default-vrf': {
+                                'neighbors': {
+                                    'neighbor': [
+                                        {'neighbor-address': '10.0.0.1', 'remote-as': 65000},
+                                        {'neighbor-address': '10.0.0.2', 'remote-as': 65000}
+                                    ]
+                                }
+                            }
+                        }
+                    }
+                }
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Tests of the configuration templates.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import unittest
+from collections import OrderedDict
+
+# import third party
+from lxml import etree
+
+# import local modules
+from iosxr_eznc.template import ConfigTemplate
+from iosxr_eznc.exception import InvalidRequestError
+
+
+NS = 'http://cisco.com/ns/yang/Cisco-IOS-XR-ifmgr-cfg'
+
+
+class _Namespaces(object):
+
+    def get(self, container, oper=False):
+
+        return NS if container == 'interface-configurations' else None
+
+
+class _Dev(object):
+
+    hostname = 'router'
+    namespaces = _Namespaces()
+
+
+def _template():
+
+    return ConfigTemplate({
+        'interface-configurations/interface-configuration': OrderedDict([
+            ('active', 'act'),
+            ('interface-name', '{name}'),
+            ('description', '{description}'),
+            ('shutdown', '{shutdown}'),
+            ('mtus/mtu', [OrderedDict([('owner', 'GigabitEthernet'), ('mtu', '{mtu}')])])
+        ])
+    }, dev=_Dev())
+
+
+def _leaves(rendered):
+
+    config = etree.fromstring(rendered)
+    return dict([
+        (etree.QName(ele).localname, ele.text) for ele in config.iter() if ele.text is not None
+    ])
+
+
+class TestRender(unittest.TestCase):
+
+    def test_slots(self):
+
+        tpl = _template()
+        self.assertEqual(tpl.variables, set(['name', 'description', 'shutdown', 'mtu']))
+        rendered = tpl.render(name='Gi0/0/0/0', description='uplink', shutdown=False, mtu=9000)
+        config = etree.fromstring(rendered)
+        self.assertEqual(etree.QName(config).localname, 'config')
+        self.assertEqual(config[0].tag, '{{{ns}}}interface-configurations'.format(ns=NS))
+        self.assertEqual(_leaves(rendered), {
+            'active': 'act',
+            'interface-name': 'Gi0/0/0/0',
+            'description': 'uplink',
+            'shutdown': 'false',  # YANG boolean
+            'owner': 'GigabitEthernet',
+            'mtu': '9000'
+        })
+
+    def test_variables_dict(self):
+
+        tpl = _template()
+        rendered = tpl.render({'name': 'Gi0/0/0/0', 'description': 'uplink', 'shutdown': True}, mtu=1514)
+        self.assertEqual(_leaves(rendered)['mtu'], '1514')
+        # rendered again, independently
+        rendered = tpl.render({'name': 'Gi0/0/0/1', 'description': '', 'shutdown': True, 'mtu': 9000})
+        self.assertEqual(_leaves(rendered)['interface-name'], 'Gi0/0/0/1')
+
+    def test_escaping(self):
+
+        description = '<uplink> & "core" \'1\''
+        rendered = _template().render(name='Gi0/0/0/0', description=description, shutdown=False, mtu=1514)
+        self.assertEqual(_leaves(rendered)['description'], description)
+
+    def test_attribute(self):
+
+        tpl = ConfigTemplate(
+            '<interface-configurations><interface-configuration tag="{tag}"/></interface-configurations>',
+            dev=_Dev()
+        )
+        rendered = tpl.render(tag='"a" & <b>')
+        self.assertEqual(etree.fromstring(rendered)[0][0].get('tag'), '"a" & <b>')
+
+    def test_literal_braces(self):
+
+        tpl = ConfigTemplate({'interface-configurations/description': '{{not a slot}} {name}'}, dev=_Dev())
+        self.assertEqual(tpl.variables, set(['name']))
+        self.assertEqual(_leaves(tpl.render(name='Gi0'))['description'], '{not a slot} Gi0')
+
+    def test_missing_variable(self):
+
+        with self.assertRaises(InvalidRequestError) as raised:
+            _template().render(name='Gi0/0/0/0')
+        self.assertEqual(raised.exception._err['msg'], 'Missing template variable')
+        self.assertEqual(raised.exception._err['obj'], 'description')  # the first one missing
+
+    def test_unknown_namespace(self):
+
+        with self.assertRaises(InvalidRequestError) as raised:
+            ConfigTemplate({'unknown/leaf': '{value}'}, dev=_Dev())
+        self.assertEqual(raised.exception._err['obj'], 'unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Tests of the time series store.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import math
+import unittest
+
+# import local modules
+from iosxr_eznc import timeseries
+
+
+@unittest.skipUnless(timeseries.HAS_NUMPY, 'numpy not installed')
+class TestSeries(unittest.TestCase):
+
+    def _series(self, samples, capacity=4):
+
+        series = timeseries.Series(capacity)
+        for timestamp, value in samples:
+            series.append(timestamp, value)
+        return series
+
+    def test_window(self):
+
+        series = self._series([(0, 0), (10, 5), (20, 10)])
+        self.assertEqual(list(series.window()[1]), [0, 5, 10])
+        self.assertEqual(list(series.window(10)[0]), [10, 20])
+        self.assertEqual(list(series.window(10, now=25)[1]), [10])
+        self.assertEqual(series.max(15), 10)
+        self.assertEqual(series.min(15), 5)
+
+    def test_ring(self):
+
+        series = self._series([(timestamp, timestamp) for timestamp in range(6)])
+        self.assertEqual(len(series), 4)
+        # oldest first, across the end of the buffer
+        self.assertEqual(list(series.window()[0]), [2, 3, 4, 5])
+        self.assertEqual(list(series.window(1)[1]), [4, 5])
+
+    def test_rates_wrap(self):
+
+        series = self._series([(0, 2 ** 32 - 10), (10, 10), (20, 110)])
+        self.assertEqual(list(series.rates(wrap=2 ** 32)[1]), [2.0, 10.0])
+        timestamps, rates = series.rates()
+        self.assertEqual(list(timestamps), [10, 20])
+        self.assertTrue(math.isnan(rates[0]))  # reset
+        self.assertEqual(rates[1], 10.0)
+        # the intervals of the resets are not counted
+        self.assertEqual(series.rate(), 10.0)
+        self.assertEqual(series.rate(wrap=2 ** 32), 6.0)
+
+    def test_rate_single_sample(self):
+
+        self.assertTrue(math.isnan(self._series([(0, 1)]).rate()))
+
+
+@unittest.skipUnless(timeseries.HAS_NUMPY, 'numpy not installed')
+class TestTimeSeriesStore(unittest.TestCase):
+
+    def test_eviction(self):
+
+        # room for 2 series of 4 samples
+        store = timeseries.TimeSeriesStore(capacity=4, max_bytes=2 * 4 * 16)
+        store.append('r1', 'interfaces', 'packets', 1, timestamp=0)
+        store.append('r1', 'interfaces', 'bytes', 1, timestamp=0)
+        store.append('r1', 'interfaces', 'packets', 2, timestamp=10)  # most recently updated
+        store.append('r2', 'interfaces', 'packets', 1, timestamp=10)
+        self.assertEqual(store.select(), [('r1', 'interfaces', 'packets'), ('r2', 'interfaces', 'packets')])
+        self.assertNotIn(('r1', 'interfaces', 'bytes'), store)
+        stats = store.stats()
+        self.assertEqual((stats['series'], stats['evicted']), (2, 1))
+        self.assertLessEqual(stats['bytes'], 2 * 4 * 16)
+
+    def test_series_copy(self):
+
+        store = timeseries.TimeSeriesStore(capacity=4)
+        store.append('r1', 'interfaces', 'packets', 0, timestamp=0)
+        series = store.series('r1', 'interfaces', 'packets')
+        store.append('r1', 'interfaces', 'packets', 10, timestamp=10)
+        self.assertEqual(len(series), 1)  # not changed by the samples appended later
+        self.assertEqual(len(store.series('r1', 'interfaces', 'packets')), 2)
+        self.assertIsNone(store.series('r1', 'interfaces', 'bytes'))
+
+    def test_rates(self):
+
+        store = timeseries.TimeSeriesStore(capacity=4)
+        for timestamp, value in ((0, 0), (10, 10), (20, 30)):
+            store.append('r1', 'interfaces', 'packets', value, timestamp=timestamp)
+        rates = store.rates([('r1', 'interfaces', 'packets'), ('r2', 'interfaces', 'packets')], seconds=10)
+        self.assertEqual(rates[0], 2.0)
+        self.assertTrue(math.isnan(rates[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+
+"""
+Tests of the local transport, against the stand-in agent.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import os
+import sys
+import unittest
+
+# import third party
+from lxml import etree
+from ncclient import xml_
+from ncclient.operations import Get
+from ncclient.operations.retrieve import GetReply
+
+# import local modules
+from iosxr_eznc import Device
+from iosxr_eznc.exception import ConnectError
+from iosxr_eznc.transport import parsing_replies
+
+
+AGENT = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'netconf_agent.py')]
+
+STATS = '<stats xmlns="http://cisco.com/ns/yang/Cisco-IOS-XR-test-oper"/>'
+
+REPLY = (
+    '<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0" message-id="101">\n'
+    '  <data>\n    <running>{text}</running>\n  </data>\n'
+    '</rpc-reply>'
+)
+
+
+class TestLocalAgent(unittest.TestCase):
+
+    def test_get_and_close(self):
+
+        dev = Device('localhost', gather_facts=False, local_agent=AGENT, timeout=5)
+        dev.open()
+        try:
+            self.assertTrue(dev.connected)
+            self.assertEqual(
+                dev.rpc.get(STATS),
+                {
+                    'data': {
+                        'stats': {
+                            'interface': {'interface-name': 'Gi0', 'packets': '10'},
+                            'total': '30'
+                        }
+                    }
+                }
+            )
+        finally:
+            dev.close()
+        self.assertFalse(dev._conn.connected)
+
+    def test_agent_not_found(self):
+
+        dev = Device('localhost', gather_facts=False, local_agent=['/nonexistent/netconf-agent'], timeout=5)
+        with self.assertRaises(ConnectError) as raised:
+            dev.open()
+        self.assertEqual(raised.exception._msg, 'Unable to start the local NETCONF agent.')
+        self.assertFalse(dev.connected)
+
+
+
+class TestReplyParsing(unittest.TestCase):
+
+    def test_operation_class(self):
+
+        parsing = parsing_replies(Get)
+        self.assertTrue(issubclass(parsing, Get))
+        self.assertTrue(issubclass(parsing.REPLY_CLS, GetReply))
+        self.assertIs(parsing_replies(Get), parsing)
+
+    def test_huge_text(self):
+
+        text = 'x' * (11 * 1024 * 1024)  # over the limit of libxml2 without `huge_tree`
+        reply = parsing_replies(Get).REPLY_CLS(REPLY.format(text=text))
+        reply.parse()
+        self.assertEqual(len(reply.data_ele), 1)  # no whitespace-only text
+        self.assertEqual(len(reply.data_ele[0].text), len(text))
+
+    def test_malformed_rejected(self):
+
+        reply = parsing_replies(Get).REPLY_CLS(REPLY.format(text='<truncated'))
+        with self.assertRaises(etree.XMLSyntaxError):
+            reply.parse()
+
+    def test_ncclient_parser_unchanged(self):
+
+        parser = xml_.parser
+        dev = Device('localhost', gather_facts=False, local_agent=AGENT, timeout=5)
+        dev.open()
+        try:
+            dev.rpc.get(STATS)
+        finally:
+            dev.close()
+        self.assertIs(xml_.parser, parser)
+
+
+if __name__ == '__main__':
+    unittest.main()
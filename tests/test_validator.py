@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016 CloudFlare, Inc. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Tests of the request filters validation against the YANG schemas.
+"""
+
+from __future__ import absolute_import
+
+# import stdlib
+import unittest
+
+# import third party
+import pyang
+from lxml import etree
+
+# import local modules
+from iosxr_eznc.schema import compile_module
+from iosxr_eznc.validator import validate_filter
+from iosxr_eznc.exception import InvalidRequestError
+
+
+NAMESPACE = 'http://cisco.com/ns/yang/Cisco-IOS-XR-test-oper'
+OTHER_NAMESPACE = 'http://cisco.com/ns/yang/Cisco-IOS-XR-other-oper'
+
+MODULE = '''
+module Cisco-IOS-XR-test-oper {
+  namespace "http://cisco.com/ns/yang/Cisco-IOS-XR-test-oper";
+  prefix test;
+  revision 2016-01-01;
+
+  container interfaces {
+    config false;
+    list interface {
+      key "name";
+      leaf name { type string; }
+      leaf packets { type uint64; }
+      leaf description { type string; }
+    }
+  }
+}
+'''
+
+
+def _schema():
+
+    ctx = pyang.Context(pyang.FileRepository(''))
+    ctx.opts = type('Options', (object,), {})()
+    module = ctx.add_module('Cisco-IOS-XR-test-oper', MODULE)
+    ctx.validate()
+    return compile_module(module)
+
+
+class _Namespaces(object):
+
+    def __init__(self, schemas):
+
+        self._schemas = schemas
+
+    def get(self):
+
+        return {NAMESPACE: ['interfaces'], OTHER_NAMESPACE: ['routing']}
+
+    def schema(self, namespace):
+
+        return self._schemas.get(namespace, {})
+
+
+class _Dev(object):
+
+    hostname = 'router'
+
+    def __init__(self, schemas=None):
+
+        self.namespaces = _Namespaces({NAMESPACE: _schema()} if schemas is None else schemas)
+
+
+def _filter(xml):
+
+    return etree.fromstring('<filter>{xml}</filter>'.format(xml=xml))
+
+
+def _interface(xml):
+
+    return _filter('<interfaces xmlns="{ns}"><interface>{xml}</interface></interfaces>'.format(ns=NAMESPACE, xml=xml))
+
+
+class TestStrict(unittest.TestCase):
+
+    def _error(self, filter_tree, dev=None):
+
+        with self.assertRaises(InvalidRequestError) as raised:
+            validate_filter(filter_tree, dev or _Dev())
+        return raised.exception._err
+
+    def test_valid(self):
+
+        filter_tree = _interface('<name>Gi0/0/0/0</name><packets/>')
+        self.assertIs(validate_filter(filter_tree, _Dev()), filter_tree)
+        self.assertEqual(len(filter_tree.find('.//{%s}interface' % NAMESPACE)), 2)
+
+    def test_unknown_node(self):
+
+        err = self._error(_interface('<pakets/>'))
+        self.assertEqual(err['obj'], 'interfaces/interface/pakets')
+        self.assertEqual(err['msg'], 'Unknown node "pakets", did you mean "packets"?')
+
+    def test_unknown_container(self):
+
+        err = self._error(_filter('<interface xmlns="{ns}"/>'.format(ns=NAMESPACE)))
+        self.assertEqual(err['msg'], 'Unknown container "interface" in {ns}, did you mean "interfaces"?'.format(
+            ns=NAMESPACE
+        ))
+
+    def test_no_namespace(self):
+
+        err = self._error(_filter('<routin/>'))
+        self.assertEqual(err['msg'], 'Unknown container "routin", did you mean "routing"?')
+
+    def test_under_leaf(self):
+
+        err = self._error(_interface('<name><first/></name>'))
+        self.assertEqual(err['msg'], 'Cannot select under the leaf "name"')
+
+    def test_schema_not_available(self):
+
+        err = self._error(_filter('<routing xmlns="{ns}"/>'.format(ns=OTHER_NAMESPACE)))
+        self.assertEqual(err['obj'], 'routing')
+        self.assertIn('schema of {ns} is not available'.format(ns=OTHER_NAMESPACE), err['msg'])
+
+    def test_augmented_kept(self):
+
+        filter_tree = _interface('<stats xmlns="{ns}"/>'.format(ns=OTHER_NAMESPACE))
+        validate_filter(filter_tree, _Dev())
+        self.assertIsNotNone(filter_tree.find('.//{%s}stats' % OTHER_NAMESPACE))
+
+
+class TestPrune(unittest.TestCase):
+
+    def test_pruned(self):
+
+        filter_tree = _interface('<name>Gi0/0/0/0</name><pakets/><description><text/></description>')
+        validate_filter(filter_tree, _Dev(), prune=True)
+        interface = filter_tree.find('.//{%s}interface' % NAMESPACE)
+        self.assertEqual([etree.QName(child).localname for child in interface], ['name'])
+
+    def test_nothing_left(self):
+
+        with self.assertRaises(InvalidRequestError) as raised:
+            validate_filter(_interface('<pakets/>'), _Dev(), prune=True)
+        self.assertEqual(raised.exception._err['msg'], 'No valid node left after pruning interfaces/interface/pakets')
+
+    def test_schema_not_available(self):
+
+        filter_tree = _filter('<routing xmlns="{ns}"><anything/></routing>'.format(ns=OTHER_NAMESPACE))
+        validate_filter(filter_tree, _Dev(), prune=True)
+        self.assertIsNotNone(filter_tree.find('.//{%s}anything' % OTHER_NAMESPACE))
+
+
+if __name__ == '__main__':
+    unittest.main()